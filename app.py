@@ -1,17 +1,23 @@
-from json import loads
+from hmac import compare_digest
+from json import dumps, loads
+from os import environ
+from shutil import rmtree
+from time import perf_counter
 
 from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from uvicorn import run as run_app
 
-from network.model.load_production_model import Load_Prod_Model
-from network.model.predict_from_model import Prediction
-from network.model.training_model import Train_Model
-from network.validation_insertion.prediction_validation_insertion import Pred_Validation
-from network.validation_insertion.train_validation_insertion import Train_Validation
+from network.model.model_server import Model_Server
+from utils.drift_monitor import Drift_Monitor
+from utils.main_utils import Main_Utils
 from utils.read_params import read_params
+from utils.request_profiler import Request_Profiler
+from utils.service_metrics import Service_Metrics
+from utils.stage_profiler import Stage_Profiler
 
 app = FastAPI()
 
@@ -19,6 +25,24 @@ config = read_params()
 
 templates = Jinja2Templates(directory=config["templates"]["dir"])
 
+serving_mode = environ.get("SERVING_MODE", config["serving_mode"])
+
+model_server = Model_Server()
+
+profiler = Stage_Profiler()
+
+service_metrics = Service_Metrics()
+
+request_profiler = Request_Profiler()
+
+drift_monitor = Drift_Monitor(config["log"]["drift_monitor"])
+
+main_utils = Main_Utils()
+
+pipeline_lock_file = config["pipeline_lock_file"]
+
+async_mongo = None
+
 origins = ["*"]
 
 app.add_middleware(
@@ -30,6 +54,64 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def metricsMiddleware(request: Request, call_next):
+    Service_Metrics.requests_in_flight.inc()
+
+    session = None
+
+    if Request_Profiler.armed is not None:
+        mode = request_profiler.take(
+            request.headers.get("X-Job-Id", request.query_params.get("job_id"))
+        )
+
+        if mode is not None:
+            session = request_profiler.start(mode)
+
+    token = Request_Profiler.session.set(session)
+
+    start = perf_counter()
+
+    try:
+        return await call_next(request)
+
+    finally:
+        Request_Profiler.session.reset(token)
+
+        route = route_paths.get(request.scope.get("endpoint"), "unmatched")
+
+        Service_Metrics.request_latency.labels(route, request.method).observe(
+            perf_counter() - start
+        )
+
+        Service_Metrics.requests_in_flight.dec()
+
+        if session is not None:
+            request_profiler.stop(session, route)
+
+
+def get_async_mongo():
+    global async_mongo
+
+    if async_mongo is None:
+        from network.mongodb_operations.async_mongo_operations import (
+            Async_MongoDB_Operation,
+        )
+
+        async_mongo = Async_MongoDB_Operation()
+
+    return async_mongo
+
+
+def is_admin(request: Request):
+    admin_token = environ.get(config["request_profiler"]["admin_token_env"])
+
+    if not admin_token:
+        return False
+
+    return compare_digest(request.headers.get("X-Admin-Token", ""), admin_token)
+
+
 @app.get("/")
 async def index(request: Request):
     return templates.TemplateResponse(
@@ -37,37 +119,97 @@ async def index(request: Request):
     )
 
 
-@app.get("/train")
-async def trainRouteClient():
-    try:
-        train_val = Train_Validation()
+def run_training():
+    with request_profiler.profile_thread():
+        from network.model.load_production_model import Load_Prod_Model
+        from network.model.training_model import Train_Model
+        from network.validation_insertion.train_validation_insertion import (
+            Train_Validation,
+        )
+
+        with main_utils.file_lock(pipeline_lock_file):
+            try:
+                profiler.start_run("train")
+
+                train_val = Train_Validation()
+
+                train_val.train_validation()
+
+                train_model = Train_Model()
+
+                trained_model_list = train_model.training_model()
+
+                load_prod_model = Load_Prod_Model()
+
+                load_prod_model.load_production_model(trained_model_list)
+
+                profiler.end_run()
+
+            except Exception as e:
+                profiler.end_run("failed")
+
+                raise e
+
+
+def run_prediction():
+    with request_profiler.profile_thread():
+        from network.model.predict_from_model import Prediction
+        from network.validation_insertion.prediction_validation_insertion import (
+            Pred_Validation,
+        )
+
+        with main_utils.file_lock(pipeline_lock_file):
+            try:
+                profiler.start_run("predict")
+
+                pred_val = Pred_Validation()
 
-        train_val.train_validation()
+                batch_id = pred_val.pred_validation()
 
-        train_model = Train_Model()
+                pred = Prediction()
 
-        trained_model_list = train_model.training_model()
+                path, json_predictions = pred.predict_from_model(batch_id)
 
-        load_prod_model = Load_Prod_Model()
+                profiler.end_run()
 
-        load_prod_model.load_production_model(trained_model_list)
+                return path, json_predictions
+
+            except Exception as e:
+                profiler.end_run("failed")
+
+                raise e
+
+
+@app.get("/train")
+async def trainRouteClient():
+    if serving_mode == "predict":
+        return Response("Training is disabled in predict serving mode", status_code=404)
+
+    Service_Metrics.jobs_in_progress.labels("train").inc()
+
+    try:
+        await run_in_threadpool(run_training)
 
         return Response("Training successfull!!")
 
     except Exception as e:
         return Response(f"Error Occurred! {e}")
 
+    finally:
+        Service_Metrics.jobs_in_progress.labels("train").dec()
+
 
 @app.get("/predict")
 async def predictRouteClient():
-    try:
-        pred_val = Pred_Validation()
-
-        pred_val.pred_validation()
+    if serving_mode == "predict":
+        return Response(
+            "Batch prediction is disabled in predict serving mode", status_code=404
+        )
 
-        pred = Prediction()
+    Service_Metrics.jobs_in_progress.labels("predict").inc()
 
-        path, json_predictions = pred.predict_from_model()
+    try:
+        path, json_predictions = await run_in_threadpool(run_prediction)
 
         return Response(
             f"Prediction successfull !! Prediction file created at {path} and few of the predictions are {str(loads(json_predictions))}"
@@ -76,8 +218,158 @@ async def predictRouteClient():
     except Exception as e:
         return Response(f"Error Occurred! {e}")
 
+    finally:
+        Service_Metrics.jobs_in_progress.labels("predict").dec()
+
+
+@app.get("/profile")
+async def profileRouteClient(run_id: str = None, pipeline: str = None):
+    try:
+        report = profiler.get_report(run_id, pipeline)
+
+        if report is None:
+            return Response("No profiling report found", status_code=404)
+
+        return JSONResponse(report)
+
+    except Exception as e:
+        return Response(f"Error Occurred! {e}")
+
+
+@app.get("/drift")
+async def driftRouteClient(name: str = None, source: str = None):
+    try:
+        report = drift_monitor.get_report(name, source)
+
+        if report is None:
+            return Response("No drift report found", status_code=404)
+
+        return JSONResponse(report)
+
+    except Exception as e:
+        return Response(f"Error Occurred! {e}")
+
+
+@app.get("/shadow")
+async def shadowRouteClient():
+    try:
+        stats = model_server.shadow_scorer.get_stats()
+
+        if stats is None:
+            return Response("No shadow scoring stats found", status_code=404)
+
+        return JSONResponse(stats)
+
+    except Exception as e:
+        return Response(f"Error Occurred! {e}")
+
+
+@app.post("/admin/profile")
+async def armProfileRouteClient(
+    request: Request, mode: str = "cpu", requests: int = 1, job_id: str = None
+):
+    if not is_admin(request):
+        return Response("Forbidden", status_code=403)
+
+    try:
+        return JSONResponse(request_profiler.arm(mode, requests, job_id))
+
+    except Exception as e:
+        return Response(f"Error Occurred! {e}", status_code=400)
+
+
+@app.get("/admin/profile")
+async def profileStatusRouteClient(request: Request):
+    if not is_admin(request):
+        return Response("Forbidden", status_code=403)
+
+    return JSONResponse(
+        {"armed": Request_Profiler.armed is not None, "last": Request_Profiler.last}
+    )
+
+
+@app.delete("/admin/profile")
+async def disarmProfileRouteClient(request: Request):
+    if not is_admin(request):
+        return Response("Forbidden", status_code=403)
+
+    try:
+        return JSONResponse({"disarmed": request_profiler.disarm()})
+
+    except Exception as e:
+        return Response(f"Error Occurred! {e}")
+
+
+@app.get("/admin/records")
+async def recordsRouteClient(request: Request, pipeline: str = "train"):
+    if not is_admin(request):
+        return Response("Forbidden", status_code=403)
+
+    if pipeline not in ("train", "pred"):
+        return Response("Pipeline must be train or pred", status_code=400)
+
+    try:
+        mongo = get_async_mongo()
+
+        mongo_config = config["mongodb"]
+
+        async def stream():
+            async for batch in mongo.find_batches(
+                mongo_config["network_db_name"],
+                mongo_config[f"network_{pipeline}_data_collection"],
+                config["log"]["async_mongo"],
+                projection={"_id": 0},
+            ):
+                yield "".join(dumps(doc) + "\n" for doc in batch)
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    except Exception as e:
+        return Response(f"Error Occurred! {e}")
+
+
+@app.post("/predict_online")
+async def predictOnlineRouteClient(request: Request):
+    try:
+        records = await request.json()
+
+        predictions, approximate = model_server.predict(records)
+
+        return JSONResponse(
+            {
+                "predictions": predictions,
+                "approximate": approximate,
+                "model_version": model_server.model_version,
+            }
+        )
+
+    except ValueError as e:
+        return Response(f"Invalid records! {e}", status_code=422)
+
+    except Exception as e:
+        return Response(f"Error Occurred! {e}")
+
+
+@app.get("/metrics")
+async def metricsRouteClient():
+    payload, content_type = service_metrics.get_metrics()
+
+    return Response(payload, media_type=content_type)
+
+
+route_paths = {route.endpoint: route.path for route in app.routes}
+
 
 if __name__ == "__main__":
     app_config = config["app"]
 
-    run_app(app, **app_config)
+    if app_config.get("workers", 1) > 1:
+        multiproc_dir = config["metrics"]["multiproc_dir"]
+
+        rmtree(multiproc_dir, ignore_errors=True)
+
+        Main_Utils().create_directory(multiproc_dir, config["log"]["model_server"])
+
+        environ["PROMETHEUS_MULTIPROC_DIR"] = multiproc_dir
+
+    run_app("app:app", **app_config)
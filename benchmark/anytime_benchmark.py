@@ -0,0 +1,256 @@
+from json import dump
+from os import listdir
+from os.path import dirname
+from time import perf_counter
+
+import numpy as np
+from pandas import read_csv, to_numeric
+
+from utils.logger import App_Logger
+from utils.main_utils import Main_Utils
+from utils.model_registry import Model_Registry
+from utils.model_utils import Model_Utils
+from utils.read_params import get_log_dic, read_params
+from utils.shared_tree_model import Shared_Tree_Model
+
+
+class Anytime_Benchmark:
+    """
+    Description :   This class is used for benchmarking anytime inference of the production tree ensemble against full
+                    evaluation of all the trees, on online sized requests built from the raw prediction batch
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    def __init__(self):
+        self.config = read_params()
+
+        self.bench_config = self.config["anytime_benchmark"]
+
+        self.anytime_config = self.config["anytime_inference"]
+
+        self.raw_pred_data_dir = self.config["data"]["raw_data"]["pred_batch"]
+
+        self.pred_schema_file = self.config["schema_file"]["pred_schema_file"]
+
+        self.anytime_benchmark_log = self.config["log"]["anytime_benchmark"]
+
+        self.log_writer = App_Logger()
+
+        self.utils = Main_Utils()
+
+        self.model_utils = Model_Utils()
+
+        self.model_registry = Model_Registry()
+
+    def get_data(self):
+        """
+        Method Name :   get_data
+        Description :   This method reads the rows of the first raw prediction batch file with the schema columns
+
+        Output      :   A dataframe of the prediction rows is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_data.__name__,
+            __file__,
+            self.anytime_benchmark_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            columns = list(
+                self.utils.read_json(self.pred_schema_file, self.anytime_benchmark_log)[
+                    "ColName"
+                ].keys()
+            )
+
+            csv_files = [
+                f for f in listdir(self.raw_pred_data_dir) if f.endswith(".csv")
+            ]
+
+            fname = csv_files[0]
+
+            data = read_csv(self.raw_pred_data_dir + "/" + fname)[columns]
+
+            data = data.apply(to_numeric, errors="coerce").dropna().astype(int)
+
+            self.log_writer.log(f"Read {len(data)} rows from {fname} file", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return data
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_model(self):
+        """
+        Method Name :   get_model
+        Description :   This method maps the shared model of the production pointer, which has to be a tree ensemble
+                        saved as shared tree model
+
+        Output      :   Production model is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_model.__name__,
+            __file__,
+            self.anytime_benchmark_log,
+        )
+
+        try:
+            pointer = self.model_registry.get_prod_pointer(self.anytime_benchmark_log)
+
+            if pointer is None:
+                raise Exception(
+                    "No production model found in model registry, train the models first"
+                )
+
+            model = self.model_utils.load_shared_model(
+                pointer["shared_model_file"], self.anytime_benchmark_log
+            )
+
+            if not isinstance(model, Shared_Tree_Model):
+                raise Exception(
+                    f"Anytime inference needs a random forest or adaboost model in production, got {pointer['model_name']}"
+                )
+
+            return model
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def run_benchmark(self):
+        """
+        Method Name :   run_benchmark
+        Description :   This method scores the same requests with full evaluation and with anytime inference, and
+                        reports the latencies, the mean trees evaluated per row, the share of approximate rows and the
+                        agreement of the anytime labels with the full labels
+
+        Output      :   Benchmark report is written to the report file and returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.run_benchmark.__name__,
+            __file__,
+            self.anytime_benchmark_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            data, model = self.get_data(), self.get_model()
+
+            batch_rows = self.bench_config["batch_rows"]
+
+            model.get_tree_bounds()
+
+            latencies = {"full": [], "anytime": []}
+
+            trees, approximate, agreements, rows = 0, 0, 0, 0
+
+            for i in range(self.bench_config["requests"]):
+                start = (i * batch_rows) % max(len(data) - batch_rows, 1)
+
+                request = data.iloc[start : start + batch_rows]
+
+                t = perf_counter()
+
+                full_labels = model.predict(request)
+
+                latencies["full"].append(perf_counter() - t)
+
+                t = perf_counter()
+
+                labels, flags, n_trees = model.predict_anytime(
+                    request,
+                    self.anytime_config["max_trees"],
+                    self.anytime_config["time_budget_ms"],
+                    self.anytime_config["block_trees"],
+                )
+
+                latencies["anytime"].append(perf_counter() - t)
+
+                trees += int(n_trees.sum())
+
+                approximate += int(flags.sum())
+
+                agreements += int((labels == full_labels).sum())
+
+                rows += len(request)
+
+            report = {
+                "model_name": model.meta["model_name"],
+                "n_trees": len(model.roots),
+                "requests": self.bench_config["requests"],
+                "batch_rows": batch_rows,
+                "anytime_inference": self.anytime_config,
+                "full": {
+                    "mean_trees": float(len(model.roots)),
+                    "p50_latency_ms": float(
+                        np.percentile(latencies["full"], 50) * 1000
+                    ),
+                    "p99_latency_ms": float(
+                        np.percentile(latencies["full"], 99) * 1000
+                    ),
+                },
+                "anytime": {
+                    "mean_trees": trees / rows,
+                    "approximate_rate": approximate / rows,
+                    "agreement": agreements / rows,
+                    "p50_latency_ms": float(
+                        np.percentile(latencies["anytime"], 50) * 1000
+                    ),
+                    "p99_latency_ms": float(
+                        np.percentile(latencies["anytime"], 99) * 1000
+                    ),
+                },
+            }
+
+            for mode in ("full", "anytime"):
+                print(
+                    f"{mode} mean_trees={report[mode]['mean_trees']:.1f} "
+                    f"p50={report[mode]['p50_latency_ms']:.2f}ms p99={report[mode]['p99_latency_ms']:.2f}ms"
+                )
+
+            print(
+                f"anytime approximate={report['anytime']['approximate_rate']:.4f} "
+                f"agreement={report['anytime']['agreement']:.4f}"
+            )
+
+            report_file = self.bench_config["report_file"]
+
+            self.utils.create_directory(
+                dirname(report_file), self.anytime_benchmark_log
+            )
+
+            with open(report_file, "w") as f:
+                dump(report, f, indent=4)
+
+            self.log_writer.log(f"Wrote anytime report to {report_file}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return report
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+
+if __name__ == "__main__":
+    Anytime_Benchmark().run_benchmark()
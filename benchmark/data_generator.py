@@ -0,0 +1,254 @@
+from datetime import datetime, timedelta
+from os import listdir, makedirs
+from os.path import join
+
+import numpy as np
+from pandas import DataFrame, concat, read_csv
+
+from utils.logger import App_Logger
+from utils.main_utils import Main_Utils
+from utils.read_params import get_log_dic, read_params
+
+
+class Data_Generator:
+    """
+    Description :   This class is used for generating synthetic network batch files which match the schema and the label
+                    balance of the given training batches. Feature values are drawn from the per label distribution of
+                    each feature in the given data, so the generated data keeps the signal of the real data
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    def __init__(self):
+        self.config = read_params()
+
+        self.gen_config = self.config["pipeline_benchmark"]
+
+        self.raw_train_data_dir = self.config["data"]["raw_data"]["train_batch"]
+
+        self.train_schema_file = self.config["schema_file"]["train_schema_file"]
+
+        self.target_col = self.config["target_col"]
+
+        self.pipeline_benchmark_log = self.config["log"]["pipeline_benchmark"]
+
+        self.log_writer = App_Logger()
+
+        self.utils = Main_Utils()
+
+    def get_distribution(self):
+        """
+        Method Name :   get_distribution
+        Description :   This method gets the label balance and the per label value distribution of each feature from the
+                        given training batches
+
+        Output      :   A tuple of feature columns, feature values, label values, label probabilities and per label
+                        value probabilities is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_distribution.__name__,
+            __file__,
+            self.pipeline_benchmark_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            columns = list(
+                self.utils.read_json(
+                    self.train_schema_file, self.pipeline_benchmark_log
+                )["ColName"].keys()
+            )
+
+            data = concat(
+                [
+                    read_csv(join(self.raw_train_data_dir, f))
+                    for f in listdir(self.raw_train_data_dir)
+                    if f.endswith(".csv")
+                ]
+            )[columns]
+
+            data = data.dropna().astype(int)
+
+            features = [c for c in columns if c != self.target_col]
+
+            values = np.array([-1, 0, 1])
+
+            labels = np.sort(data[self.target_col].unique())
+
+            label_proba = np.array(
+                [(data[self.target_col] == y).mean() for y in labels]
+            )
+
+            value_proba = np.array(
+                [
+                    [
+                        [
+                            (data.loc[data[self.target_col] == y, c] == v).mean()
+                            for v in values
+                        ]
+                        for c in features
+                    ]
+                    for y in labels
+                ]
+            )
+
+            self.log_writer.log(
+                f"Got distribution of {len(features)} features and {len(labels)} labels from {len(data)} rows",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return features, values, labels, label_proba, value_proba
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_rows(self, n_rows, distribution, rng):
+        """
+        Method Name :   get_rows
+        Description :   This method draws the labels and then the feature values of the rows from the distribution
+
+        Output      :   A tuple of int8 feature matrix and labels is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            features, values, labels, label_proba, value_proba = distribution
+
+            y = rng.choice(labels, size=n_rows, p=label_proba)
+
+            x = np.empty((n_rows, len(features)), dtype=np.int8)
+
+            for i, label in enumerate(labels):
+                idx = np.flatnonzero(y == label)
+
+                cum = np.cumsum(value_proba[i], axis=1)
+
+                u = rng.random((len(idx), len(features)))
+
+                x[idx] = values[(u[:, :, None] > cum[None, :, :-1]).sum(axis=2)]
+
+            return x, y
+
+        except Exception as e:
+            raise e
+
+    def generate(self, out_dir, n_rows, kind="train", seed=None):
+        """
+        Method Name :   generate
+        Description :   This method writes n_rows synthetic rows split over the configured number of network batch files,
+                        with the configured rate of '?' feature values and duplicate rows, followed by the configured number of
+                        bad files with a wrong file name, a wrong number of columns or an empty column
+
+        Output      :   Batch files are written to out_dir and the list of file names is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.generate.__name__,
+            __file__,
+            self.pipeline_benchmark_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            rng = np.random.default_rng(
+                self.gen_config["seed"] if seed is None else seed
+            )
+
+            distribution = self.get_distribution()
+
+            features = distribution[0]
+
+            columns = features + [self.target_col] if kind == "train" else features
+
+            makedirs(out_dir, exist_ok=True)
+
+            stamp = datetime(2022, 1, 1)
+
+            n_files = self.gen_config["files"]
+
+            fnames = []
+
+            for i, rows in enumerate(np.array_split(np.arange(n_rows), n_files)):
+                x, y = self.get_rows(len(rows), distribution, rng)
+
+                n_dup = int(len(rows) * self.gen_config["duplicate_rate"])
+
+                if n_dup > 0:
+                    src = rng.integers(0, len(rows), n_dup)
+
+                    dst = rng.choice(len(rows), n_dup, replace=False)
+
+                    x[dst], y[dst] = x[src], y[src]
+
+                data = DataFrame(x, columns=features)
+
+                mask = rng.random(data.shape) < self.gen_config["missing_rate"]
+
+                if mask.any():
+                    data = data.mask(mask, "?")
+
+                if kind == "train":
+                    data[self.target_col] = y
+
+                fname = f"network_{(stamp + timedelta(seconds=10 * i)).strftime('%d%m%Y_%H%M%S')}.csv"
+
+                data[columns].to_csv(join(out_dir, fname), index=None, header=True)
+
+                fnames.append(fname)
+
+            bad_kinds = ["name", "columns", "empty_column"]
+
+            for i in range(self.gen_config["bad_files"]):
+                bad_kind = bad_kinds[i % len(bad_kinds)]
+
+                x, y = self.get_rows(100, distribution, rng)
+
+                data = DataFrame(x, columns=features)
+
+                if kind == "train":
+                    data[self.target_col] = y
+
+                data = data[columns]
+
+                fname = f"network_{(stamp + timedelta(days=1, seconds=10 * i)).strftime('%d%m%Y_%H%M%S')}.csv"
+
+                if bad_kind == "name":
+                    fname = f"network_bad_{i}.csv"
+
+                elif bad_kind == "columns":
+                    data = data.iloc[:, :-2]
+
+                else:
+                    data[columns[0]] = np.nan
+
+                data.to_csv(join(out_dir, fname), index=None, header=True)
+
+                fnames.append(fname)
+
+            self.log_writer.log(
+                f"Generated {n_rows} {kind} rows in {n_files} files and {self.gen_config['bad_files']} bad files in {out_dir}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return fnames
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
@@ -0,0 +1,472 @@
+from argparse import ArgumentParser
+from json import dump, load
+from os import environ, getcwd, pathsep
+from os.path import dirname, exists, join
+from shutil import copy, copytree, rmtree
+from statistics import median
+from subprocess import run
+from sys import executable
+
+from yaml import safe_dump
+
+from benchmark.data_generator import Data_Generator
+from network.model.load_production_model import Load_Prod_Model
+from network.model.predict_from_model import Prediction
+from network.model.training_model import Train_Model
+from network.mongodb_operations.mongo_operations import MongoDB_Operation
+from network.validation_insertion.prediction_validation_insertion import Pred_Validation
+from network.validation_insertion.train_validation_insertion import Train_Validation
+from utils.logger import App_Logger
+from utils.main_utils import Main_Utils
+from utils.read_params import get_log_dic, read_params
+from utils.stage_profiler import Stage_Profiler
+
+
+class Pipeline_Benchmark:
+    """
+    Description :   This class is used for benchmarking the train and predict pipelines end to end on synthetic batches
+                    of increasing size. Each size runs in its own process inside a workspace folder, the stage timings
+                    of the runs are compared against the baseline and a regression beyond the threshold fails the run
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    def __init__(self):
+        self.config = read_params()
+
+        self.bench_config = self.config["pipeline_benchmark"]
+
+        self.workspace = self.bench_config["workspace"]
+
+        self.pipeline_benchmark_log = self.config["log"]["pipeline_benchmark"]
+
+        self.log_writer = App_Logger()
+
+        self.utils = Main_Utils()
+
+        self.data_generator = Data_Generator()
+
+    def create_workspace(self, n_rows):
+        """
+        Method Name :   create_workspace
+        Description :   This method creates a fresh workspace with a copy of the config pointing the data, logs,
+                        artifacts and mongodb database of the pipelines to the workspace, and generates the synthetic
+                        train and prediction batches into it
+
+        Output      :   Workspace folder is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.create_workspace.__name__,
+            __file__,
+            self.pipeline_benchmark_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            workspace = join(self.workspace, str(n_rows))
+
+            rmtree(workspace, ignore_errors=True)
+
+            copytree("config", join(workspace, "config"))
+
+            config = read_params()
+
+            config["train_model"] = self.bench_config["train_model"]
+
+            config["mongodb"]["network_db_name"] = self.bench_config["db_name"]
+
+            with open(join(workspace, "config", "params.yaml"), "w") as f:
+                safe_dump(config, f, sort_keys=False)
+
+            self.data_generator.generate(
+                join(workspace, config["data"]["raw_data"]["train_batch"]),
+                n_rows,
+                "train",
+            )
+
+            self.data_generator.generate(
+                join(workspace, config["data"]["raw_data"]["pred_batch"]),
+                n_rows,
+                "pred",
+                self.bench_config["seed"] + 1,
+            )
+
+            self.log_writer.log(
+                f"Created workspace {workspace} with {n_rows} rows", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return workspace
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def run_pipelines(self, n_rows):
+        """
+        Method Name :   run_pipelines
+        Description :   This method runs the train and predict pipelines inside the current workspace with the stage
+                        profiler. It is run in a separate process per size, so peak rss is measured on its own
+
+        Output      :   A dict of the profiling reports of the train and predict runs is written and returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.run_pipelines.__name__,
+            __file__,
+            self.pipeline_benchmark_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            self.utils.create_directory(
+                self.config["dir"]["artifacts"], self.pipeline_benchmark_log
+            )
+
+            MongoDB_Operation().client.drop_database(
+                self.config["mongodb"]["network_db_name"]
+            )
+
+            profiler = Stage_Profiler()
+
+            profiler.start_run("train")
+
+            Train_Validation().train_validation()
+
+            Load_Prod_Model().load_production_model(Train_Model().training_model())
+
+            train_report = profiler.end_run()
+
+            profiler.start_run("predict")
+
+            Pred_Validation().pred_validation()
+
+            Prediction().predict_from_model()
+
+            pred_report = profiler.end_run()
+
+            result = {"rows": n_rows, "train": train_report, "predict": pred_report}
+
+            with open("pipeline_result.json", "w") as f:
+                dump(result, f, indent=4, default=str)
+
+            self.log_writer.log(f"Ran pipelines on {n_rows} rows", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return result
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_stage_stats(self, result):
+        """
+        Method Name :   get_stage_stats
+        Description :   This method gets the throughput as benchmark rows per second of wall time and the peak rss of
+                        each stage of the train and predict runs
+
+        Output      :   A dict of stage stats keyed by pipeline and stage is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_stage_stats.__name__,
+            __file__,
+            self.pipeline_benchmark_log,
+        )
+
+        try:
+            stats = {}
+
+            for pipeline in ("train", "predict"):
+                for stage, total in result[pipeline]["summary"].items():
+                    stats[f"{pipeline}.{stage}"] = {
+                        "wall_sec": total["wall_sec"],
+                        "rows_per_sec": result["rows"] / max(total["wall_sec"], 1e-9),
+                        "peak_rss_mb": total["peak_rss_mb"],
+                    }
+
+                stats[f"{pipeline}.total"] = {
+                    "wall_sec": result[pipeline]["wall_sec"],
+                    "rows_per_sec": result["rows"]
+                    / max(result[pipeline]["wall_sec"], 1e-9),
+                    "peak_rss_mb": max(
+                        (t["peak_rss_mb"] or 0)
+                        for t in result[pipeline]["summary"].values()
+                    ),
+                }
+
+            return stats
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_regressions(self, report, baseline):
+        """
+        Method Name :   get_regressions
+        Description :   This method compares the stage stats of the report against the baseline. A stage regresses when
+                        its throughput drops or its peak rss grows by more than the regression threshold, and the import
+                        time regresses when it grows by more than the threshold or is over the import time goal
+
+        Output      :   A list of regression messages is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_regressions.__name__,
+            __file__,
+            self.pipeline_benchmark_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            threshold = self.bench_config["regression_threshold"]
+
+            min_wall = self.bench_config["min_wall_sec"]
+
+            regressions = []
+
+            for size, stats in report["sizes"].items():
+                for stage, stat in stats.items():
+                    base = baseline["sizes"].get(size, {}).get(stage)
+
+                    if base is None:
+                        continue
+
+                    if base["wall_sec"] >= min_wall and stat["rows_per_sec"] < base[
+                        "rows_per_sec"
+                    ] * (1 - threshold):
+                        regressions.append(
+                            f"{stage} at {size} rows: {stat['rows_per_sec']:.0f} rows/sec against baseline {base['rows_per_sec']:.0f}"
+                        )
+
+                    if (
+                        stat["peak_rss_mb"]
+                        and base["peak_rss_mb"]
+                        and stat["peak_rss_mb"] > base["peak_rss_mb"] * (1 + threshold)
+                    ):
+                        regressions.append(
+                            f"{stage} at {size} rows: peak rss {stat['peak_rss_mb']:.0f} MB against baseline {base['peak_rss_mb']:.0f} MB"
+                        )
+
+            goal = self.bench_config["import_time_goal_sec"]
+
+            for mode, stat in report["import"].items():
+                base = baseline.get("import", {}).get(mode)
+
+                if stat["wall_sec"] > goal:
+                    regressions.append(
+                        f"import of app in {mode} serving mode: {stat['wall_sec']:.2f} sec against goal {goal} sec"
+                    )
+
+                elif base and stat["wall_sec"] > base["wall_sec"] * (1 + threshold):
+                    regressions.append(
+                        f"import of app in {mode} serving mode: {stat['wall_sec']:.2f} sec against baseline {base['wall_sec']:.2f} sec"
+                    )
+
+            self.log_writer.log(f"Found {len(regressions)} regressions", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return regressions
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_import_time(self):
+        """
+        Method Name :   get_import_time
+        Description :   This method measures the cold import time of the service in a fresh process for the full and
+                        the predict serving modes, the median of the configured number of repeats is taken
+
+        Output      :   A dict of import time in seconds by serving mode is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_import_time.__name__,
+            __file__,
+            self.pipeline_benchmark_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            code = "from time import perf_counter; t = perf_counter(); import app; print(perf_counter() - t)"
+
+            import_time = {}
+
+            for mode in ("full", "predict"):
+                times = [
+                    float(
+                        run(
+                            [executable, "-c", code],
+                            env=dict(environ, SERVING_MODE=mode),
+                            capture_output=True,
+                            text=True,
+                            check=True,
+                        ).stdout.split()[-1]
+                    )
+                    for _ in range(self.bench_config["import_repeats"])
+                ]
+
+                import_time[mode] = {"wall_sec": median(times)}
+
+                print(f"import app serving_mode={mode} wall={median(times):.2f}s")
+
+            self.log_writer.log(f"Got import time as {import_time}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return import_time
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def run_benchmark(self, sizes=None, update_baseline=False):
+        """
+        Method Name :   run_benchmark
+        Description :   This method runs the pipelines for each size in its own process, writes the report and checks
+                        it against the baseline. The baseline is written when it does not exist or when asked to update
+
+        Output      :   A tuple of report and list of regressions is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.run_benchmark.__name__,
+            __file__,
+            self.pipeline_benchmark_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            sizes = sizes or self.bench_config["sizes"]
+
+            report = {
+                "import": self.get_import_time(),
+                "sizes": {},
+                "config": self.bench_config,
+            }
+
+            env = dict(
+                environ,
+                PYTHONPATH=pathsep.join(
+                    p for p in (getcwd(), environ.get("PYTHONPATH")) if p
+                ),
+            )
+
+            for n_rows in sizes:
+                workspace = self.create_workspace(n_rows)
+
+                run(
+                    [
+                        executable,
+                        "-m",
+                        "benchmark.pipeline_benchmark",
+                        "--run-size",
+                        str(n_rows),
+                    ],
+                    cwd=workspace,
+                    env=env,
+                    check=True,
+                )
+
+                with open(join(workspace, "pipeline_result.json")) as f:
+                    result = load(f)
+
+                report["sizes"][str(n_rows)] = self.get_stage_stats(result)
+
+                for pipeline in ("train", "predict"):
+                    total = report["sizes"][str(n_rows)][f"{pipeline}.total"]
+
+                    print(
+                        f"rows={n_rows} {pipeline} wall={total['wall_sec']:.1f}s "
+                        f"rows/sec={total['rows_per_sec']:.0f} peak_rss={total['peak_rss_mb']:.0f}MB"
+                    )
+
+                if not self.bench_config["keep_workspace"]:
+                    rmtree(workspace, ignore_errors=True)
+
+            report_file = self.bench_config["report_file"]
+
+            self.utils.create_directory(
+                dirname(report_file), self.pipeline_benchmark_log
+            )
+
+            with open(report_file, "w") as f:
+                dump(report, f, indent=4)
+
+            baseline_file = self.bench_config["baseline_file"]
+
+            regressions = []
+
+            if update_baseline or not exists(baseline_file):
+                copy(report_file, baseline_file)
+
+                self.log_writer.log(f"Wrote baseline to {baseline_file}", **log_dic)
+
+            else:
+                with open(baseline_file) as f:
+                    baseline = load(f)
+
+                regressions = self.get_regressions(report, baseline)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return report, regressions
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+
+    parser.add_argument("--sizes", type=int, nargs="+")
+
+    parser.add_argument("--update-baseline", action="store_true")
+
+    parser.add_argument("--run-size", type=int)
+
+    args = parser.parse_args()
+
+    benchmark = Pipeline_Benchmark()
+
+    if args.run_size is not None:
+        benchmark.run_pipelines(args.run_size)
+
+    else:
+        report, regressions = benchmark.run_benchmark(args.sizes, args.update_baseline)
+
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+
+        if regressions:
+            raise SystemExit(1)
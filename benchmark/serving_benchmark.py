@@ -0,0 +1,300 @@
+from concurrent.futures import ThreadPoolExecutor
+from json import dump
+from os import listdir
+from os.path import dirname
+from subprocess import Popen
+from sys import executable
+from time import perf_counter, sleep
+
+import numpy as np
+import requests
+from pandas import read_csv, to_numeric
+
+from utils.logger import App_Logger
+from utils.main_utils import Main_Utils
+from utils.read_params import get_log_dic, read_params
+
+
+class Serving_Benchmark:
+    """
+    Description :   This class is used for load testing the online scoring route with 1 to N serving workers and
+                    reporting how the throughput scales with the number of workers
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    def __init__(self):
+        self.config = read_params()
+
+        self.bench_config = self.config["serving_benchmark"]
+
+        self.raw_pred_data_dir = self.config["data"]["raw_data"]["pred_batch"]
+
+        self.pred_schema_file = self.config["schema_file"]["pred_schema_file"]
+
+        self.serving_benchmark_log = self.config["log"]["serving_benchmark"]
+
+        self.url = f"http://127.0.0.1:{self.bench_config['port']}"
+
+        self.log_writer = App_Logger()
+
+        self.utils = Main_Utils()
+
+    def get_payload(self):
+        """
+        Method Name :   get_payload
+        Description :   This method builds the request payload from the first raw prediction batch file
+
+        Output      :   A list of records with batch_rows rows is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_payload.__name__,
+            __file__,
+            self.serving_benchmark_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            columns = list(
+                self.utils.read_json(self.pred_schema_file, self.serving_benchmark_log)[
+                    "ColName"
+                ].keys()
+            )
+
+            csv_files = [
+                f for f in listdir(self.raw_pred_data_dir) if f.endswith(".csv")
+            ]
+
+            fname = csv_files[0]
+
+            data = read_csv(self.raw_pred_data_dir + "/" + fname)[columns]
+
+            data = data.apply(to_numeric, errors="coerce").dropna().astype(int)
+
+            payload = data.head(self.bench_config["batch_rows"]).to_dict(
+                orient="records"
+            )
+
+            self.log_writer.log(
+                f"Built payload of {len(payload)} rows from {fname} file", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return payload
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def start_server(self, workers):
+        """
+        Method Name :   start_server
+        Description :   This method starts the service with the given number of workers and waits till it responds
+
+        Output      :   Server process is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.start_server.__name__,
+            __file__,
+            self.serving_benchmark_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            proc = Popen(
+                [
+                    executable,
+                    "-m",
+                    "uvicorn",
+                    "app:app",
+                    "--host",
+                    "127.0.0.1",
+                    "--port",
+                    str(self.bench_config["port"]),
+                    "--workers",
+                    str(workers),
+                    "--log-level",
+                    "warning",
+                ]
+            )
+
+            for _ in range(120):
+                try:
+                    requests.get(self.url + "/")
+
+                    break
+
+                except requests.exceptions.ConnectionError:
+                    pass
+
+                sleep(0.5)
+
+            else:
+                proc.terminate()
+
+                raise Exception(f"Server with {workers} workers did not start")
+
+            self.log_writer.log(f"Started server with {workers} workers", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return proc
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def run_load(self, payload):
+        """
+        Method Name :   run_load
+        Description :   This method sends the payload to the online scoring route from concurrent clients for the
+                        configured duration
+
+        Output      :   Throughput and latency stats are returned as dict
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.run_load.__name__,
+            __file__,
+            self.serving_benchmark_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            deadline = perf_counter() + self.bench_config["duration"]
+
+            def client():
+                latencies, errors = [], 0
+
+                session = requests.Session()
+
+                while perf_counter() < deadline:
+                    start = perf_counter()
+
+                    res = session.post(self.url + "/predict_online", json=payload)
+
+                    latencies.append(perf_counter() - start)
+
+                    if res.status_code != 200 or "predictions" not in res.text:
+                        errors += 1
+
+                return latencies, errors
+
+            start = perf_counter()
+
+            with ThreadPoolExecutor(self.bench_config["concurrency"]) as executor:
+                results = list(
+                    executor.map(
+                        lambda _: client(), range(self.bench_config["concurrency"])
+                    )
+                )
+
+            elapsed = perf_counter() - start
+
+            latencies = np.array([l for res in results for l in res[0]])
+
+            stats = {
+                "requests": int(latencies.size),
+                "errors": int(sum(res[1] for res in results)),
+                "requests_per_sec": latencies.size / elapsed,
+                "rows_per_sec": latencies.size * len(payload) / elapsed,
+                "p50_latency_ms": float(np.percentile(latencies, 50) * 1000),
+                "p99_latency_ms": float(np.percentile(latencies, 99) * 1000),
+            }
+
+            self.log_writer.log(f"Load run stats are {stats}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return stats
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def run_benchmark(self):
+        """
+        Method Name :   run_benchmark
+        Description :   This method runs the load for 1 to max_workers workers and writes the scaling report
+
+        Output      :   Scaling report is written to the report file and returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.run_benchmark.__name__,
+            __file__,
+            self.serving_benchmark_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            payload = self.get_payload()
+
+            report = []
+
+            for workers in range(1, self.bench_config["max_workers"] + 1):
+                proc = self.start_server(workers)
+
+                try:
+                    stats = self.run_load(payload)
+
+                finally:
+                    proc.terminate()
+
+                    proc.wait()
+
+                stats["workers"] = workers
+
+                stats["scaling"] = (
+                    stats["rows_per_sec"] / report[0]["rows_per_sec"] if report else 1.0
+                )
+
+                report.append(stats)
+
+                print(
+                    f"workers={workers} rows/sec={stats['rows_per_sec']:.0f} "
+                    f"p99={stats['p99_latency_ms']:.1f}ms scaling={stats['scaling']:.2f}x"
+                )
+
+            report_file = self.bench_config["report_file"]
+
+            self.utils.create_directory(
+                dirname(report_file), self.serving_benchmark_log
+            )
+
+            with open(report_file, "w") as f:
+                dump(report, f, indent=4)
+
+            self.log_writer.log(f"Wrote scaling report to {report_file}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return report
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+
+if __name__ == "__main__":
+    Serving_Benchmark().run_benchmark()
@@ -1,9 +1,22 @@
-from pandas import read_csv
+from json import dumps, loads
+from os import replace
+from struct import pack, unpack
 
+import numpy as np
+from pandas import DataFrame, to_numeric
+
+from utils.columnar_cache import Columnar_Cache
 from utils.logger import App_Logger
 from utils.read_params import get_log_dic, read_params
 
 
+MATRIX_MAGIC = b"NETPRED1"
+
+MATRIX_ALIGN = 64
+
+NULL_CODE = -128
+
+
 class Data_Getter_Pred:
     """
     Description :   This class shall be used for obtaining the df from the input files s3 bucket where the preding file is present
@@ -21,8 +34,12 @@ class Data_Getter_Pred:
 
         self.pred_csv_file = self.config["export_csv_file"]["pred"]
 
+        self.pred_matrix_file = self.config["pred_matrix"]["file"]
+
         self.log_writer = App_Logger()
 
+        self.columnar_cache = Columnar_Cache()
+
     def get_data(self):
         """
         Method Name :   get_data
@@ -45,7 +62,7 @@ class Data_Getter_Pred:
 
             f = self.pred_input_dir + "/" + self.pred_csv_file
 
-            df = read_csv(f)
+            df = self.columnar_cache.read_csv(f, self.log_file)
 
             self.log_writer.log("Read the pred input csv file", **log_dic)
 
@@ -55,3 +72,193 @@ class Data_Getter_Pred:
 
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
+
+    def write_matrix(self):
+        """
+        Method Name :   write_matrix
+        Description :   This method writes the pred input csv file as a fixed width int8 matrix file. The file starts with
+                        a small header of magic bytes, the header length and a json of columns, rows and null counts, padded
+                        so that the rows start at an aligned offset, and missing values are stored as the null code.
+                        Values which are not integers in the int8 range above the null code can not be stored, and no
+                        matrix is written for them so the caller reads the csv file instead
+
+        Output      :   Matrix file is written and the number of rows is returned, None if the values do not fit in int8
+        On Failure  :   Write an exception log and then raise exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.write_matrix.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            df = self.get_data()
+
+            matrix = np.empty(df.shape, dtype=np.int8)
+
+            null_counts = {}
+
+            for j, column in enumerate(df.columns):
+                values = to_numeric(
+                    df[column].replace(["?", "'?'"], np.nan), errors="coerce"
+                )
+
+                null = values.isna().values
+
+                num = values.dropna().values
+
+                if len(num) and (
+                    num.min() <= NULL_CODE
+                    or num.max() > 127
+                    or not np.array_equal(num, np.round(num))
+                ):
+                    self.log_writer.log(
+                        f"Values of {column} column do not fit in int8, skipped writing the pred matrix",
+                        **log_dic,
+                    )
+
+                    self.log_writer.start_log("exit", **log_dic)
+
+                    return None
+
+                matrix[:, j] = np.where(null, NULL_CODE, values.fillna(0).values)
+
+                null_counts[column] = int(null.sum())
+
+            header = dumps(
+                {
+                    "columns": list(df.columns),
+                    "rows": len(df),
+                    "dtype": "int8",
+                    "null_code": NULL_CODE,
+                    "null_counts": null_counts,
+                }
+            ).encode()
+
+            size = len(MATRIX_MAGIC) + 4 + len(header)
+
+            header = header.ljust(len(header) + (-size) % MATRIX_ALIGN)
+
+            with open(self.pred_matrix_file + ".tmp", "wb") as f:
+                f.write(MATRIX_MAGIC + pack("<I", len(header)) + header)
+
+                matrix.tofile(f)
+
+            replace(self.pred_matrix_file + ".tmp", self.pred_matrix_file)
+
+            self.log_writer.log(
+                f"Wrote {matrix.shape} pred matrix to {self.pred_matrix_file} with {sum(null_counts.values())} missing values",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return len(df)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_matrix_header(self):
+        """
+        Method Name :   get_matrix_header
+        Description :   This method reads the header of the pred matrix file
+
+        Output      :   Header dict is returned with the offset of the first row
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            with open(self.pred_matrix_file, "rb") as f:
+                if f.read(len(MATRIX_MAGIC)) != MATRIX_MAGIC:
+                    raise Exception(
+                        f"{self.pred_matrix_file} is not a pred matrix file"
+                    )
+
+                (size,) = unpack("<I", f.read(4))
+
+                header = loads(f.read(size).decode())
+
+            header["offset"] = len(MATRIX_MAGIC) + 4 + size
+
+            return header
+
+        except Exception as e:
+            raise e
+
+    def get_row_ranges(self, n_parts):
+        """
+        Method Name :   get_row_ranges
+        Description :   This method splits the rows of the pred matrix file into at most n_parts disjoint ranges
+
+        Output      :   A list of start and stop row tuples is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            rows = self.get_matrix_header()["rows"]
+
+            bounds = np.linspace(0, rows, min(n_parts, rows) + 1).astype(int)
+
+            return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+        except Exception as e:
+            raise e
+
+    def get_matrix(self, start=0, stop=None):
+        """
+        Method Name :   get_matrix
+        Description :   This method memory maps the rows from start to stop of the pred matrix file. Rows without
+                        missing values are returned without copying, otherwise the null codes are turned to nan
+
+        Output      :   A pandas dataframe is returned
+        On Failure  :   Write an exception log and then raise exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_matrix.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            header = self.get_matrix_header()
+
+            stop = header["rows"] if stop is None else stop
+
+            columns = header["columns"]
+
+            matrix = np.memmap(
+                self.pred_matrix_file,
+                dtype=header["dtype"],
+                mode="r",
+                offset=header["offset"] + start * len(columns),
+                shape=(stop - start, len(columns)),
+            )
+
+            null = matrix == header["null_code"]
+
+            if null.any():
+                df = DataFrame(np.where(null, np.nan, matrix), columns=columns)
+
+            else:
+                df = DataFrame(matrix, columns=columns, copy=False)
+
+            self.log_writer.log(
+                f"Mapped rows {start} to {stop} of {self.pred_matrix_file}", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return df
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
@@ -1,7 +1,7 @@
-from pandas import read_csv
-
+from utils.columnar_cache import Columnar_Cache
 from utils.logger import App_Logger
 from utils.read_params import get_log_dic, read_params
+from utils.train_store import Train_Store
 
 
 class Data_Getter_Train:
@@ -23,6 +23,10 @@ class Data_Getter_Train:
 
         self.log_writer = App_Logger()
 
+        self.columnar_cache = Columnar_Cache()
+
+        self.train_store = Train_Store()
+
     def get_data(self):
         """
         Method Name :   get_data
@@ -41,11 +45,18 @@ class Data_Getter_Train:
         self.log_writer.start_log("start", **log_dic)
 
         try:
+            if self.config["train_store"]["enabled"] is True:
+                df = self.train_store.get_data(self.log_file)
+
+                self.log_writer.start_log("exit", **log_dic)
+
+                return df
+
             self.log_writer.log("Reading train input csv file", **log_dic)
 
             f = self.train_input_dir + "/" + self.train_csv_file
 
-            df = read_csv(f)
+            df = self.columnar_cache.read_csv(f, self.log_file)
 
             self.log_writer.log("Read the train input csv file", **log_dic)
 
@@ -1,7 +1,5 @@
 import numpy as np
-from pandas import DataFrame
-from sklearn.impute import KNNImputer
-from sklearn.preprocessing import LabelEncoder
+from pandas import DataFrame, Series
 
 from utils.logger import App_Logger
 from utils.read_params import get_log_dic, read_params
@@ -35,10 +33,10 @@ class Preprocessor:
             )
 
             for column in data.columns:
-                count = data[column][data[column] == "?"].count()
+                count = data[column][data[column].isin(["?", "'?'"])].count()
 
                 if count != 0:
-                    data[column] = data[column].replace("?", np.nan)
+                    data[column] = data[column].replace(["?", "'?'"], np.nan)
 
             self.log_writer.log(
                 "Replaced invalid values with null in the dataframe", **log_dic
@@ -87,10 +85,11 @@ class Preprocessor:
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
-    def is_null_present(self, data):
+    def is_null_present(self, data, null_counts=None):
         """
         Method Name :   is_null_present
-        Description :   This method checks whether there are null values present in the pandas Dataframe or not.
+        Description :   This method checks whether there are null values present in the pandas Dataframe or not. The null
+                        counts of the data profile can be given, so the dataframe is not scanned again
         
         Output      :   If null values are present in the dataframe, a csv file is created and then uploaded back to input files bucket
         On Failure  :   Write an exception log and then raise an exception
@@ -112,27 +111,17 @@ class Preprocessor:
                 "Checking whether null values are present in the dataframe", **log_dic
             )
 
-            null_present = False
+            if null_counts is None:
+                self.null_counts = data.isna().sum()
 
-            cols_with_missing_values = []
-
-            cols = data.columns
-
-            self.null_counts = data.isna().sum()
-
-            self.log_writer.log(
-                f"Got null value count as {self.null_counts}", **log_dic
-            )
+            else:
+                self.null_counts = Series(null_counts).reindex(
+                    data.columns, fill_value=0
+                )
 
             self.log_writer.log(f"Null values count is : {self.null_counts}", **log_dic)
 
-            for i in range(len(self.null_counts)):
-                if self.null_counts[i] > 0:
-                    null_present = True
-
-                    cols_with_missing_values.append(cols[i])
-
-            self.log_writer.log("Created cols with missing values", **log_dic)
+            null_present = bool((self.null_counts > 0).any())
 
             if null_present is True:
                 self.log_writer.log(
@@ -144,9 +133,9 @@ class Preprocessor:
 
                 self.null_df["columns"] = data.columns
 
-                self.null_df["missing values count"] = np.asarray(data.isna().sum())
+                self.null_df["missing values count"] = self.null_counts.values
 
-                self.log_writer.log("Created dataframe with null values", self.log_file)
+                self.log_writer.log("Created dataframe with null values", **log_dic)
 
                 self.null_df.to_csv(self.null_values_file, index=None, header=True)
 
@@ -192,6 +181,8 @@ class Preprocessor:
         try:
             self.log_writer.log("Imputing missing values in the dataframe", **log_dic)
 
+            from sklearn.impute import KNNImputer
+
             imputer = KNNImputer(missing_values=np.nan, **self.knn_params)
 
             self.log_writer.log(f"Initialized {imputer.__class__.__name__}", **log_dic)
@@ -236,6 +227,8 @@ class Preprocessor:
                 "Started encoding target columns in the dataframe", **log_dic
             )
 
+            from sklearn.preprocessing import LabelEncoder
+
             label_encoder = LabelEncoder()
 
             self.log_writer.log(
@@ -1,7 +1,6 @@
 from os import listdir
 
-from pandas import read_csv
-
+from utils.columnar_cache import Columnar_Cache
 from utils.logger import App_Logger
 from utils.read_params import get_log_dic, read_params
 
@@ -16,6 +15,8 @@ class Data_Transform_Pred:
 
         self.log_writer = App_Logger()
 
+        self.columnar_cache = Columnar_Cache()
+
     def add_quotes_to_string_values_in_column(self):
         """
         Method Name :   add_quotes_to_string_values_in_column
@@ -46,23 +47,28 @@ class Data_Transform_Pred:
             for file in onlyfiles:
                 f = self.good_data_dir + "/" + file
 
-                data = read_csv(f)
+                data = self.columnar_cache.read_csv(f, self.pred_data_transform_log)
 
                 self.log_writer.log(f"Read {f} csv file", **log_dic)
 
+                changed = False
+
                 for column in data.columns:
                     count = data[column][data[column] == "?"].count()
 
                     if count != 0:
                         data[column] = data[column].replace("?", "'?'")
 
+                        changed = True
+
                         self.log_writer.log(
                             "Replacing '?' to " "?" " in the dataframe", **log_dic
                         )
 
-                data.to_csv(f, index=None, header=True)
+                if changed:
+                    self.columnar_cache.to_csv(data, f, self.pred_data_transform_log)
 
-                self.log_writer.log("Converted dataframe to csv file", **log_dic)
+                    self.log_writer.log("Converted dataframe to csv file", **log_dic)
 
             self.log_writer.log("Added quotes to string values in columns", **log_dic)
 
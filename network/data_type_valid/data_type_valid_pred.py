@@ -1,4 +1,7 @@
+import pandas as pd
+
 from network.mongodb_operations.mongo_operations import MongoDB_Operation
+from utils.columnar_cache import Columnar_Cache
 from utils.logger import App_Logger
 from utils.main_utils import Main_Utils
 from utils.read_params import get_log_dic, read_params
@@ -31,10 +34,15 @@ class DB_Operation_Pred:
 
         self.log_writer = App_Logger()
 
-    def insert_good_data_as_record(self, good_data_db_name, good_data_collection_name):
+        self.columnar_cache = Columnar_Cache()
+
+    def insert_good_data_as_record(
+        self, good_data_db_name, good_data_collection_name, files=None, batch_id=None
+    ):
         """
         Method Name :   insert_good_data_as_record
-        Description :   This method inserts the good data in MongoDB as collection
+        Description :   This method inserts the good data, or the given good data files, in MongoDB as collection. When
+                        a batch id is given each record is tagged with it
 
         Output      :   A MongoDB collection is created with good data present in it
         On Failure  :   Write an exception log and then raise an exception
@@ -55,9 +63,12 @@ class DB_Operation_Pred:
             self.log_writer.log("Inserting dataframes as records in mongodb", **log_dic)
 
             lst = self.utils.read_csv_from_folder(
-                self.good_data_pred_dir, self.pred_db_insert_log
+                self.good_data_pred_dir, self.pred_db_insert_log, files
             )
 
+            if batch_id is not None:
+                lst = [f.assign(batch_id=batch_id) for f in lst]
+
             [
                 self.mongo.insert_dataframe_as_record(
                     f,
@@ -77,7 +88,9 @@ class DB_Operation_Pred:
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
-    def export_collection_to_csv(self, good_data_db_name, good_data_collection_name):
+    def export_collection_to_csv(
+        self, good_data_db_name, good_data_collection_name, batch_id=None
+    ):
         """
         Method Name :   insert_good_data_as_record
         Description :   This method inserts the good data in MongoDB as collection
@@ -100,17 +113,25 @@ class DB_Operation_Pred:
         try:
             self.log_writer.log("Exporting good data collection as csv file", **log_dic)
 
+            query = None if batch_id is None else {"batch_id": batch_id}
+
             df = self.mongo.get_collection_as_dataframe(
-                good_data_db_name, good_data_collection_name, self.pred_export_csv_log
+                good_data_db_name,
+                good_data_collection_name,
+                self.pred_export_csv_log,
+                query,
             )
 
+            if "batch_id" in df.columns:
+                df = df.drop(columns=["batch_id"])
+
             self.log_writer.log("Got good data collection as dataframe", **log_dic)
 
             self.utils.create_directory(self.pred_input_dir, self.pred_export_csv_log)
 
             export_f = self.pred_input_dir + "/" + self.pred_export_csv_file
 
-            df.to_csv(export_f, index=None, header=True)
+            self.columnar_cache.to_csv(df, export_f, self.pred_export_csv_log)
 
             self.log_writer.log(
                 f"Converted good data collection dataframe to {export_f} csv file name",
@@ -121,3 +142,52 @@ class DB_Operation_Pred:
 
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
+
+    def export_files_to_csv(self, files):
+        """
+        Method Name :   export_files_to_csv
+        Description :   This method writes the given good data files as the pred input csv file, without a round trip
+                        through MongoDB
+
+        Output      :   A csv file stored in input files bucket, containing the good data of the files
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.export_files_to_csv.__name__,
+            __file__,
+            self.pred_export_csv_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            if not files:
+                raise Exception("No good data files to export for prediction")
+
+            lst = self.utils.read_csv_from_folder(
+                self.good_data_pred_dir, self.pred_export_csv_log, files
+            )
+
+            df = pd.concat(lst, ignore_index=True)
+
+            self.utils.create_directory(self.pred_input_dir, self.pred_export_csv_log)
+
+            export_f = self.pred_input_dir + "/" + self.pred_export_csv_file
+
+            self.columnar_cache.to_csv(df, export_f, self.pred_export_csv_log)
+
+            self.log_writer.log(
+                f"Exported {len(df)} rows of {len(files)} good data files to {export_f} csv file",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return len(df)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
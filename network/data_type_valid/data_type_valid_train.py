@@ -1,7 +1,9 @@
 from network.mongodb_operations.mongo_operations import MongoDB_Operation
+from utils.columnar_cache import Columnar_Cache
 from utils.logger import App_Logger
 from utils.main_utils import Main_Utils
 from utils.read_params import get_log_dic, read_params
+from utils.train_store import Train_Store
 
 
 class DB_Operation_Train:
@@ -31,6 +33,12 @@ class DB_Operation_Train:
 
         self.log_writer = App_Logger()
 
+        self.columnar_cache = Columnar_Cache()
+
+        self.train_store = Train_Store()
+
+        self.page_size = self.config["train_store"]["page_size"]
+
     def insert_good_data_as_record(self, good_data_db_name, good_data_collection_name):
         """
         Method Name :   insert_good_data_as_record
@@ -110,7 +118,7 @@ class DB_Operation_Train:
 
             export_f = self.train_input_dir + "/" + self.train_export_csv_file
 
-            df.to_csv(export_f, index=None, header=True)
+            self.columnar_cache.to_csv(df, export_f, self.train_export_csv_log)
 
             self.log_writer.log(
                 f"Converted good data collection dataframe to {export_f} csv file name",
@@ -121,3 +129,112 @@ class DB_Operation_Train:
 
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
+
+    def export_collection_to_store(self, good_data_db_name, good_data_collection_name):
+        """
+        Method Name :   export_collection_to_store
+        Description :   This method appends the documents inserted after the high water mark of the train store to the
+                        store, reading them from MongoDB in pages. When the high water mark document is not in the
+                        collection anymore the collection was rebuilt, so the store is rebuilt from the first document.
+                        The high water mark assumes the collection has a single writer, the train pipeline, so the rows
+                        of the store are checked against the documents of the collection after the export. A mismatch
+                        means documents were committed below the high water mark, and the store is rebuilt once
+
+        Output      :   New good data documents are appended to the train store and the number of rows is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.export_collection_to_store.__name__,
+            __file__,
+            self.train_export_csv_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            from bson import ObjectId
+
+            manifest = self.train_store.get_manifest(self.train_export_csv_log)
+
+            after_id = None
+
+            if manifest["high_water_mark"] is not None:
+                after_id = ObjectId(manifest["high_water_mark"])
+
+                if not self.mongo.has_document(
+                    good_data_db_name,
+                    good_data_collection_name,
+                    after_id,
+                    self.train_export_csv_log,
+                ):
+                    self.log_writer.log(
+                        f"High water mark {after_id} is not in {good_data_collection_name} collection, rebuilding train store",
+                        **log_dic,
+                    )
+
+                    self.train_store.reset(self.train_export_csv_log)
+
+                    after_id = None
+
+            pages = self.mongo.find_pages(
+                good_data_db_name,
+                good_data_collection_name,
+                self.train_export_csv_log,
+                after_id,
+                self.page_size,
+            )
+
+            rows = self.train_store.append_pages(pages, self.train_export_csv_log)
+
+            self.log_writer.log(
+                f"Exported {rows} new documents after {after_id} to train store",
+                **log_dic,
+            )
+
+            for attempt in range(2):
+                n_docs = self.mongo.count_documents(
+                    good_data_db_name,
+                    good_data_collection_name,
+                    self.train_export_csv_log,
+                )
+
+                store_rows = self.train_store.get_manifest(self.train_export_csv_log)[
+                    "rows"
+                ]
+
+                if store_rows == n_docs:
+                    break
+
+                if attempt == 1:
+                    raise Exception(
+                        f"Train store has {store_rows} rows after a rebuild but {good_data_collection_name} collection has {n_docs} documents, it is written while exporting"
+                    )
+
+                self.log_writer.log(
+                    f"Train store has {store_rows} rows but {good_data_collection_name} collection has {n_docs} documents, rebuilding train store",
+                    **log_dic,
+                )
+
+                self.train_store.reset(self.train_export_csv_log)
+
+                rows = self.train_store.append_pages(
+                    self.mongo.find_pages(
+                        good_data_db_name,
+                        good_data_collection_name,
+                        self.train_export_csv_log,
+                        None,
+                        self.page_size,
+                    ),
+                    self.train_export_csv_log,
+                )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return rows
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
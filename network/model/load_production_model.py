@@ -1,6 +1,8 @@
 from shutil import copy
 
+from utils.drift_monitor import Drift_Monitor
 from utils.logger import App_Logger
+from utils.model_registry import Model_Registry
 from utils.model_utils import Model_Utils
 from utils.read_params import get_log_dic, read_params
 
@@ -13,8 +15,12 @@ class Load_Prod_Model:
 
         self.model_utils = Model_Utils()
 
+        self.model_registry = Model_Registry()
+
         self.load_prod_model_log = self.config["log"]["load_prod_model"]
 
+        self.drift_monitor = Drift_Monitor(self.load_prod_model_log)
+
     def load_production_model(self, trained_model_list):
         """
         Method Name :   load_production_model
@@ -81,6 +87,8 @@ class Load_Prod_Model:
                         f"Copied {trained_model_file} to {prod_model_file}", **log_dic
                     )
 
+                    self.update_prod_pointer(trained_model_list, model, prod_model_file)
+
                 else:
                     stag_model_file = self.model_utils.get_model_file(
                         model, "stag", self.load_prod_model_log
@@ -101,3 +109,65 @@ class Load_Prod_Model:
 
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
+
+    def update_prod_pointer(self, trained_model_list, best_model, prod_model_file):
+        """
+        Method Name :   update_prod_pointer
+        Description :   This method saves a memory mappable copy of the best model to the shared model folder and then 
+                        points the model registry to it. Serving workers watch the registry and hot-swap to the new model
+        
+        Output      :   Shared model is saved and the production pointer is updated in the model registry
+        On Failure  :   Write an exception log and then raise an exception
+        
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.update_prod_pointer.__name__,
+            __file__,
+            self.load_prod_model_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            model = [tm[1] for tm in trained_model_list if tm[2] == best_model][0]
+
+            version = (
+                self.model_registry.get_registry(self.load_prod_model_log)["version"]
+                + 1
+            )
+
+            shared_model_file = self.model_utils.save_shared_model(
+                model, version, self.load_prod_model_log
+            )
+
+            reference_file = self.drift_monitor.promote_reference(version)
+
+            cascade_file = self.model_utils.promote_cascade(
+                best_model, version, self.load_prod_model_log
+            )
+
+            feature_selection = self.model_registry.get_manifest(
+                best_model, self.load_prod_model_log
+            ).get("feature_selection")
+
+            self.model_registry.set_prod_pointer(
+                best_model,
+                prod_model_file,
+                shared_model_file,
+                self.load_prod_model_log,
+                reference_file,
+                cascade_file,
+                (feature_selection or {}).get("features"),
+            )
+
+            self.log_writer.log(
+                f"Updated production pointer to {best_model} model", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
@@ -0,0 +1,265 @@
+from pandas import DataFrame, to_numeric
+
+from network.model.shadow_scorer import Shadow_Scorer
+from utils.cascade_model import Cascade_Model
+from utils.drift_monitor import Drift_Monitor
+from utils.logger import App_Logger
+from utils.main_utils import Main_Utils
+from utils.model_registry import Model_Registry
+from utils.model_utils import Model_Utils
+from utils.read_params import get_log_dic, read_params
+from utils.service_metrics import Service_Metrics
+from utils.shared_tree_model import Shared_Tree_Model
+
+
+class Model_Server:
+    """
+    Description :   This class is used for online scoring inside a serving worker. The production model is memory mapped
+                    from the shared model folder, so all the workers share one copy of the model arrays, and it is
+                    hot-swapped whenever the production pointer in the model registry changes. Requests only need the
+                    features the production model was trained on. With anytime inference, tree ensembles stop
+                    evaluating trees once the vote of a row is decided or the budget of the request runs out
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    def __init__(self):
+        self.config = read_params()
+
+        self.model_server_log = self.config["log"]["model_server"]
+
+        self.pred_schema_file = self.config["schema_file"]["pred_schema_file"]
+
+        self.cascade_config = self.config["cascade"]
+
+        self.anytime_config = self.config["anytime_inference"]
+
+        self.log_writer = App_Logger()
+
+        self.utils = Main_Utils()
+
+        self.model_utils = Model_Utils()
+
+        self.model_registry = Model_Registry()
+
+        self.drift_monitor = Drift_Monitor(self.model_server_log)
+
+        self.shadow_scorer = Shadow_Scorer()
+
+        self.model = None
+
+        self.reference_file = None
+
+        self.features = None
+
+        self.model_version = None
+
+        self.registry_stamp = None
+
+        self.columns = list(
+            self.utils.read_json(self.pred_schema_file, self.model_server_log)[
+                "ColName"
+            ].keys()
+        )
+
+    def refresh_model(self):
+        """
+        Method Name :   refresh_model
+        Description :   This method reads the production pointer from the model registry and maps the shared model file
+                        when the registry version differs from the one being served
+
+        Output      :   Production model of the current registry version is loaded
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.refresh_model.__name__,
+            __file__,
+            self.model_server_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            pointer = self.model_registry.get_prod_pointer(self.model_server_log)
+
+            if pointer is None:
+                raise Exception(
+                    "No production model found in model registry, train the models first"
+                )
+
+            if pointer["version"] != self.model_version:
+                with Service_Metrics.model_load_time.labels("shared").time():
+                    model = self.model_utils.load_shared_model(
+                        pointer["shared_model_file"], self.model_server_log
+                    )
+
+                    if self.cascade_config["serve"] is True and pointer.get(
+                        "cascade_file"
+                    ):
+                        model = self.model_utils.load_cascade(
+                            pointer["cascade_file"], model, self.model_server_log
+                        )
+
+                self.model = model
+
+                self.model_version = pointer["version"]
+
+                self.reference_file = pointer.get("reference_file")
+
+                self.features = pointer.get("features") or self.columns
+
+                self.log_writer.log(
+                    f"Serving {pointer['model_name']} model with version {self.model_version}",
+                    **log_dic,
+                )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_model(self):
+        """
+        Method Name :   get_model
+        Description :   This method returns the production model, the registry file is only stat-ed on each call and the
+                        model is refreshed when the registry file has changed. It is on the online path so it does not log
+
+        Output      :   Production model is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            stamp = self.model_registry.get_registry_stamp()
+
+            if stamp != self.registry_stamp or self.model is None:
+                self.refresh_model()
+
+                self.registry_stamp = stamp
+
+            return self.model
+
+        except Exception as e:
+            raise e
+
+    def get_data(self, records):
+        """
+        Method Name :   get_data
+        Description :   This method checks that every online record has a numeric value for each of the features of
+                        the production model and builds the dataframe to score. Records with missing features or non
+                        numeric values are rejected before the model is called. It is on the online path so it does
+                        not log
+
+        Output      :   A dataframe of the records with the model features is returned
+        On Failure  :   Raise a value error for invalid records
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            if isinstance(records, dict):
+                records = [records]
+
+            if (
+                not isinstance(records, list)
+                or len(records) == 0
+                or not all(isinstance(r, dict) for r in records)
+            ):
+                raise ValueError(
+                    "Records must be a json object or a list of json objects"
+                )
+
+            for i, record in enumerate(records):
+                missing = [c for c in self.features if c not in record]
+
+                if missing:
+                    raise ValueError(f"Record {i} is missing features {missing}")
+
+            data = DataFrame(records, columns=self.features)
+
+            numeric = data.apply(to_numeric, errors="coerce")
+
+            invalid = numeric.isna()
+
+            if invalid.values.any():
+                i = int(invalid.any(axis=1).values.argmax())
+
+                raise ValueError(
+                    f"Record {i} has non numeric values for features {list(data.columns[invalid.iloc[i].values])}"
+                )
+
+            return numeric
+
+        except Exception as e:
+            raise e
+
+    def predict(self, records):
+        """
+        Method Name :   predict
+        Description :   This method scores the online records with the production model, adds them to the drift
+                        window of the worker and hands a sample of them to the shadow scorer. Shared tree models are
+                        scored with anytime inference when it is enabled, and the rows whose vote was not decided
+                        within the budget are flagged as approximate. Invalid records raise a value error. It is on the
+                        online path so it does not log
+
+        Output      :   A tuple of the list of predictions and the list of approximate flags is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            model = self.get_model()
+
+            data = self.get_data(records)
+
+            if self.anytime_config["enabled"] is True and isinstance(
+                model, Shared_Tree_Model
+            ):
+                labels, approximate, trees = model.predict_anytime(
+                    data,
+                    self.anytime_config["max_trees"],
+                    self.anytime_config["time_budget_ms"],
+                    self.anytime_config["block_trees"],
+                )
+
+                Service_Metrics.anytime_rows.labels("approximate").inc(
+                    int(approximate.sum())
+                )
+
+                Service_Metrics.anytime_rows.labels("exact").inc(
+                    int((~approximate).sum())
+                )
+
+                Service_Metrics.anytime_trees.inc(int(trees.sum()))
+
+            else:
+                labels, approximate = model.predict(data), [False] * len(data)
+
+            predictions = [int(p) for p in labels]
+
+            Service_Metrics.prediction_rows.labels("predict_online").inc(len(data))
+
+            if isinstance(model, Cascade_Model):
+                Service_Metrics.cascade_rows.labels("escalated").inc(
+                    model.last_escalated
+                )
+
+                Service_Metrics.cascade_rows.labels("first_stage").inc(
+                    len(data) - model.last_escalated
+                )
+
+            self.drift_monitor.observe(data, self.reference_file)
+
+            self.shadow_scorer.submit(data, predictions, self.model_version)
+
+            return predictions, [bool(a) for a in approximate]
+
+        except Exception as e:
+            raise e
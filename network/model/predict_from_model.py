@@ -1,10 +1,20 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
 from pandas import DataFrame
 
 from network.data_ingestion.data_loader_prediction import Data_Getter_Pred
 from network.data_preprocessing.preprocessing import Preprocessor
+from utils.cascade_model import Cascade_Model
+from utils.data_profiler import Data_Profiler
+from utils.drift_monitor import Drift_Monitor
 from utils.logger import App_Logger
+from utils.model_registry import Model_Registry
 from utils.model_utils import Model_Utils
 from utils.read_params import get_log_dic, read_params
+from utils.service_metrics import Service_Metrics
+from utils.stage_profiler import Stage_Profiler
 
 
 class Prediction:
@@ -15,6 +25,10 @@ class Prediction:
 
         self.predictions_csv_file = self.config["pred_output_file"]
 
+        self.pred_matrix_config = self.config["pred_matrix"]
+
+        self.cascade_config = self.config["cascade"]
+
         self.log_writer = App_Logger()
 
         self.data_getter_pred = Data_Getter_Pred(self.pred_log)
@@ -23,7 +37,15 @@ class Prediction:
 
         self.model_utils = Model_Utils()
 
-    def predict_from_model(self):
+        self.model_registry = Model_Registry()
+
+        self.profiler = Stage_Profiler()
+
+        self.data_profiler = Data_Profiler(self.pred_log)
+
+        self.drift_monitor = Drift_Monitor(self.pred_log)
+
+    def predict_from_model(self, batch_id=None):
         """
         Method Name :   predict_from_model
         Description :   This method is responsible for using the trained model and get predictions based on the prediction data
@@ -45,23 +67,87 @@ class Prediction:
 
         try:
             self.log_writer.log(
-                "Started getting predictions based on prediction data", **log_dic
+                f"Started getting predictions based on prediction data of batch {batch_id}",
+                **log_dic,
+            )
+
+            profile_name = batch_id or "pred_" + datetime.now().strftime(
+                "%Y%m%d_%H%M%S"
             )
 
-            data = self.data_getter_pred.get_data()
+            matrix_rows = None
 
-            data = self.preprocessor.replace_invalid_values_with_null(data)
+            if self.pred_matrix_config["enabled"] is True:
+                with self.profiler.stage("read") as stage:
+                    matrix_rows = self.data_getter_pred.write_matrix()
 
-            is_null_present = self.preprocessor.is_null_present(data)
+                    stage["rows"] = matrix_rows
 
-            if is_null_present:
-                data = self.preprocessor.impute_missing_values(data)
+            if matrix_rows is not None:
+                ranges = self.data_getter_pred.get_row_ranges(
+                    self.pred_matrix_config["workers"]
+                )
 
-            prod_model_file = self.model_utils.get_prod_model_file(self.pred_log)
+                with self.profiler.stage(
+                    "predict", rows=matrix_rows, files=len(ranges)
+                ):
+                    if len(ranges) > 1:
+                        with ProcessPoolExecutor(
+                            len(ranges), mp_context=get_context("spawn")
+                        ) as executor:
+                            parts = list(executor.map(predict_row_range, *zip(*ranges)))
 
-            prod_model = self.model_utils.load_model(prod_model_file, self.pred_log)
+                    else:
+                        parts = [self.predict_rows(*r) for r in ranges]
 
-            result = list(prod_model.predict(data))
+                result = [p for part, _ in parts for p in part]
+
+                with self.profiler.stage("quality_profile", rows=len(result)):
+                    data_profile = self.data_profiler.merge([p for _, p in parts])
+
+                    self.data_profiler.save(data_profile, profile_name)
+
+            else:
+                with self.profiler.stage("read") as stage:
+                    data = self.data_getter_pred.get_data()
+
+                    stage["rows"] = len(data)
+
+                data = self.preprocessor.replace_invalid_values_with_null(data)
+
+                with self.profiler.stage("quality_profile", rows=len(data)):
+                    data_profile = self.data_profiler.profile_chunk(data)
+
+                    profile = self.data_profiler.save(data_profile, profile_name)
+
+                with self.profiler.stage("impute", rows=len(data)):
+                    is_null_present = self.preprocessor.is_null_present(
+                        data, profile["null_counts"]
+                    )
+
+                    if is_null_present:
+                        data = self.preprocessor.impute_missing_values(data)
+
+                prod_model = self.get_prod_model()
+
+                data = self.select_prod_features(data)
+
+                with self.profiler.stage("predict", rows=len(data)):
+                    result = list(prod_model.predict(data))
+
+                self.log_cascade(prod_model, len(data))
+
+            with self.profiler.stage("drift_check", rows=len(result)):
+                pointer = self.model_registry.get_prod_pointer(self.pred_log)
+
+                self.drift_monitor.check(
+                    data_profile,
+                    profile_name,
+                    "batch",
+                    (pointer or {}).get("reference_file"),
+                )
+
+            Service_Metrics.prediction_rows.labels("predict").inc(len(result))
 
             self.log_writer.log(
                 "Used model in production to get predictions", **log_dic
@@ -71,7 +157,8 @@ class Prediction:
 
             self.log_writer.log("Created dataframe for the predictions", **log_dic)
 
-            result.to_csv(self.predictions_csv_file, index=None, header=True)
+            with self.profiler.stage("write", rows=len(result), files=1):
+                result.to_csv(self.predictions_csv_file, index=None, header=True)
 
             self.log_writer.log(
                 "Prediction are made using the trained model and results are stored in csv file",
@@ -84,3 +171,158 @@ class Prediction:
 
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
+
+    def get_prod_model(self):
+        """
+        Method Name :   get_prod_model
+        Description :   This method loads the model in production, wrapped in its cascade when cascade.serve is set and
+                        the model has a cascade
+
+        Output      :   Model in production is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_prod_model.__name__,
+            __file__,
+            self.pred_log,
+        )
+
+        try:
+            prod_model_file = self.model_utils.get_prod_model_file(self.pred_log)
+
+            with Service_Metrics.model_load_time.labels("prod").time():
+                model = self.model_utils.load_model(prod_model_file, self.pred_log)
+
+                pointer = self.model_registry.get_prod_pointer(self.pred_log)
+
+                if self.cascade_config["serve"] is True and (pointer or {}).get(
+                    "cascade_file"
+                ):
+                    model = self.model_utils.load_cascade(
+                        pointer["cascade_file"], model, self.pred_log
+                    )
+
+            return model
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def select_prod_features(self, data):
+        """
+        Method Name :   select_prod_features
+        Description :   This method selects the features the model in production was trained on, all the columns are
+                        kept for models trained before feature selection
+
+        Output      :   A dataframe of the features of the model in production is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.select_prod_features.__name__,
+            __file__,
+            self.pred_log,
+        )
+
+        try:
+            pointer = self.model_registry.get_prod_pointer(self.pred_log)
+
+            features = (pointer or {}).get("features")
+
+            if features is None:
+                return data
+
+            return data[features]
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def log_cascade(self, prod_model, n_rows):
+        """
+        Method Name :   log_cascade
+        Description :   This method logs and counts the rows which the cascade escalated to the full model, it does
+                        nothing when the model in production is not served as a cascade
+
+        Output      :   Escalated rows are logged
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.log_cascade.__name__, __file__, self.pred_log
+        )
+
+        try:
+            if not isinstance(prod_model, Cascade_Model):
+                return
+
+            Service_Metrics.cascade_rows.labels("escalated").inc(
+                prod_model.last_escalated
+            )
+
+            Service_Metrics.cascade_rows.labels("first_stage").inc(
+                n_rows - prod_model.last_escalated
+            )
+
+            self.log_writer.log(
+                f"Cascade escalated {prod_model.last_escalated} of {n_rows} rows to the full model",
+                **log_dic,
+            )
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def predict_rows(self, start, stop):
+        """
+        Method Name :   predict_rows
+        Description :   This method maps the rows from start to stop of the pred matrix file, profiles them, imputes the
+                        missing values of those rows when the profile has any and predicts them with the model in
+                        production
+
+        Output      :   A tuple of the list of predictions and the data profile of the rows is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.predict_rows.__name__, __file__, self.pred_log
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            data = self.data_getter_pred.get_matrix(start, stop)
+
+            profile = self.data_profiler.profile_chunk(data)
+
+            if profile["counts"][:, -1].any():
+                data = self.preprocessor.impute_missing_values(data)
+
+            prod_model = self.get_prod_model()
+
+            data = self.select_prod_features(data)
+
+            result = list(prod_model.predict(data))
+
+            self.log_writer.log(f"Predicted rows {start} to {stop}", **log_dic)
+
+            self.log_cascade(prod_model, len(data))
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return result, profile
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+
+def predict_row_range(start, stop):
+    return Prediction().predict_rows(start, stop)
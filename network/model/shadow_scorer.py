@@ -0,0 +1,482 @@
+from datetime import datetime
+from glob import glob
+from json import dump, load
+from multiprocessing import get_context
+from os import getpid, makedirs, nice, replace
+from os.path import basename, join, splitext
+from queue import Empty, Full
+from random import random
+from time import monotonic, perf_counter
+
+import numpy as np
+from pandas import DataFrame
+
+from utils.logger import App_Logger
+from utils.model_registry import Model_Registry
+from utils.model_utils import Model_Utils
+from utils.read_params import get_log_dic, read_params
+from utils.service_metrics import Service_Metrics
+
+
+class Shadow_Scorer:
+    """
+    Description :   This class is used for shadow scoring the staging models on a sample of the online traffic. The
+                    serving worker only puts the sampled rows and the served predictions on a bounded queue without
+                    waiting, and a separate low priority process scores them with the production and staging models.
+                    Batches which do not fit in the queue are dropped, so the production latency does not depend on
+                    the staging models. The agreement rate and the score deltas of each staging model against the
+                    production model are written to the shadow stats of the process
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    def __init__(self):
+        self.config = read_params()
+
+        self.shadow_config = self.config["shadow_scoring"]
+
+        self.shadow_log = self.config["log"]["shadow_scorer"]
+
+        self.stats_dir = self.shadow_config["stats_dir"]
+
+        self.staging_models_dir = join(
+            self.config["dir"]["artifacts"], self.config["model_dir"]["stag"]
+        )
+
+        self.save_format = self.config["save_format"]
+
+        self.log_writer = App_Logger()
+
+        self.model_registry = Model_Registry()
+
+        self.queue = None
+
+        self.process = None
+
+        self.models = {}
+
+        self.prod_model = None
+
+        self.pointer = None
+
+        self.registry_stamp = None
+
+        self.stats = None
+
+    def start(self):
+        """
+        Method Name :   start
+        Description :   This method starts the shadow scoring process of the serving worker with a bounded queue
+
+        Output      :   Shadow scoring process is started
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.start.__name__, __file__, self.shadow_log
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            context = get_context("spawn")
+
+            self.queue = context.Queue(self.shadow_config["queue_size"])
+
+            self.process = context.Process(
+                target=run_shadow_worker, args=(self.queue,), daemon=True
+            )
+
+            self.process.start()
+
+            self.log_writer.log(
+                f"Started shadow scoring process {self.process.pid} with sample rate {self.shadow_config['sample_rate']}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def submit(self, data, predictions, model_version):
+        """
+        Method Name :   submit
+        Description :   This method samples the online request for shadow scoring and puts it on the queue without
+                        waiting. The shadow process is started on the first sampled request. It is on the online path
+                        so it does not log
+
+        Output      :   True is returned when the request was queued
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            if self.shadow_config["enabled"] is not True:
+                return False
+
+            if random() >= self.shadow_config["sample_rate"]:
+                return False
+
+            if self.process is None or not self.process.is_alive():
+                self.start()
+
+            try:
+                self.queue.put_nowait(
+                    (
+                        data.to_numpy(),
+                        list(data.columns),
+                        np.asarray(predictions),
+                        model_version,
+                    )
+                )
+
+            except Full:
+                Service_Metrics.shadow_requests.labels("dropped").inc()
+
+                return False
+
+            Service_Metrics.shadow_requests.labels("queued").inc()
+
+            return True
+
+        except Exception as e:
+            raise e
+
+    def refresh_models(self):
+        """
+        Method Name :   refresh_models
+        Description :   This method loads the production model and the staging models when the production pointer has
+                        changed, and starts new stats for the production version. The staging copy of the production
+                        model itself is skipped. Models are limited to one thread so the shadow process uses at most one
+                        core
+
+        Output      :   Production and staging models are loaded
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.refresh_models.__name__,
+            __file__,
+            self.shadow_log,
+        )
+
+        try:
+            stamp = self.model_registry.get_registry_stamp()
+
+            if stamp == self.registry_stamp:
+                return
+
+            self.registry_stamp = stamp
+
+            pointer = self.model_registry.get_prod_pointer(self.shadow_log)
+
+            if pointer is None or (
+                self.pointer is not None
+                and pointer["version"] == self.pointer["version"]
+            ):
+                return
+
+            self.log_writer.start_log("start", **log_dic)
+
+            model_utils = Model_Utils()
+
+            self.prod_model = model_utils.load_shared_model(
+                pointer["shared_model_file"], self.shadow_log
+            )
+
+            self.models = {}
+
+            for model_file in sorted(
+                glob(join(self.staging_models_dir, "*" + self.save_format))
+            ):
+                model_name = splitext(basename(model_file))[0]
+
+                if model_name == pointer["model_name"]:
+                    continue
+
+                model = model_utils.load_model(model_file, self.shadow_log)
+
+                if hasattr(model, "n_jobs"):
+                    model.n_jobs = 1
+
+                self.models[model_name] = model
+
+            self.pointer = pointer
+
+            self.stats = {
+                "pid": getpid(),
+                "production_model": pointer["model_name"],
+                "production_version": pointer["version"],
+                "started_at": datetime.now().isoformat(),
+                "batches": 0,
+                "rows": 0,
+                "models": {
+                    m: {
+                        "rows": 0,
+                        "agreements": 0,
+                        "abs_delta_sum": 0.0,
+                        "delta_sum": 0.0,
+                        "max_abs_delta": 0.0,
+                        "scoring_sec": 0.0,
+                    }
+                    for m in self.models
+                },
+            }
+
+            self.log_writer.log(
+                f"Shadow scoring {list(self.models)} against {pointer['model_name']} model with version {pointer['version']}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def score(self, values, columns, predictions, model_version):
+        """
+        Method Name :   score
+        Description :   This method scores a queued batch with the staging models and adds the agreement with the served
+                        predictions and the deltas of the positive class score from the production model to the stats.
+                        Batches served by another production version than the loaded one are skipped, and so are the
+                        staging models trained on features which the online requests do not carry
+
+        Output      :   True is returned when the batch was scored
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.score.__name__, __file__, self.shadow_log
+        )
+
+        try:
+            self.refresh_models()
+
+            if self.pointer is None or model_version != self.pointer["version"]:
+                return False
+
+            data = DataFrame(values, columns=columns)
+
+            prod_score = self.prod_model.predict_proba(data)[:, -1]
+
+            for model_name, model in self.models.items():
+                features = list(getattr(model, "feature_names_in_", data.columns))
+
+                if not set(features) <= set(data.columns):
+                    continue
+
+                start = perf_counter()
+
+                shadow_predictions = model.predict(data[features])
+
+                delta = model.predict_proba(data[features])[:, -1] - prod_score
+
+                stats = self.stats["models"][model_name]
+
+                stats["scoring_sec"] += perf_counter() - start
+
+                stats["rows"] += len(data)
+
+                stats["agreements"] += int((shadow_predictions == predictions).sum())
+
+                stats["abs_delta_sum"] += float(np.abs(delta).sum())
+
+                stats["delta_sum"] += float(delta.sum())
+
+                stats["max_abs_delta"] = max(
+                    stats["max_abs_delta"], float(np.abs(delta).max())
+                )
+
+            self.stats["batches"] += 1
+
+            self.stats["rows"] += len(data)
+
+            return True
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def write_stats(self):
+        """
+        Method Name :   write_stats
+        Description :   This method writes the shadow stats of the process with a temporary file and an atomic rename
+
+        Output      :   Shadow stats are written
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.write_stats.__name__,
+            __file__,
+            self.shadow_log,
+        )
+
+        try:
+            if self.stats is None:
+                return
+
+            makedirs(self.stats_dir, exist_ok=True)
+
+            self.stats["updated_at"] = datetime.now().isoformat()
+
+            stats_file = join(self.stats_dir, f"shadow_{getpid()}.json")
+
+            with open(stats_file + ".tmp", "w") as f:
+                dump(self.stats, f, indent=4)
+
+            replace(stats_file + ".tmp", stats_file)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def run(self, queue):
+        """
+        Method Name :   run
+        Description :   This method is the loop of the shadow scoring process. It lowers its own priority, scores the
+                        queued batches and writes the stats every flush_interval seconds when they have changed. A batch
+                        which fails to score is logged and skipped
+
+        Output      :   Runs until the serving worker exits
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.run.__name__, __file__, self.shadow_log
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            nice(self.shadow_config["nice"])
+
+            flush_interval = self.shadow_config["flush_interval"]
+
+            last_flush, changed = monotonic(), False
+
+            while True:
+                try:
+                    item = queue.get(timeout=flush_interval)
+
+                except Empty:
+                    item = None
+
+                if item is not None:
+                    try:
+                        changed |= self.score(*item) is True
+
+                    except Exception as e:
+                        self.log_writer.log(f"Skipped shadow batch as {e}", **log_dic)
+
+                if changed and monotonic() - last_flush >= flush_interval:
+                    self.write_stats()
+
+                    last_flush, changed = monotonic(), False
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_stats(self):
+        """
+        Method Name :   get_stats
+        Description :   This method merges the shadow stats of all the shadow processes for the latest production version
+                        and computes the agreement rate and the mean score deltas of each staging model
+
+        Output      :   Shadow stats are returned as dict, None if there are no stats
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_stats.__name__, __file__, self.shadow_log
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            stats_lst = []
+
+            for stats_file in glob(join(self.stats_dir, "shadow_*.json")):
+                with open(stats_file, "r") as f:
+                    stats_lst.append(load(f))
+
+            if not stats_lst:
+                return None
+
+            version = max(s["production_version"] for s in stats_lst)
+
+            stats_lst = [s for s in stats_lst if s["production_version"] == version]
+
+            merged = {
+                "production_model": stats_lst[0]["production_model"],
+                "production_version": version,
+                "sample_rate": self.shadow_config["sample_rate"],
+                "processes": len(stats_lst),
+                "batches": sum(s["batches"] for s in stats_lst),
+                "rows": sum(s["rows"] for s in stats_lst),
+                "models": {},
+            }
+
+            for stats in stats_lst:
+                for model_name, model_stats in stats["models"].items():
+                    total = merged["models"].setdefault(
+                        model_name,
+                        {
+                            "rows": 0,
+                            "agreements": 0,
+                            "abs_delta_sum": 0.0,
+                            "delta_sum": 0.0,
+                            "max_abs_delta": 0.0,
+                            "scoring_sec": 0.0,
+                        },
+                    )
+
+                    for key in (
+                        "rows",
+                        "agreements",
+                        "abs_delta_sum",
+                        "delta_sum",
+                        "scoring_sec",
+                    ):
+                        total[key] += model_stats[key]
+
+                    total["max_abs_delta"] = max(
+                        total["max_abs_delta"], model_stats["max_abs_delta"]
+                    )
+
+            for total in merged["models"].values():
+                rows = total["rows"]
+
+                total["agreement_rate"] = total["agreements"] / rows if rows else None
+
+                total["mean_abs_delta"] = (
+                    total["abs_delta_sum"] / rows if rows else None
+                )
+
+                total["mean_delta"] = total["delta_sum"] / rows if rows else None
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return merged
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+
+def run_shadow_worker(queue):
+    Shadow_Scorer().run(queue)
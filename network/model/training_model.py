@@ -1,8 +1,14 @@
+from datetime import datetime, timedelta
+
 from network.data_ingestion.data_loader_train import Data_Getter_Train
 from network.data_preprocessing.preprocessing import Preprocessor
 from network.model_finder.tuner import Model_Finder
+from utils.data_profiler import Data_Profiler
+from utils.drift_monitor import Drift_Monitor
 from utils.logger import App_Logger
+from utils.model_registry import Model_Registry
 from utils.read_params import get_log_dic, read_params
+from utils.stage_profiler import Stage_Profiler
 
 
 class Train_Model:
@@ -13,6 +19,8 @@ class Train_Model:
 
         self.target_col = self.config["target_col"]
 
+        self.inc_config = self.config["incremental_training"]
+
         self.log_writer = App_Logger()
 
         self.data_getter_train = Data_Getter_Train(self.model_train_log)
@@ -21,6 +29,81 @@ class Train_Model:
 
         self.tuner = Model_Finder(self.model_train_log)
 
+        self.model_registry = Model_Registry()
+
+        self.profiler = Stage_Profiler()
+
+        self.data_profiler = Data_Profiler(self.model_train_log)
+
+        self.drift_monitor = Drift_Monitor(self.model_train_log)
+
+    def get_training_mode(self, n_rows):
+        """
+        Method Name :   get_training_mode
+        Description :   This method decides between a full search and incremental training. A full search is done when
+                        incremental training is disabled, on the first training, when the full search interval has
+                        passed, when drift was detected or when no new rows have arrived
+        
+        Output      :   A tuple of training mode and rows seen by the last training is returned
+        On Failure  :   Write an exception log and then raise an exception
+        
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_training_mode.__name__,
+            __file__,
+            self.model_train_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            registry = self.model_registry.get_registry(self.model_train_log)
+
+            state = registry["training"]
+
+            rows_seen = state.get("rows_seen", 0)
+
+            models_lst = list(self.config["train_model"].keys())
+
+            mode = "full"
+
+            if self.inc_config["enabled"] is not True:
+                reason = "incremental training is disabled"
+
+            elif "last_full_search" not in state:
+                reason = "no full search was done yet"
+
+            elif state.get("drift_detected") is True:
+                reason = "drift was detected"
+
+            elif datetime.now() - datetime.fromisoformat(
+                state["last_full_search"]
+            ) > timedelta(days=self.inc_config["full_search_interval_days"]):
+                reason = "full search interval has passed"
+
+            elif n_rows <= rows_seen:
+                reason = "no new rows have arrived"
+
+            elif any(
+                "best_params" not in registry["models"].get(m, {}) for m in models_lst
+            ):
+                reason = "best params are missing for some models"
+
+            else:
+                mode, reason = "incremental", f"{n_rows - rows_seen} new rows arrived"
+
+            self.log_writer.log(f"Training with {mode} mode as {reason}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return mode, rows_seen
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
     def training_model(self):
         """
         Method Name :   training_model
@@ -45,20 +128,71 @@ class Train_Model:
         try:
             self.log_writer.log("Started model training", **log_dic)
 
-            data = self.data_getter_train.get_data()
+            with self.profiler.stage("read") as stage:
+                data = self.data_getter_train.get_data()
+
+                stage["rows"] = len(data)
 
             data = self.preprocessor.replace_invalid_values_with_null(data)
 
-            is_null_present = self.preprocessor.is_null_present(data)
+            with self.profiler.stage("quality_profile", rows=len(data)):
+                data_profile = self.data_profiler.profile_chunk(data)
+
+                profile = self.data_profiler.save(
+                    data_profile, "train_" + datetime.now().strftime("%Y%m%d_%H%M%S")
+                )
+
+                self.drift_monitor.save_reference(data_profile)
+
+            with self.profiler.stage("impute", rows=len(data)):
+                is_null_present = self.preprocessor.is_null_present(
+                    data, profile["null_counts"]
+                )
 
-            if is_null_present:
-                data = self.preprocessor.impute_missing_values(data)
+                if is_null_present:
+                    data = self.preprocessor.impute_missing_values(data)
 
             X, Y = self.preprocessor.separate_label_feature(data, self.target_col)
 
             Y = self.preprocessor.encode_target_cols(Y)
 
-            lst = self.tuner.train_and_save_models(X, Y)
+            mode, rows_seen = self.get_training_mode(len(X))
+
+            if mode == "incremental":
+                lst = self.tuner.train_and_save_models(X, Y, rows_seen)
+
+            else:
+                lst = self.tuner.train_and_save_models(X, Y)
+
+            feature_selection = self.tuner.feature_selection
+
+            for model_name in self.config["train_model"]:
+                self.model_registry.update_manifest(
+                    model_name,
+                    {"feature_selection": feature_selection},
+                    self.model_train_log,
+                )
+
+            training_state = {
+                "rows_seen": len(X),
+                "last_mode": mode,
+                "drift_detected": False,
+                "feature_selection": feature_selection,
+            }
+
+            if mode == "full":
+                training_state["last_full_search"] = datetime.now().isoformat()
+
+                training_state["split_boundaries"] = [len(X)]
+
+            else:
+                training_state["split_boundaries"] = self.tuner.get_split_boundaries(
+                    rows_seen
+                ) + [len(X)]
+
+            self.model_registry.update_training_state(
+                training_state, self.model_train_log
+            )
 
             self.log_writer.log("Finished model training", **log_dic)
 
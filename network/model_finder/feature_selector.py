@@ -0,0 +1,261 @@
+import numpy as np
+from sklearn.model_selection import train_test_split
+
+from utils.estimator_registry import Estimator_Registry
+from utils.logger import App_Logger
+from utils.model_registry import Model_Registry
+from utils.read_params import get_log_dic, read_params
+
+
+class Feature_Selector:
+    """
+    Description :   This class shall be used to find the smallest subset of features which keeps the ROC AUC of a probe
+                    model within a tolerance of the ROC AUC with all the features. Features are ranked by the impurity
+                    importance or the permutation importance of the probe model, and the number of top ranked features
+                    is binary searched. All the models are trained on the chosen subset and serving only needs those
+                    columns
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    def __init__(self, log_file):
+        self.log_file = log_file
+
+        self.config = read_params()
+
+        self.selection_config = self.config["feature_selection"]
+
+        self.split_kwargs = self.config["base"]
+
+        self.random_state = self.config["base"]["random_state"]
+
+        self.estimator_registry = Estimator_Registry()
+
+        self.model_registry = Model_Registry()
+
+        self.log_writer = App_Logger()
+
+    def get_probe_score(self, features, train_x, train_y, test_x, test_y):
+        """
+        Method Name :   get_probe_score
+        Description :   This method fits the probe model on the features and scores it on the test data
+
+        Output      :   A tuple of the fitted probe model and its ROC AUC score is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_probe_score.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        try:
+            from sklearn.metrics import roc_auc_score
+
+            probe = self.estimator_registry.get_class(
+                self.selection_config["estimator"], self.log_file
+            )(**self.selection_config["estimator_params"])
+
+            if "random_state" in probe.get_params():
+                probe.set_params(random_state=self.random_state)
+
+            probe.fit(train_x[features], train_y)
+
+            score = roc_auc_score(test_y, probe.predict_proba(test_x[features])[:, -1])
+
+            return probe, float(score)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_ranking(self, probe, test_x, test_y):
+        """
+        Method Name :   get_ranking
+        Description :   This method ranks the features by the impurity importance of the probe model, or by the mean
+                        drop of its ROC AUC when the feature is permuted with method permutation
+
+        Output      :   A dict of feature importances sorted from the most to the least important is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_ranking.__name__, __file__, self.log_file
+        )
+
+        try:
+            if self.selection_config["method"] == "permutation":
+                from sklearn.inspection import permutation_importance
+
+                importances = permutation_importance(
+                    probe,
+                    test_x,
+                    test_y,
+                    scoring="roc_auc",
+                    n_repeats=self.selection_config["n_repeats"],
+                    random_state=self.random_state,
+                ).importances_mean
+
+            else:
+                importances = probe.feature_importances_
+
+            order = np.argsort(-np.asarray(importances), kind="stable")
+
+            return {str(test_x.columns[j]): float(importances[j]) for j in order}
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def select_features(self, X_data, Y_data):
+        """
+        Method Name :   select_features
+        Description :   This method ranks the features on a sample of the train data and binary searches the smallest
+                        number of top ranked features whose probe ROC AUC is within the tolerance of the ROC AUC with all
+                        the features. The chosen features keep the column order of the data
+
+        Output      :   Feature selection report is returned as dict
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.select_features.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            sample_rows = self.selection_config["sample_rows"]
+
+            Y_data = np.asarray(Y_data)
+
+            if len(X_data) > sample_rows:
+                rows = np.random.RandomState(self.random_state).choice(
+                    len(X_data), sample_rows, replace=False
+                )
+
+                X_data, Y_data = X_data.iloc[rows], Y_data[rows]
+
+            train_x, test_x, train_y, test_y = train_test_split(
+                X_data, Y_data, **self.split_kwargs
+            )
+
+            columns = list(X_data.columns)
+
+            probe, baseline = self.get_probe_score(
+                columns, train_x, train_y, test_x, test_y
+            )
+
+            ranking = self.get_ranking(probe, test_x, test_y)
+
+            ranked = list(ranking)
+
+            target = baseline - self.selection_config["tolerance"]
+
+            evaluated = {len(columns): baseline}
+
+            low = min(self.selection_config["min_features"], len(columns))
+
+            high = len(columns)
+
+            while low < high:
+                k = (low + high) // 2
+
+                _, evaluated[k] = self.get_probe_score(
+                    ranked[:k], train_x, train_y, test_x, test_y
+                )
+
+                if evaluated[k] >= target:
+                    high = k
+
+                else:
+                    low = k + 1
+
+            features = [c for c in columns if c in ranked[:high]]
+
+            report = {
+                "method": self.selection_config["method"],
+                "tolerance": self.selection_config["tolerance"],
+                "rows": len(X_data),
+                "baseline_roc_auc": round(baseline, 6),
+                "roc_auc": round(evaluated[high], 6),
+                "features": features,
+                "dropped": [c for c in columns if c not in features],
+                "ranking": {c: round(v, 6) for c, v in ranking.items()},
+                "evaluated": {
+                    str(k): round(v, 6) for k, v in sorted(evaluated.items())
+                },
+            }
+
+            self.log_writer.log(
+                f"Selected {len(features)} of {len(columns)} features with probe roc auc {report['roc_auc']} against {report['baseline_roc_auc']}, dropped {report['dropped']}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return report
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_features(self, X_data, Y_data, mode):
+        """
+        Method Name :   get_features
+        Description :   This method gets the feature subset to train the models on. A full search selects the features
+                        again, while incremental training keeps the features of the previous models, all the features
+                        when they were trained before feature selection. All the features are used when feature
+                        selection is disabled. The report is kept in the training state only once the models are trained
+
+        Output      :   Feature selection report is returned as dict
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_features.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            columns = list(X_data.columns)
+
+            if mode == "incremental":
+                state = self.model_registry.get_registry(self.log_file)["training"]
+
+                report = state.get("feature_selection") or {"features": columns}
+
+                self.log_writer.log(
+                    f"Kept {len(report['features'])} features of the previous models for incremental training",
+                    **log_dic,
+                )
+
+            elif self.selection_config["enabled"] is not True:
+                report = {"method": None, "features": columns, "dropped": []}
+
+            else:
+                report = self.select_features(X_data, Y_data)
+
+            missing = set(report["features"]) - set(columns)
+
+            if missing:
+                raise Exception(f"Features {sorted(missing)} are not in the train data")
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return report
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
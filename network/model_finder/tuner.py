@@ -1,9 +1,16 @@
+from os.path import exists
+
+import numpy as np
+from pandas import concat
 from sklearn.model_selection import train_test_split
 
+from network.model_finder.feature_selector import Feature_Selector
 from utils.logger import App_Logger
 from utils.main_utils import Main_Utils
+from utils.model_registry import Model_Registry
 from utils.model_utils import Model_Utils
 from utils.read_params import get_log_dic, read_params
+from utils.stage_profiler import Stage_Profiler
 
 
 class Model_Finder:
@@ -23,14 +30,23 @@ class Model_Finder:
 
         self.model_utils = Model_Utils()
 
+        self.model_registry = Model_Registry()
+
         self.utils = Main_Utils()
 
+        self.feature_selector = Feature_Selector(self.log_file)
+
+        self.profiler = Stage_Profiler()
+
+        self.feature_selection = None
+
         self.log_writer = App_Logger()
 
     def get_trained_models(self, X_data, Y_data):
         """
         Method Name :   get_trained_models
-        Description :   This methods gets the trained models based on training data
+        Description :   This methods gets the trained models based on training data. The features are selected on the
+                        train split only, so the test rows used to score the models are not seen by feature selection
         
         Output      :   A list of tuple of model and model score are returned
         On Failure  :   Write an exception log and then raise an exception
@@ -54,6 +70,19 @@ class Model_Finder:
                 X_data, Y_data, **self.split_kwargs
             )
 
+            with self.profiler.stage("feature_selection", rows=len(x_train)):
+                self.feature_selection = self.feature_selector.get_features(
+                    x_train, y_train, "full"
+                )
+
+            features = self.feature_selection["features"]
+
+            x_train, x_test = x_train[features], x_test[features]
+
+            data_hash = self.model_utils.train_cache.get_data_hash(
+                x_train, y_train, self.log_file
+            )
+
             lst = [
                 (
                     self.model_utils.get_tuned_model(
@@ -63,6 +92,7 @@ class Model_Finder:
                         x_test,
                         y_test,
                         log_dic["log_file"],
+                        data_hash,
                     )
                 )
                 for model_name in models_lst
@@ -73,10 +103,158 @@ class Model_Finder:
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
-    def train_and_save_models(self, X_data, Y_data):
+    def get_split_boundaries(self, rows_seen):
+        """
+        Method Name :   get_split_boundaries
+        Description :   This methods gets the row counts of the trainings since the last full search, which split the
+                        rows into the chunks each training held out its test rows from. Registries without them fall
+                        back to one chunk of the rows seen, as split by a full search
+
+        Output      :   A list of row counts ending with rows_seen is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_split_boundaries.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        try:
+            state = self.model_registry.get_registry(self.log_file)["training"]
+
+            boundaries = state.get("split_boundaries") or [rows_seen]
+
+            if boundaries[-1] != rows_seen:
+                self.log_writer.log(
+                    f"Split boundaries {boundaries} do not end at {rows_seen} rows seen, using one chunk",
+                    **log_dic,
+                )
+
+                boundaries = [rows_seen]
+
+            return boundaries
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_incremental_models(self, X_data, Y_data, rows_seen):
+        """
+        Method Name :   get_incremental_models
+        Description :   This methods trains the models incrementally from the previously trained models. The collection
+                        is append only, so the rows after rows_seen are the rows which arrived since the last training.
+                        Each chunk of rows between split boundaries is split on its own, so the rows held out by earlier
+                        trainings stay in the test data and only the new rows are split again. The features of the
+                        previous models are kept
+        
+        Output      :   A list of tuple of model and model score are returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_incremental_models.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            models_lst = list(self.config["train_model"].keys())
+
+            self.feature_selection = self.feature_selector.get_features(
+                X_data, Y_data, "incremental"
+            )
+
+            X_data = X_data[self.feature_selection["features"]]
+
+            boundaries = self.get_split_boundaries(rows_seen) + [len(X_data)]
+
+            Y_data = np.asarray(Y_data)
+
+            train_parts, test_parts = [], []
+
+            for start, stop in zip([0] + boundaries[:-1], boundaries):
+                if stop - start < 2:
+                    train_parts.append((X_data.iloc[start:stop], Y_data[start:stop]))
+
+                    continue
+
+                x_tr, x_te, y_tr, y_te = train_test_split(
+                    X_data.iloc[start:stop], Y_data[start:stop], **self.split_kwargs
+                )
+
+                train_parts.append((x_tr, y_tr))
+
+                test_parts.append((x_te, y_te))
+
+            x_train = concat([x for x, _ in train_parts])
+
+            y_train = np.concatenate([y for _, y in train_parts])
+
+            x_test = concat([x for x, _ in test_parts])
+
+            y_test = np.concatenate([y for _, y in test_parts])
+
+            new_rows = np.asarray(x_train.index >= rows_seen)
+
+            self.log_writer.log(
+                f"Got {new_rows.sum()} new train rows after {rows_seen} rows seen",
+                **log_dic,
+            )
+
+            lst = []
+
+            for model_name in models_lst:
+                best_params = self.model_registry.get_manifest(
+                    model_name, self.log_file
+                )["best_params"]
+
+                prev_model_file = self.model_utils.get_model_file(
+                    model_name, "trained", self.log_file
+                )
+
+                prev_model = None
+
+                if exists(prev_model_file):
+                    prev_model = self.model_utils.load_model(
+                        prev_model_file, self.log_file
+                    )
+
+                lst.append(
+                    self.model_utils.get_incremental_model(
+                        model_name,
+                        prev_model,
+                        best_params,
+                        x_train[new_rows],
+                        y_train[new_rows],
+                        x_train,
+                        y_train,
+                        x_test,
+                        y_test,
+                        self.log_file,
+                    )
+                )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return lst
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def train_and_save_models(self, X_data, Y_data, rows_seen=None):
         """
         Method Name :   train_and_save_models
-        Description :   This methods trains and saves all the models based on train data 
+        Description :   This methods trains and saves all the models based on train data. When rows_seen is given the
+                        models are trained incrementally instead of a full search. The feature selection report of the
+                        training is kept in feature_selection. The train cache is evicted once the models are saved
         
         Output      :   Models are trained based on training data,saved to respective folders
         On Failure  :   Write an exception log and then raise an exception
@@ -96,7 +274,11 @@ class Model_Finder:
         try:
             self.utils.create_model_folders(self.log_file)
 
-            lst = self.get_trained_models(X_data, Y_data)
+            if rows_seen is None:
+                lst = self.get_trained_models(X_data, Y_data)
+
+            else:
+                lst = self.get_incremental_models(X_data, Y_data, rows_seen)
 
             self.log_writer.log("Got trained models", **log_dic)
 
@@ -109,6 +291,8 @@ class Model_Finder:
                 "Saved and logged all trained models to mlflow", **log_dic
             )
 
+            self.model_utils.train_cache.evict(self.log_file)
+
             self.log_writer.start_log("exit", **log_dic)
 
             return lst
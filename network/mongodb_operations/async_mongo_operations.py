@@ -0,0 +1,266 @@
+from asyncio import get_running_loop
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from json import loads
+from os import environ
+from time import perf_counter
+
+import pandas as pd
+
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+from utils.service_metrics import Service_Metrics
+
+
+class Async_MongoDB_Operation:
+    """
+    Description :   This class is used for the mongodb operations of the web service. Each blocking pymongo call runs on
+                    a small shared thread pool and is awaited, the way motor wraps pymongo, so the event loop keeps
+                    serving requests while mongodb answers. Query results are streamed in batches as async iterators.
+                    Any pymongo compatible client can be given, like a mongomock client, and MongoDB_Operation stays
+                    the api of the batch jobs
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    executor = None
+
+    def __init__(self, client=None):
+        self.config = read_params()
+
+        self.mongo_config = self.config["mongodb"]
+
+        self.batch_size = self.mongo_config["batch_size"]
+
+        if client is None:
+            from pymongo import MongoClient
+
+            client = MongoClient(environ["MONGODB_URL"])
+
+        self.client = client
+
+        if Async_MongoDB_Operation.executor is None:
+            Async_MongoDB_Operation.executor = ThreadPoolExecutor(
+                self.mongo_config["executor_workers"], thread_name_prefix="mongodb"
+            )
+
+        self.log_writer = App_Logger()
+
+    async def run(self, operation, func, *args, **kwargs):
+        """
+        Method Name :   run
+        Description :   This method runs the blocking call on the mongodb thread pool and records its latency under the
+                        operation name
+
+        Output      :   Result of the call is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        start = perf_counter()
+
+        try:
+            return await get_running_loop().run_in_executor(
+                Async_MongoDB_Operation.executor, partial(func, *args, **kwargs)
+            )
+
+        finally:
+            Service_Metrics.mongo_op_latency.labels(operation).observe(
+                perf_counter() - start
+            )
+
+    def get_next_batch(self, cursor, batch_size):
+        """
+        Method Name :   get_next_batch
+        Description :   This method pulls the next batch of documents from the cursor
+
+        Output      :   A list of at most batch_size documents is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            return list(islice(cursor, batch_size))
+
+        except Exception as e:
+            raise e
+
+    async def find_batches(
+        self,
+        db_name,
+        collection_name,
+        log_file,
+        query=None,
+        projection=None,
+        batch_size=None,
+    ):
+        """
+        Method Name :   find_batches
+        Description :   This method streams the documents of the collection matching the query as an async iterator of
+                        batches, so only one batch is held in memory at a time. The cursor is closed on the thread pool
+                        too, as closing it kills the cursor on the server
+
+        Output      :   Lists of documents are yielded
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.find_batches.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            batch_size = self.batch_size if batch_size is None else batch_size
+
+            collection = self.client[db_name][collection_name]
+
+            cursor = collection.find(query or {}, projection).batch_size(batch_size)
+
+            n_docs = 0
+
+            try:
+                while True:
+                    batch = await self.run(
+                        "find", self.get_next_batch, cursor, batch_size
+                    )
+
+                    if not batch:
+                        break
+
+                    n_docs += len(batch)
+
+                    yield batch
+
+            finally:
+                await self.run("close", cursor.close)
+
+            self.log_writer.log(
+                f"Streamed {n_docs} documents of {collection_name} collection",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    async def count_documents(self, db_name, collection_name, log_file, query=None):
+        """
+        Method Name :   count_documents
+        Description :   This method counts the documents of the collection matching the query
+
+        Output      :   Number of documents is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.count_documents.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            collection = self.client[db_name][collection_name]
+
+            count = await self.run(
+                "count_documents", collection.count_documents, query or {}
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return count
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    async def get_collection_as_dataframe(self, db_name, collection_name, log_file):
+        """
+        Method Name :   get_collection_as_dataframe
+        Description :   This method reads the collection in batches and converts it to dataframe
+
+        Output      :   A pandas dataframe of the collection is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_collection_as_dataframe.__name__,
+            __file__,
+            log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            records = []
+
+            async for batch in self.find_batches(
+                db_name, collection_name, log_file, projection={"_id": 0}
+            ):
+                records.extend(batch)
+
+            df = pd.DataFrame(records)
+
+            self.log_writer.log("Converted collection to dataframe", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return df
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    async def insert_dataframe_as_record(
+        self, data_frame, db_name, collection_name, log_file
+    ):
+        """
+        Method Name :   insert_dataframe_as_record
+        Description :   This method inserts the dataframe as records in database collection in batches
+
+        Output      :   The dataframe is inserted in database collection
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.insert_dataframe_as_record.__name__,
+            __file__,
+            log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            collection = self.client[db_name][collection_name]
+
+            for start in range(0, len(data_frame), self.batch_size):
+                records = list(
+                    loads(
+                        data_frame.iloc[start : start + self.batch_size].T.to_json()
+                    ).values()
+                )
+
+                await self.run("insert_many", collection.insert_many, records)
+
+            self.log_writer.log(
+                f"Inserted {len(data_frame)} records to {collection_name} collection",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
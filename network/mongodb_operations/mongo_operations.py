@@ -2,10 +2,10 @@ from json import loads
 from os import environ
 
 import pandas as pd
-from pymongo import MongoClient
 
 from utils.logger import App_Logger
 from utils.read_params import get_log_dic, read_params
+from utils.service_metrics import Service_Metrics
 
 
 class MongoDB_Operation:
@@ -22,6 +22,8 @@ class MongoDB_Operation:
 
         self.DB_URL = environ["MONGODB_URL"]
 
+        from pymongo import MongoClient
+
         self.client = MongoClient(self.DB_URL)
 
         self.log_writer = App_Logger()
@@ -86,10 +88,13 @@ class MongoDB_Operation:
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
-    def get_collection_as_dataframe(self, db_name, collection_name, log_file):
+    def get_collection_as_dataframe(
+        self, db_name, collection_name, log_file, query=None
+    ):
         """
         Method Name :   get_collection_as_dataframe
-        Description :   This method is used for converting the selected collection to dataframe
+        Description :   This method is used for converting the selected collection, or its documents matching the
+                        query, to dataframe
 
         Output      :   A collection is returned from the selected db_name and collection_name
         On Failure  :   Write an exception log and then raise an exception
@@ -112,7 +117,10 @@ class MongoDB_Operation:
 
             collection = database.get_collection(name=collection_name)
 
-            df = pd.DataFrame(list(collection.find()))
+            with Service_Metrics.mongo_op_latency.labels("find").time():
+                records = list(collection.find(query or {}))
+
+            df = pd.DataFrame(records)
 
             if "_id" in df.columns.to_list():
                 df = df.drop(columns=["_id"], axis=1)
@@ -159,7 +167,8 @@ class MongoDB_Operation:
 
             self.log_writer.log("Inserting records to MongoDB", **log_dic)
 
-            collection.insert_many(records)
+            with Service_Metrics.mongo_op_latency.labels("insert_many").time():
+                collection.insert_many(records)
 
             self.log_writer.log("Inserted records to MongoDB", **log_dic)
 
@@ -167,3 +176,103 @@ class MongoDB_Operation:
 
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
+
+    def find_pages(
+        self, db_name, collection_name, log_file, after_id=None, page_size=10000
+    ):
+        """
+        Method Name :   find_pages
+        Description :   This method reads the documents of the collection with _id above after_id in _id order, one page
+                        of page_size documents per query. Each query starts after the last _id of the previous page, so
+                        the cost of a page does not grow with the documents before it. Paging by _id assumes a single
+                        writer, as a concurrent insert can commit documents with an _id below a page already read
+
+        Output      :   Lists of documents are yielded
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.find_pages.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            collection = self.get_database(db_name, log_file)[collection_name]
+
+            n_docs = 0
+
+            while True:
+                query = {} if after_id is None else {"_id": {"$gt": after_id}}
+
+                with Service_Metrics.mongo_op_latency.labels("find").time():
+                    page = list(collection.find(query).sort("_id", 1).limit(page_size))
+
+                if not page:
+                    break
+
+                after_id = page[-1]["_id"]
+
+                n_docs += len(page)
+
+                yield page
+
+            self.log_writer.log(
+                f"Read {n_docs} documents of {collection_name} collection in pages",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def count_documents(self, db_name, collection_name, log_file):
+        """
+        Method Name :   count_documents
+        Description :   This method counts the documents of the collection
+
+        Output      :   Number of documents in the collection is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.count_documents.__name__, __file__, log_file
+        )
+
+        try:
+            collection = self.get_database(db_name, log_file)[collection_name]
+
+            with Service_Metrics.mongo_op_latency.labels("count_documents").time():
+                return collection.count_documents({})
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def has_document(self, db_name, collection_name, doc_id, log_file):
+        """
+        Method Name :   has_document
+        Description :   This method checks if the document with the _id is in the collection
+
+        Output      :   True if the document is present else False
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.has_document.__name__, __file__, log_file
+        )
+
+        try:
+            collection = self.get_database(db_name, log_file)[collection_name]
+
+            with Service_Metrics.mongo_op_latency.labels("find_one").time():
+                return collection.find_one({"_id": doc_id}, {"_id": 1}) is not None
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
@@ -1,9 +1,8 @@
 from os import listdir
 from re import match, split
-from shutil import copy, move
-
-from pandas import read_csv
 
+from utils.columnar_cache import Columnar_Cache
+from utils.data_stager import Data_Stager
 from utils.logger import App_Logger
 from utils.main_utils import Main_Utils
 from utils.read_params import get_log_dic, read_params
@@ -23,8 +22,12 @@ class Raw_Pred_Data_Validation:
 
         self.log_writer = App_Logger()
 
+        self.columnar_cache = Columnar_Cache()
+
         self.utils = Main_Utils()
 
+        self.stager = Data_Stager("pred")
+
         self.raw_pred_data_dir = self.config["data"]["raw_data"]["pred_batch"]
 
         self.good_pred_data_dir = self.config["data"]["pred"]["good_data_dir"]
@@ -156,6 +159,8 @@ class Raw_Pred_Data_Validation:
         try:
             self.utils.create_dirs_for_good_bad_data("pred", self.pred_name_valid_log)
 
+            self.stager.load(self.pred_name_valid_log, reset=True)
+
             onlyfiles = [f for f in listdir(self.raw_pred_data_dir)]
 
             self.log_writer.log(
@@ -180,16 +185,38 @@ class Raw_Pred_Data_Validation:
 
                     if len(splitAtDot[1]) == LengthOfDateStampInFile:
                         if len(splitAtDot[2]) == LengthOfTimeStampInFile:
-                            copy(raw_data_pred_fname, good_data_pred_fname)
+                            self.stager.stage(
+                                raw_data_pred_fname,
+                                "good",
+                                None,
+                                self.pred_name_valid_log,
+                            )
 
                         else:
-                            copy(raw_data_pred_fname, bad_data_pred_fname)
+                            self.stager.stage(
+                                raw_data_pred_fname,
+                                "bad",
+                                "time stamp length does not match schema",
+                                self.pred_name_valid_log,
+                            )
 
                     else:
-                        copy(raw_data_pred_fname, bad_data_pred_fname)
+                        self.stager.stage(
+                            raw_data_pred_fname,
+                            "bad",
+                            "date stamp length does not match schema",
+                            self.pred_name_valid_log,
+                        )
 
                 else:
-                    copy(raw_data_pred_fname, bad_data_pred_fname)
+                    self.stager.stage(
+                        raw_data_pred_fname,
+                        "bad",
+                        "file name does not match regex",
+                        self.pred_name_valid_log,
+                    )
+
+            self.stager.save(self.pred_name_valid_log)
 
             self.log_writer.start_log("exit", **log_dic)
 
@@ -217,22 +244,30 @@ class Raw_Pred_Data_Validation:
         self.log_writer.start_log("start", **log_dic)
 
         try:
+            self.stager.load(self.pred_col_valid_log)
+
             for file in listdir(self.good_pred_data_dir):
                 fname = self.good_pred_data_dir + "/" + file
 
-                csv = read_csv(fname)
+                csv = self.columnar_cache.read_csv(fname, self.pred_col_valid_log)
 
                 if csv.shape[1] == NumberofColumns:
                     pass
 
                 else:
-                    move(fname, self.bad_pred_data_dir)
+                    self.stager.quarantine(
+                        file,
+                        f"{csv.shape[1]} columns instead of {NumberofColumns}",
+                        self.pred_col_valid_log,
+                    )
 
                     self.log_writer.log(
                         f"Invalid Column Length for the {file} file File moved to Bad Raw Folder",
                         **log_dic,
                     )
 
+            self.stager.save(self.pred_col_valid_log)
+
             self.log_writer.start_log("exit", **log_dic)
 
         except Exception as e:
@@ -259,10 +294,12 @@ class Raw_Pred_Data_Validation:
         self.log_writer.start_log("start", **log_dic)
 
         try:
+            self.stager.load(self.pred_missing_value_log)
+
             for file in listdir(self.good_pred_data_dir):
                 fname = self.good_pred_data_dir + "/" + file
 
-                csv = read_csv(fname)
+                csv = self.columnar_cache.read_csv(fname, self.pred_missing_value_log)
 
                 count = 0
 
@@ -270,7 +307,11 @@ class Raw_Pred_Data_Validation:
                     if (len(csv[columns]) - csv[columns].count()) == len(csv[columns]):
                         count += 1
 
-                        move(fname, self.bad_pred_data_dir)
+                        self.stager.quarantine(
+                            file,
+                            f"all values missing in {columns} column",
+                            self.pred_missing_value_log,
+                        )
 
                         self.log_writer.log(
                             "Invalid Column Length for the {file} file,File moved to Bad Raw Folder",
@@ -279,10 +320,7 @@ class Raw_Pred_Data_Validation:
 
                         break
 
-                if count == 0:
-                    good_data_fname = self.good_pred_data_dir + "/" + file
-
-                    csv.to_csv(good_data_fname, index=None, header=True)
+            self.stager.save(self.pred_missing_value_log)
 
             self.log_writer.start_log("exit", **log_dic)
 
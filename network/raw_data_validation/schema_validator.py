@@ -0,0 +1,305 @@
+from datetime import datetime
+from json import dump
+from os import listdir, makedirs
+from os.path import getmtime, join
+from time import perf_counter
+
+import numpy as np
+from pandas import to_numeric
+
+from utils.columnar_cache import Columnar_Cache
+from utils.data_stager import Data_Stager
+from utils.logger import App_Logger
+from utils.main_utils import Main_Utils
+from utils.read_params import get_log_dic, read_params
+
+VIOLATIONS = ["domain", "dtype", "null", "column"]
+
+
+class Schema_Validator:
+    """
+    Description :   This class is used for validating the values of the good data files against the ColName section of
+                    the schema. The schema is compiled once into a plan of allowed values, dtype and nullable flag per
+                    column, each file is checked with vectorized numpy operations over the whole block, and files with
+                    violations are moved to the bad data folder in the same pass
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    plans = {}
+
+    def __init__(self, key):
+        self.config = read_params()
+
+        self.key = key
+
+        self.validation_config = self.config["schema_validation"]
+
+        self.schema_file = self.config["schema_file"][f"{key}_schema_file"]
+
+        self.good_data_dir = self.config["data"][key]["good_data_dir"]
+
+        self.bad_data_dir = self.config["data"][key]["bad_data_dir"]
+
+        self.schema_validation_log = self.config["log"][f"{key}_schema_validation"]
+
+        self.log_writer = App_Logger()
+
+        self.columnar_cache = Columnar_Cache()
+
+        self.utils = Main_Utils()
+
+        self.stager = Data_Stager(key)
+
+    def get_plan(self):
+        """
+        Method Name :   get_plan
+        Description :   This method compiles the ColName section of the schema into the validation plan. A column type can
+                        be a type name, which takes the domain and nullable flag of the type from schema_validation, or a
+                        dict with type, domain and nullable keys. The plan is compiled once per schema file version
+
+        Output      :   Validation plan is returned as dict
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_plan.__name__,
+            __file__,
+            self.schema_validation_log,
+        )
+
+        try:
+            plan_key = (self.schema_file, getmtime(self.schema_file))
+
+            plan = Schema_Validator.plans.get(plan_key)
+
+            if plan is not None:
+                return plan
+
+            self.log_writer.start_log("start", **log_dic)
+
+            col_names = self.utils.read_json(
+                self.schema_file, self.schema_validation_log
+            )["ColName"]
+
+            columns, dtypes = list(col_names), []
+
+            allowed = np.zeros((len(columns), 256), dtype=bool)
+
+            nullable = np.zeros(len(columns), dtype=bool)
+
+            for j, column in enumerate(columns):
+                spec = col_names[column]
+
+                if not isinstance(spec, dict):
+                    spec = {"type": spec}
+
+                type_config = self.validation_config["types"][spec["type"]]
+
+                domain = np.asarray(spec.get("domain", type_config["domain"]))
+
+                allowed[j, domain.astype(np.int16) + 128] = True
+
+                nullable[j] = spec.get("nullable", type_config["nullable"])
+
+                dtypes.append(spec["type"])
+
+            plan = {
+                "columns": columns,
+                "dtypes": dtypes,
+                "allowed": allowed,
+                "nullable": nullable,
+                "null_tokens": self.validation_config["null_tokens"],
+            }
+
+            Schema_Validator.plans[plan_key] = plan
+
+            self.log_writer.log(
+                f"Compiled validation plan of {len(columns)} columns from {self.schema_file}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return plan
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def check_block(self, data, plan):
+        """
+        Method Name :   check_block
+        Description :   This method checks a block of rows against the plan. Nulls and values which are not integers in
+                        the int8 range are masked, the rest are looked up in the allowed table of their column in one
+                        vectorized step over the whole block
+
+        Output      :   A dict of violation counts per column is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            columns = plan["columns"]
+
+            if list(data.columns) != columns:
+                return {
+                    "__columns__": {
+                        "column": len(set(data.columns) ^ set(columns)) or 1
+                    }
+                }
+
+            n_cols = len(columns)
+
+            null = np.zeros(data.shape, dtype=bool)
+
+            bad_type = np.zeros(data.shape, dtype=bool)
+
+            if all(dtype.kind in "iu" for dtype in data.dtypes):
+                values = data.to_numpy()
+
+                bad_type = (values < -128) | (values > 127)
+
+                codes = np.where(bad_type, 0, values).astype(np.int16)
+
+            else:
+                codes = np.zeros(data.shape, dtype=np.int16)
+
+                for j, column in enumerate(columns):
+                    col = data[column]
+
+                    null[:, j] = (
+                        col.isna().values | col.isin(plan["null_tokens"]).values
+                    )
+
+                    numeric = to_numeric(col.where(~null[:, j]), errors="coerce").values
+
+                    bad_type[:, j] = ~null[:, j] & (
+                        np.isnan(numeric)
+                        | (numeric != np.round(numeric))
+                        | (numeric < -128)
+                        | (numeric > 127)
+                    )
+
+                    codes[:, j] = np.where(null[:, j] | bad_type[:, j], 0, numeric)
+
+            bad_domain = ~plan["allowed"][np.arange(n_cols), codes + 128]
+
+            bad_domain &= ~(null | bad_type)
+
+            bad_null = null & ~plan["nullable"]
+
+            counts = {}
+
+            for name, mask in (
+                ("domain", bad_domain),
+                ("dtype", bad_type),
+                ("null", bad_null),
+            ):
+                for j in np.flatnonzero(mask.any(axis=0)):
+                    counts.setdefault(columns[j], {})[name] = int(mask[:, j].sum())
+
+            return counts
+
+        except Exception as e:
+            raise e
+
+    def validate_files(self):
+        """
+        Method Name :   validate_files
+        Description :   This method checks every good data file against the validation plan, moves the files with
+                        violations to the bad data folder and writes a report of per file and per column violation
+                        counts with the throughput in rows per second
+
+        Output      :   Validation report is written and returned as dict
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.validate_files.__name__,
+            __file__,
+            self.schema_validation_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            plan = self.get_plan()
+
+            self.stager.load(self.schema_validation_log)
+
+            start = perf_counter()
+
+            files, n_rows = {}, 0
+
+            for file in sorted(listdir(self.good_data_dir)):
+                fname = join(self.good_data_dir, file)
+
+                data = self.columnar_cache.read_csv(fname, self.schema_validation_log)
+
+                counts = self.check_block(data, plan)
+
+                n_rows += len(data)
+
+                totals = {
+                    v: sum(c.get(v, 0) for c in counts.values()) for v in VIOLATIONS
+                }
+
+                files[file] = {
+                    "rows": len(data),
+                    "violations": totals,
+                    "columns": counts,
+                    "quarantined": any(totals.values()),
+                }
+
+                if files[file]["quarantined"]:
+                    self.stager.quarantine(
+                        file,
+                        "schema violations "
+                        + ", ".join(f"{v}: {n}" for v, n in totals.items() if n),
+                        self.schema_validation_log,
+                    )
+
+            self.stager.save(self.schema_validation_log)
+
+            wall_sec = perf_counter() - start
+
+            report = {
+                "pipeline": self.key,
+                "schema_file": self.schema_file,
+                "checked_at": datetime.now().isoformat(),
+                "files": len(files),
+                "quarantined": sum(f["quarantined"] for f in files.values()),
+                "rows": n_rows,
+                "wall_sec": round(wall_sec, 4),
+                "rows_per_sec": round(n_rows / wall_sec, 1) if wall_sec > 0 else None,
+                "per_file": files,
+            }
+
+            reports_dir = self.validation_config["reports_dir"]
+
+            makedirs(reports_dir, exist_ok=True)
+
+            with open(
+                join(reports_dir, f"{self.key}_schema_validation.json"), "w"
+            ) as f:
+                dump(report, f, indent=4)
+
+            self.log_writer.log(
+                f"Checked {n_rows} rows of {len(files)} files at {report['rows_per_sec']} rows/sec, quarantined {report['quarantined']} files",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return report
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
@@ -1,8 +1,13 @@
+from datetime import datetime
+from os import listdir
+
 from network.data_transform.data_transformation_pred import Data_Transform_Pred
 from network.data_type_valid.data_type_valid_pred import DB_Operation_Pred
 from network.raw_data_validation.pred_data_validation import Raw_Pred_Data_Validation
+from network.raw_data_validation.schema_validator import Schema_Validator
 from utils.logger import App_Logger
 from utils.read_params import get_log_dic, read_params
+from utils.stage_profiler import Stage_Profiler
 
 
 class Pred_Validation:
@@ -29,16 +34,26 @@ class Pred_Validation:
 
         self.raw_data = Raw_Pred_Data_Validation()
 
+        self.schema_validator = Schema_Validator("pred")
+
         self.data_transform = Data_Transform_Pred()
 
         self.db_operation = DB_Operation_Pred()
 
+        self.good_data_dir = self.config["data"]["pred"]["good_data_dir"]
+
+        self.raw_data_dir = self.config["data"]["raw_data"]["pred_batch"]
+
+        self.profiler = Stage_Profiler()
+
+        self.ingestion_config = self.config["pred_ingestion"]
+
     def pred_validation(self):
         """
         Method Name :   pred_validation
         Description :   This method is responsible for converting raw data to cleaned data for prediction
         
-        Output      :   Raw data is converted to cleaned data for prediction
+        Output      :   Raw data is converted to cleaned data for prediction and the batch id of the run is returned
         On Failure  :   Write an exception log and then raise an exception
         
         Version     :   1.2
@@ -54,7 +69,13 @@ class Pred_Validation:
         self.log_writer.start_log("start", **log_dic)
 
         try:
-            self.log_writer.log("pred Raw Validation started", **log_dic)
+            batch_id = f"pred_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+
+            batch_files = set(listdir(self.raw_data_dir))
+
+            self.log_writer.log(
+                f"pred Raw Validation started for batch {batch_id}", **log_dic
+            )
 
             (
                 LengthOfDateStampInFile,
@@ -65,35 +86,69 @@ class Pred_Validation:
 
             regex = self.raw_data.get_regex_pattern()
 
-            self.raw_data.validate_raw_fname(
-                regex, LengthOfDateStampInFile, LengthOfTimeStampInFile,
-            )
+            with self.profiler.stage("filename_validation") as stage:
+                self.raw_data.validate_raw_fname(
+                    regex, LengthOfDateStampInFile, LengthOfTimeStampInFile,
+                )
+
+                stage["files"] = len(listdir(self.raw_data_dir))
 
-            self.raw_data.validate_col_length(NumberofColumns=noofcolumns)
+            with self.profiler.stage("column_validation") as stage:
+                self.raw_data.validate_col_length(NumberofColumns=noofcolumns)
 
-            self.raw_data.validate_missing_values_in_col()
+                stage["files"] = len(listdir(self.good_data_dir))
+
+            with self.profiler.stage("null_validation") as stage:
+                self.raw_data.validate_missing_values_in_col()
+
+                stage["files"] = len(listdir(self.good_data_dir))
+
+            with self.profiler.stage("schema_validation") as stage:
+                report = self.schema_validator.validate_files()
+
+                stage["rows"], stage["files"] = report["rows"], report["files"]
 
             self.log_writer.log("Pred Raw Data Validation completed", **log_dic)
 
             self.log_writer.log("Starting Data Transformation", **log_dic)
 
-            self.data_transform.add_quotes_to_string_values_in_column()
+            with self.profiler.stage("quoting") as stage:
+                self.data_transform.add_quotes_to_string_values_in_column()
+
+                stage["files"] = len(listdir(self.good_data_dir))
 
             self.log_writer.log("Data Transformation completed !!", **log_dic)
 
             self.log_writer.log("Train Data Type Validation started", **log_dic)
 
-            self.db_operation.insert_good_data_as_record(
-                self.good_data_db_name, self.good_data_collection_name
-            )
+            files = sorted(f for f in listdir(self.good_data_dir) if f in batch_files)
 
-            self.db_operation.export_collection_to_csv(
-                self.good_data_db_name, self.good_data_collection_name
-            )
+            mode = self.ingestion_config["mode"]
+
+            if mode == "mongo" or self.ingestion_config["archive"] is True:
+                with self.profiler.stage("mongo_insert", files=len(files)):
+                    self.db_operation.insert_good_data_as_record(
+                        self.good_data_db_name,
+                        self.good_data_collection_name,
+                        files,
+                        batch_id,
+                    )
+
+            if mode == "mongo":
+                with self.profiler.stage("mongo_export"):
+                    self.db_operation.export_collection_to_csv(
+                        self.good_data_db_name, self.good_data_collection_name, batch_id
+                    )
+
+            else:
+                with self.profiler.stage("batch_export", files=len(files)) as stage:
+                    stage["rows"] = self.db_operation.export_files_to_csv(files)
 
             self.log_writer.log("Train Data Type Validation completed", **log_dic)
 
             self.log_writer.start_log("exit", **log_dic)
 
+            return batch_id
+
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
@@ -1,8 +1,12 @@
+from os import listdir
+
 from network.data_transform.data_transformation_train import Data_Transform_Train
 from network.data_type_valid.data_type_valid_train import DB_Operation_Train
 from network.raw_data_validation.train_data_validation import Raw_Train_Data_Validation
+from network.raw_data_validation.schema_validator import Schema_Validator
 from utils.logger import App_Logger
 from utils.read_params import get_log_dic, read_params
+from utils.stage_profiler import Stage_Profiler
 
 
 class Train_Validation:
@@ -29,10 +33,20 @@ class Train_Validation:
 
         self.raw_data = Raw_Train_Data_Validation()
 
+        self.schema_validator = Schema_Validator("train")
+
         self.data_transform = Data_Transform_Train()
 
         self.db_operation = DB_Operation_Train()
 
+        self.good_data_dir = self.config["data"]["train"]["good_data_dir"]
+
+        self.raw_data_dir = self.config["data"]["raw_data"]["train_batch"]
+
+        self.profiler = Stage_Profiler()
+
+        self.train_store_enabled = self.config["train_store"]["enabled"] is True
+
     def train_validation(self):
         """
         Method Name :   training_validation
@@ -65,31 +79,58 @@ class Train_Validation:
 
             regex = self.raw_data.get_regex_pattern()
 
-            self.raw_data.validate_raw_fname(
-                regex, LengthOfDateStampInFile, LengthOfTimeStampInFile,
-            )
+            with self.profiler.stage("filename_validation") as stage:
+                self.raw_data.validate_raw_fname(
+                    regex, LengthOfDateStampInFile, LengthOfTimeStampInFile,
+                )
+
+                stage["files"] = len(listdir(self.raw_data_dir))
 
-            self.raw_data.validate_col_length(NumberofColumns=noofcolumns)
+            with self.profiler.stage("column_validation") as stage:
+                self.raw_data.validate_col_length(NumberofColumns=noofcolumns)
 
-            self.raw_data.validate_missing_values_in_col()
+                stage["files"] = len(listdir(self.good_data_dir))
+
+            with self.profiler.stage("null_validation") as stage:
+                self.raw_data.validate_missing_values_in_col()
+
+                stage["files"] = len(listdir(self.good_data_dir))
+
+            with self.profiler.stage("schema_validation") as stage:
+                report = self.schema_validator.validate_files()
+
+                stage["rows"], stage["files"] = report["rows"], report["files"]
 
             self.log_writer.log("Train Raw Data Validation completed", **log_dic)
 
             self.log_writer.log("Train Data Transformation started", **log_dic)
 
-            self.data_transform.add_quotes_to_string_values_in_column()
+            with self.profiler.stage("quoting") as stage:
+                self.data_transform.add_quotes_to_string_values_in_column()
+
+                stage["files"] = len(listdir(self.good_data_dir))
 
             self.log_writer.log("Train Data Transformation completed", **log_dic)
 
             self.log_writer.log("Train Data Type Validation started", **log_dic)
 
-            self.db_operation.insert_good_data_as_record(
-                self.good_data_db_name, self.good_data_collection_name
-            )
+            with self.profiler.stage("mongo_insert") as stage:
+                self.db_operation.insert_good_data_as_record(
+                    self.good_data_db_name, self.good_data_collection_name
+                )
+
+                stage["files"] = len(listdir(self.good_data_dir))
+
+            with self.profiler.stage("mongo_export") as stage:
+                if self.train_store_enabled:
+                    stage["rows"] = self.db_operation.export_collection_to_store(
+                        self.good_data_db_name, self.good_data_collection_name
+                    )
 
-            self.db_operation.export_collection_to_csv(
-                self.good_data_db_name, self.good_data_collection_name
-            )
+                else:
+                    self.db_operation.export_collection_to_csv(
+                        self.good_data_db_name, self.good_data_collection_name
+                    )
 
             self.log_writer.log("Train Data Type Validation completed", **log_dic)
 
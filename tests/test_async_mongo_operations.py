@@ -0,0 +1,104 @@
+from asyncio import run
+from threading import get_ident
+
+import pandas as pd
+import pytest
+
+from network.mongodb_operations.async_mongo_operations import Async_MongoDB_Operation
+
+mongomock = pytest.importorskip("mongomock")
+
+LOG_FILE = "async_mongo.log"
+
+
+class Recording_Mongo(Async_MongoDB_Operation):
+    def __init__(self, client):
+        super().__init__(client)
+
+        self.calls = []
+
+    async def run(self, operation, func, *args, **kwargs):
+        def call():
+            self.calls.append((operation, get_ident()))
+
+            return func(*args, **kwargs)
+
+        return await super().run(operation, call)
+
+
+@pytest.fixture
+def mongo():
+    client = mongomock.MongoClient()
+
+    client["db"]["docs"].insert_many([{"n": i} for i in range(25)])
+
+    return Recording_Mongo(client)
+
+
+def test_find_batches_streams_all_documents(mongo):
+    async def collect():
+        return [
+            batch
+            async for batch in mongo.find_batches(
+                "db", "docs", LOG_FILE, projection={"_id": 0}, batch_size=10
+            )
+        ]
+
+    batches = run(collect())
+
+    assert [len(b) for b in batches] == [10, 10, 5]
+
+    assert [d["n"] for b in batches for d in b] == list(range(25))
+
+
+def test_find_batches_runs_every_call_off_the_event_loop(mongo):
+    async def first_batch():
+        loop_thread = get_ident()
+
+        batches = mongo.find_batches("db", "docs", LOG_FILE, batch_size=10)
+
+        batch = await batches.__anext__()
+
+        await batches.aclose()
+
+        return loop_thread, batch
+
+    loop_thread, batch = run(first_batch())
+
+    assert len(batch) == 10
+
+    assert [op for op, _ in mongo.calls] == ["find", "close"]
+
+    assert all(thread != loop_thread for _, thread in mongo.calls)
+
+
+def test_find_batches_applies_query(mongo):
+    async def collect():
+        return [
+            doc
+            async for batch in mongo.find_batches(
+                "db", "docs", LOG_FILE, query={"n": {"$gte": 20}}
+            )
+            for doc in batch
+        ]
+
+    assert sorted(d["n"] for d in run(collect())) == [20, 21, 22, 23, 24]
+
+
+def test_insert_count_and_read_round_trip(mongo):
+    data = pd.DataFrame({"a": [1, -1, 0], "b": [0, 1, 1]})
+
+    async def round_trip():
+        await mongo.insert_dataframe_as_record(data, "db", "frames", LOG_FILE)
+
+        count = await mongo.count_documents("db", "frames", LOG_FILE)
+
+        df = await mongo.get_collection_as_dataframe("db", "frames", LOG_FILE)
+
+        return count, df
+
+    count, df = run(round_trip())
+
+    assert count == 3
+
+    pd.testing.assert_frame_equal(df[["a", "b"]], data)
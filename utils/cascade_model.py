@@ -0,0 +1,148 @@
+import numpy as np
+
+
+class Cascade_Model:
+    """
+    Description :   This class is the two stage form of a production model. A small first stage model answers the rows
+                    whose positive class score is at most the low threshold or at least the high threshold, and only
+                    the rows in between escalate to the full model. The thresholds are tuned on held-out data so the
+                    answers agree with the full model above a target. The full model is attached at load time and is
+                    not pickled with the cascade
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    def __init__(self, first_model, low, high):
+        self.first_model = first_model
+
+        self.low = low
+
+        self.high = high
+
+        self.classes_ = np.asarray(first_model.classes_)
+
+        self.full_model = None
+
+        self.rows = 0
+
+        self.escalated = 0
+
+        self.last_escalated = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+
+        state.update(full_model=None, rows=0, escalated=0, last_escalated=0)
+
+        return state
+
+    @staticmethod
+    def tune_thresholds(scores, full_labels, pos_label, agreement_target):
+        """
+        Method Name :   tune_thresholds
+        Description :   This method finds the low and high thresholds on the first stage scores which let the first
+                        stage answer the most rows while the answers agree with the full model labels on at least the
+                        agreement target share of the rows. For a pair of cut points i <= j over the sorted distinct
+                        scores, the rows of the first i scores are answered negative and the rows from the j-th score on
+                        are answered positive. All the pairs are checked at once with cumulative counts
+
+        Output      :   A tuple of low threshold, high threshold and agreement is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            values, inverse = np.unique(scores, return_inverse=True)
+
+            n, k = len(scores), len(values)
+
+            is_pos = np.asarray(full_labels) == pos_label
+
+            counts = np.bincount(inverse, minlength=k)
+
+            pos_counts = np.bincount(inverse, weights=is_pos, minlength=k)
+
+            answered_neg = np.concatenate([[0], np.cumsum(counts)])
+
+            neg_errors = np.concatenate([[0], np.cumsum(pos_counts)])
+
+            answered_pos = n - answered_neg
+
+            pos_errors = (n - answered_neg) - (pos_counts.sum() - neg_errors)
+
+            i, j = np.meshgrid(np.arange(k + 1), np.arange(k + 1), indexing="ij")
+
+            coverage = np.where(j >= i, answered_neg[i] + answered_pos[j], -1)
+
+            errors = neg_errors[i] + pos_errors[j]
+
+            feasible = (j >= i) & (errors <= (1 - agreement_target) * n)
+
+            ranked = np.where(feasible, coverage * (n + 1) - errors, -1)
+
+            best_i, best_j = np.unravel_index(ranked.argmax(), ranked.shape)
+
+            low = values[best_i - 1] if best_i > 0 else -np.inf
+
+            high = values[best_j] if best_j < k else np.inf
+
+            return float(low), float(high), 1 - errors[best_i, best_j] / n
+
+        except Exception as e:
+            raise e
+
+    def attach(self, full_model):
+        """
+        Method Name :   attach
+        Description :   This method attaches the full model which answers the escalated rows
+
+        Output      :   The cascade is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            self.full_model = full_model
+
+            return self
+
+        except Exception as e:
+            raise e
+
+    def predict(self, X):
+        """
+        Method Name :   predict
+        Description :   This method answers the confident rows with the first stage and the rest with the full model,
+                        and counts the rows and the escalated rows of the call and in total
+
+        Output      :   An array of class labels is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            scores = self.first_model.predict_proba(X)[:, -1]
+
+            labels = np.where(scores >= self.high, self.classes_[-1], self.classes_[0])
+
+            escalate = (scores > self.low) & (scores < self.high)
+
+            if escalate.any():
+                rows = X[escalate] if hasattr(X, "columns") else X[escalate, :]
+
+                labels[escalate] = self.full_model.predict(rows)
+
+            self.last_escalated = int(escalate.sum())
+
+            self.rows += len(labels)
+
+            self.escalated += self.last_escalated
+
+            return labels
+
+        except Exception as e:
+            raise e
@@ -0,0 +1,360 @@
+from hashlib import sha256
+from json import dump, load
+from os import listdir, makedirs, remove, replace, stat, utime
+from os.path import exists, join
+from time import time
+
+import numpy as np
+from pandas import DataFrame, read_csv, to_numeric
+
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+ENCODING_VERSION = 1
+
+NULL_CODE = -128
+
+MIN_VALUE, MAX_VALUE = -100, 127
+
+
+class Columnar_Cache:
+    """
+    Description :   This class is used for parsing each batch csv file once. The parsed file is stored as an int8 matrix
+                    in a .npy file keyed on the hash of the csv bytes, with empty cells and string tokens like '?' kept
+                    as reserved codes. Later reads of the same bytes memory map the matrix instead of parsing the csv,
+                    and csv files written by the pipeline are stored in the cache as they are written. Entries are
+                    touched when they are read, and the least recently used entries are evicted when a new entry is
+                    saved, to keep the cache within its size and age bounds
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    def __init__(self):
+        self.config = read_params()
+
+        self.cache_config = self.config["columnar_cache"]
+
+        self.cache_dir = self.cache_config["dir"]
+
+        self.log_writer = App_Logger()
+
+    def get_file_hash(self, fname):
+        """
+        Method Name :   get_file_hash
+        Description :   This method gets the hash of the bytes of the file, read in chunks
+
+        Output      :   Hex digest of the file is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            h = sha256(str(ENCODING_VERSION).encode())
+
+            with open(fname, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+
+            return h.hexdigest()
+
+        except Exception as e:
+            raise e
+
+    def encode(self, data):
+        """
+        Method Name :   encode
+        Description :   This method encodes the dataframe as an int8 matrix. Integer values are stored as they are, empty
+                        cells as the null code and each string token as its own code below the value range. The kind of
+                        each column is kept so that decoding gives the dtypes which read_csv gives for the csv
+
+        Output      :   A tuple of int8 matrix and meta dict is returned, None if the data does not fit in int8
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            matrix = np.empty((len(data), data.shape[1]), dtype=np.int8)
+
+            tokens, kinds = {}, []
+
+            for j, column in enumerate(data.columns):
+                values = data[column]
+
+                numeric = to_numeric(values, errors="coerce")
+
+                null = values.isna().values
+
+                token = numeric.isna().values & ~null
+
+                num = numeric.values[~(null | token)]
+
+                if len(num) and (
+                    num.min() < MIN_VALUE
+                    or num.max() > MAX_VALUE
+                    or not np.array_equal(num, np.round(num))
+                ):
+                    return None
+
+                col = np.where(null | token, NULL_CODE, numeric.fillna(0).values)
+
+                for value in np.unique(values.values[token].astype(str)):
+                    if value not in tokens:
+                        tokens[value] = NULL_CODE + 1 + len(tokens)
+
+                        if tokens[value] >= MIN_VALUE:
+                            return None
+
+                    col[token & (values.values.astype(str) == value)] = tokens[value]
+
+                matrix[:, j] = col
+
+                if token.any() or (values.dtype == object and null.any()):
+                    kinds.append("object")
+
+                elif values.dtype.kind == "f" or null.any():
+                    kinds.append("float")
+
+                else:
+                    kinds.append("int")
+
+            meta = {
+                "columns": [str(c) for c in data.columns],
+                "kinds": kinds,
+                "tokens": tokens,
+            }
+
+            return matrix, meta
+
+        except Exception as e:
+            raise e
+
+    def decode(self, matrix, meta):
+        """
+        Method Name :   decode
+        Description :   This method decodes the int8 matrix back to a dataframe. When every column is an integer column
+                        the dataframe is built on the memory mapped matrix without copying it
+
+        Output      :   A pandas dataframe is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            columns, kinds = meta["columns"], meta["kinds"]
+
+            if all(kind == "int" for kind in kinds):
+                return DataFrame(matrix, columns=columns, copy=False)
+
+            codes = {code: token for token, code in meta["tokens"].items()}
+
+            data = {}
+
+            for j, (column, kind) in enumerate(zip(columns, kinds)):
+                col = matrix[:, j]
+
+                if kind == "int":
+                    data[column] = col
+
+                elif kind == "float":
+                    data[column] = np.where(col == NULL_CODE, np.nan, col)
+
+                else:
+                    values = col.astype(str).astype(object)
+
+                    values[col == NULL_CODE] = np.nan
+
+                    for code, token in codes.items():
+                        values[col == code] = token
+
+                    data[column] = values
+
+            return DataFrame(data, columns=columns)
+
+        except Exception as e:
+            raise e
+
+    def save(self, file_hash, data):
+        """
+        Method Name :   save
+        Description :   This method encodes the dataframe and saves the matrix and meta under the file hash
+
+        Output      :   True is returned when the data is cached, False when it does not fit in int8
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            encoded = self.encode(data)
+
+            if encoded is None:
+                return False
+
+            matrix, meta = encoded
+
+            makedirs(self.cache_dir, exist_ok=True)
+
+            matrix_file = join(self.cache_dir, file_hash + ".npy")
+
+            with open(matrix_file + ".tmp", "wb") as f:
+                np.save(f, matrix)
+
+            with open(join(self.cache_dir, file_hash + ".json.tmp"), "w") as f:
+                dump(meta, f)
+
+            replace(matrix_file + ".tmp", matrix_file)
+
+            replace(
+                join(self.cache_dir, file_hash + ".json.tmp"),
+                join(self.cache_dir, file_hash + ".json"),
+            )
+
+            self.evict()
+
+            return True
+
+        except Exception as e:
+            raise e
+
+    def evict(self):
+        """
+        Method Name :   evict
+        Description :   This method removes the entries not read for max_age_days days, and then the least recently
+                        used entries once the newer entries add up to max_size_mb. The meta file of an entry is removed
+                        before its matrix, so a reader never finds a meta file without its matrix
+
+        Output      :   Old entries are removed and the number of removed entries is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            entries = []
+
+            for f in listdir(self.cache_dir):
+                if f.endswith(".json"):
+                    file_hash = f[: -len(".json")]
+
+                    meta, matrix = (
+                        join(self.cache_dir, file_hash + ext)
+                        for ext in (".json", ".npy")
+                    )
+
+                    try:
+                        size = stat(meta).st_size + stat(matrix).st_size
+
+                        entries.append((stat(meta).st_mtime, size, meta, matrix))
+
+                    except FileNotFoundError:
+                        pass
+
+            cutoff = time() - self.cache_config["max_age_days"] * 86400
+
+            max_bytes = self.cache_config["max_size_mb"] * 1024 * 1024
+
+            kept, removed, full = 0, 0, False
+
+            for mtime, size, meta, matrix in sorted(entries, reverse=True):
+                full = full or mtime < cutoff or kept + size > max_bytes
+
+                if not full:
+                    kept += size
+
+                    continue
+
+                for path in (meta, matrix):
+                    try:
+                        remove(path)
+
+                    except FileNotFoundError:
+                        pass
+
+                removed += 1
+
+            return removed
+
+        except Exception as e:
+            raise e
+
+    def read_csv(self, fname, log_file):
+        """
+        Method Name :   read_csv
+        Description :   This method reads the csv file from the columnar cache when its bytes are cached, otherwise the
+                        csv is parsed and added to the cache
+
+        Output      :   A pandas dataframe is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.read_csv.__name__, __file__, log_file
+        )
+
+        try:
+            if self.cache_config["enabled"] is not True:
+                return read_csv(fname)
+
+            file_hash = self.get_file_hash(fname)
+
+            meta_file = join(self.cache_dir, file_hash + ".json")
+
+            if exists(meta_file):
+                utime(meta_file)
+
+                with open(meta_file) as f:
+                    meta = load(f)
+
+                matrix = np.load(
+                    join(self.cache_dir, file_hash + ".npy"), mmap_mode="c"
+                )
+
+                self.log_writer.log(f"Read {fname} from columnar cache", **log_dic)
+
+                return self.decode(matrix, meta)
+
+            data = read_csv(fname)
+
+            if self.save(file_hash, data):
+                self.log_writer.log(
+                    f"Parsed {fname} and added it to columnar cache", **log_dic
+                )
+
+            return data
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def to_csv(self, data, fname, log_file):
+        """
+        Method Name :   to_csv
+        Description :   This method writes the dataframe as csv file and adds the written bytes to the columnar cache, so
+                        that the next read of the file does not parse it. The csv is written to a temporary file which is
+                        renamed over the file, so a staged hardlink of a raw file is replaced instead of rewritten
+
+        Output      :   Dataframe is written to the csv file
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.to_csv.__name__, __file__, log_file
+        )
+
+        try:
+            data.to_csv(fname + ".tmp", index=None, header=True)
+
+            replace(fname + ".tmp", fname)
+
+            if self.cache_config["enabled"] is True:
+                self.save(self.get_file_hash(fname), data)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
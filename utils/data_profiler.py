@@ -0,0 +1,268 @@
+from json import dump, load
+from os import makedirs, replace
+from os.path import exists, join
+
+import numpy as np
+
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class Data_Profiler:
+    """
+    Description :   This class is used for profiling the data quality of a batch in one vectorized pass per chunk. Each
+                    value is mapped to a bin of its column, the configured values, other or null, and one bincount over
+                    the whole chunk gives the null counts, the value histograms and the class balance. Row hashes give
+                    the duplicate rate, and are hashed from the float64 values so equal rows hash the same whatever
+                    the dtype of their chunk. Profiles of chunks are merged by adding the counts and joining the row
+                    hashes, so chunks profiled by parallel workers combine into the profile of the batch
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    def __init__(self, log_file):
+        self.config = read_params()
+
+        self.log_file = log_file
+
+        self.profile_config = self.config["data_profile"]
+
+        self.profiles_dir = self.profile_config["dir"]
+
+        self.values = np.asarray(self.profile_config["values"], dtype=np.int16)
+
+        self.bins = [str(v) for v in self.profile_config["values"]] + ["other", "null"]
+
+        self.target_col = self.config["target_col"]
+
+        self.log_writer = App_Logger()
+
+    def profile_chunk(self, data, row_hashes=True):
+        """
+        Method Name :   profile_chunk
+        Description :   This method profiles a chunk of numeric data, with missing values as nan, in one pass. Row hashes
+                        are skipped when row_hashes is False, like for the online drift windows
+
+        Output      :   Profile of the chunk is returned as dict
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.profile_chunk.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        try:
+            from pandas import DataFrame
+            from pandas.util import hash_pandas_object
+
+            values = data.to_numpy(dtype=np.float64)
+
+            n_cols, n_bins = values.shape[1], len(self.bins)
+
+            table = np.full(256, n_bins - 2, dtype=np.int64)
+
+            table[self.values + 128] = np.arange(len(self.values))
+
+            null = np.isnan(values)
+
+            clipped = np.clip(np.where(null, 0, values), -128, 127)
+
+            codes = table[clipped.astype(np.int16) + 128]
+
+            codes[clipped != values] = n_bins - 2
+
+            codes[null] = n_bins - 1
+
+            counts = np.bincount(
+                (codes + np.arange(n_cols) * n_bins).ravel(),
+                minlength=n_cols * n_bins,
+            ).reshape(n_cols, n_bins)
+
+            if row_hashes is True:
+                hashes = np.unique(
+                    hash_pandas_object(DataFrame(values), index=False).values
+                )
+
+            else:
+                hashes = np.array([], dtype=np.uint64)
+
+            return {
+                "columns": [str(c) for c in data.columns],
+                "rows": len(data),
+                "counts": counts,
+                "row_hashes": hashes,
+            }
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def merge(self, profiles):
+        """
+        Method Name :   merge
+        Description :   This method merges the profiles of chunks of the same columns
+
+        Output      :   Merged profile is returned as dict
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.merge.__name__, __file__, self.log_file
+        )
+
+        try:
+            profiles = [p for p in profiles if p is not None]
+
+            merged = {
+                "columns": profiles[0]["columns"],
+                "rows": 0,
+                "counts": np.zeros_like(profiles[0]["counts"]),
+                "row_hashes": np.array([], dtype=np.uint64),
+            }
+
+            for profile in profiles:
+                if profile["columns"] != merged["columns"]:
+                    raise Exception("Profiles of different columns can not be merged")
+
+                merged["rows"] += profile["rows"]
+
+                merged["counts"] += profile["counts"]
+
+                merged["row_hashes"] = np.union1d(
+                    merged["row_hashes"], profile["row_hashes"]
+                )
+
+            return merged
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def summarize(self, profile):
+        """
+        Method Name :   summarize
+        Description :   This method turns the profile into the report of null counts, value histograms, class balance and
+                        duplicate rate
+
+        Output      :   Profile report is returned as dict
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            counts, columns, rows = (
+                profile["counts"],
+                profile["columns"],
+                profile["rows"],
+            )
+
+            histograms = {
+                c: dict(zip(self.bins[:-1], counts[j, :-1].tolist()))
+                for j, c in enumerate(columns)
+            }
+
+            report = {
+                "columns": columns,
+                "bins": self.bins,
+                "rows": rows,
+                "counts": counts.tolist(),
+                "null_counts": dict(zip(columns, counts[:, -1].tolist())),
+                "histograms": histograms,
+                "class_balance": histograms.get(self.target_col),
+                "distinct_rows": len(profile["row_hashes"]),
+                "duplicate_rate": (
+                    round(1 - len(profile["row_hashes"]) / rows, 6) if rows else 0.0
+                ),
+            }
+
+            return report
+
+        except Exception as e:
+            raise e
+
+    def save(self, profile, name):
+        """
+        Method Name :   save
+        Description :   This method persists the profile of the batch as its report json and its row hashes, so it can be
+                        merged with later profiles
+
+        Output      :   Profile report is written and returned as dict
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.save.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            makedirs(self.profiles_dir, exist_ok=True)
+
+            report = self.summarize(profile)
+
+            with open(join(self.profiles_dir, name + ".npy"), "wb") as f:
+                np.save(f, profile["row_hashes"])
+
+            with open(join(self.profiles_dir, name + ".json.tmp"), "w") as f:
+                dump(report, f, indent=4)
+
+            replace(
+                join(self.profiles_dir, name + ".json.tmp"),
+                join(self.profiles_dir, name + ".json"),
+            )
+
+            self.log_writer.log(
+                f"Saved data profile {name} of {report['rows']} rows with {sum(report['null_counts'].values())} missing values and duplicate rate {report['duplicate_rate']}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return report
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def load(self, name):
+        """
+        Method Name :   load
+        Description :   This method loads the persisted profile of the batch
+
+        Output      :   Profile is returned as dict, None if there is no profile with the name
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.load.__name__, __file__, self.log_file
+        )
+
+        try:
+            report_file = join(self.profiles_dir, name + ".json")
+
+            if not exists(report_file):
+                return None
+
+            with open(report_file) as f:
+                report = load(f)
+
+            return {
+                "columns": report["columns"],
+                "rows": report["rows"],
+                "counts": np.asarray(report["counts"], dtype=np.int64),
+                "row_hashes": np.load(join(self.profiles_dir, name + ".npy")),
+            }
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
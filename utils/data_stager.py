@@ -0,0 +1,228 @@
+from datetime import datetime
+from errno import EMLINK, EOPNOTSUPP, EPERM, EXDEV
+from json import dump, load
+from os import link, makedirs, remove, replace
+from os.path import basename, dirname, exists, join, samefile
+from shutil import copy2
+
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+LINK_ERRORS = (EXDEV, EPERM, EMLINK, EOPNOTSUPP)
+
+
+class Data_Stager:
+    """
+    Description :   This class is used for staging the raw batch files into the good and bad data folders without copying
+                    them. A raw file is hardlinked, or renamed when staging.method is move, into its folder and is copied
+                    only when the folders are on another device. Files quarantined by later checks are renamed from the
+                    good to the bad data folder, and the verdict, reason and staging method of every file are kept in
+                    the staging manifest
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    def __init__(self, key):
+        self.config = read_params()
+
+        self.key = key
+
+        self.staging_config = self.config["staging"]
+
+        self.good_data_dir = self.config["data"][key]["good_data_dir"]
+
+        self.bad_data_dir = self.config["data"][key]["bad_data_dir"]
+
+        self.manifest_file = join(
+            self.staging_config["manifest_dir"], f"{key}_staging_manifest.json"
+        )
+
+        self.manifest = None
+
+        self.log_writer = App_Logger()
+
+    def load(self, log_file, reset=False):
+        """
+        Method Name :   load
+        Description :   This method loads the staging manifest of the pipeline, or starts a new one when reset is True
+
+        Output      :   Staging manifest is loaded
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.load.__name__, __file__, log_file
+        )
+
+        try:
+            if reset or not exists(self.manifest_file):
+                self.manifest = {
+                    "pipeline": self.key,
+                    "staged_at": datetime.now().isoformat(),
+                    "files": {},
+                }
+
+            else:
+                with open(self.manifest_file) as f:
+                    self.manifest = load(f)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def save(self, log_file):
+        """
+        Method Name :   save
+        Description :   This method writes the staging manifest with a temporary file and an atomic rename
+
+        Output      :   Staging manifest is written
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.save.__name__, __file__, log_file
+        )
+
+        try:
+            makedirs(dirname(self.manifest_file) or ".", exist_ok=True)
+
+            with open(self.manifest_file + ".tmp", "w") as f:
+                dump(self.manifest, f, indent=4)
+
+            replace(self.manifest_file + ".tmp", self.manifest_file)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def place(self, src, dst):
+        """
+        Method Name :   place
+        Description :   This method puts the source file at the destination with a hardlink or a rename, and falls back
+                        to a copy when the destination is on another device or does not support hardlinks. The file is
+                        created under a temporary name and renamed over the destination, a destination which is already
+                        a hardlink of the source is kept as it is
+
+        Output      :   Staging method used is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            tmp = dst + ".staging"
+
+            if exists(tmp):
+                remove(tmp)
+
+            method = self.staging_config["method"]
+
+            if method == "link" and exists(dst) and samefile(src, dst):
+                return method
+
+            try:
+                if method == "move":
+                    replace(src, dst)
+
+                    return method
+
+                link(src, tmp)
+
+            except OSError as e:
+                if e.errno not in LINK_ERRORS:
+                    raise e
+
+                copy2(src, tmp)
+
+                if method == "move":
+                    remove(src)
+
+                method = "copy"
+
+            replace(tmp, dst)
+
+            return method
+
+        except Exception as e:
+            raise e
+
+    def stage(self, src, verdict, reason, log_file):
+        """
+        Method Name :   stage
+        Description :   This method stages the raw file into the good or bad data folder as per the verdict and records
+                        it in the manifest
+
+        Output      :   Raw file is staged
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.stage.__name__, __file__, log_file
+        )
+
+        try:
+            file = basename(src)
+
+            folder = self.good_data_dir if verdict == "good" else self.bad_data_dir
+
+            method = self.place(src, join(folder, file))
+
+            self.manifest["files"][file] = {
+                "source": src,
+                "verdict": verdict,
+                "reason": reason,
+                "method": method,
+            }
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def quarantine(self, file, reason, log_file):
+        """
+        Method Name :   quarantine
+        Description :   This method renames the good data file to the bad data folder and records the reason in the
+                        manifest
+
+        Output      :   Good data file is moved to bad data folder
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.quarantine.__name__, __file__, log_file
+        )
+
+        try:
+            src, dst = join(self.good_data_dir, file), join(self.bad_data_dir, file)
+
+            try:
+                if exists(dst) and samefile(src, dst):
+                    remove(src)
+
+                else:
+                    replace(src, dst)
+
+            except OSError as e:
+                if e.errno != EXDEV:
+                    raise e
+
+                copy2(src, dst + ".staging")
+
+                replace(dst + ".staging", dst)
+
+                remove(src)
+
+            entry = self.manifest["files"].setdefault(file, {})
+
+            entry.update({"verdict": "bad", "reason": reason})
+
+            self.log_writer.log(f"Quarantined {file} as {reason}", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
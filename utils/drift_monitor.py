@@ -0,0 +1,504 @@
+from datetime import datetime
+from json import dump, load
+from os import getpid, listdir, makedirs, replace
+from os.path import basename, dirname, exists, getmtime, join
+from queue import Full, Queue
+from shutil import copy
+from threading import Thread
+
+import numpy as np
+from pandas import to_numeric
+
+from utils.data_profiler import Data_Profiler
+from utils.logger import App_Logger
+from utils.model_registry import Model_Registry
+from utils.read_params import get_log_dic, read_params
+
+
+class Drift_Monitor:
+    """
+    Description :   This class is used for monitoring the feature drift of the prediction data from the training data.
+                    Training keeps the value histograms of its data profile as the reference of the model, and each
+                    prediction batch or online window is compared to the reference of the production model with the
+                    population stability index and a chi-square test per feature. Only the histogram counts are kept,
+                    online windows add the counts of each request and no rows are stored. Full online windows are
+                    checked on a background thread of the worker, so requests only add their counts
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    references = {}
+
+    def __init__(self, log_file):
+        self.config = read_params()
+
+        self.log_file = log_file
+
+        self.drift_config = self.config["drift_monitor"]
+
+        self.reports_dir = self.drift_config["reports_dir"]
+
+        self.target_col = self.config["target_col"]
+
+        self.reference_file = join(
+            self.config["dir"]["artifacts"],
+            self.config["model_dir"]["trained"],
+            self.drift_config["reference_file"],
+        )
+
+        self.shared_models_dir = join(
+            self.config["dir"]["artifacts"], self.config["model_dir"]["shared"]
+        )
+
+        self.log_writer = App_Logger()
+
+        self.data_profiler = Data_Profiler(log_file)
+
+        self.model_registry = Model_Registry()
+
+        self.window = None
+
+        self.window_reference = None
+
+        self.queue = None
+
+        self.checker = None
+
+    def save_reference(self, profile):
+        """
+        Method Name :   save_reference
+        Description :   This method saves the value histograms of the features of the training data profile as the
+                        reference of the trained models
+
+        Output      :   Reference histograms are written to the trained model folder
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.save_reference.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            features = [
+                j for j, c in enumerate(profile["columns"]) if c != self.target_col
+            ]
+
+            reference = {
+                "columns": [profile["columns"][j] for j in features],
+                "bins": self.data_profiler.bins,
+                "rows": profile["rows"],
+                "counts": profile["counts"][features].tolist(),
+                "created_at": datetime.now().isoformat(),
+            }
+
+            makedirs(dirname(self.reference_file), exist_ok=True)
+
+            with open(self.reference_file + ".tmp", "w") as f:
+                dump(reference, f)
+
+            replace(self.reference_file + ".tmp", self.reference_file)
+
+            self.log_writer.log(
+                f"Saved reference histograms of {len(features)} features from {profile['rows']} rows",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def promote_reference(self, version):
+        """
+        Method Name :   promote_reference
+        Description :   This method copies the reference histograms of the trained models next to the shared model of
+                        the registry version, so the reference always matches the model in production
+
+        Output      :   Reference file of the version is returned, None if training saved no reference
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.promote_reference.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        try:
+            if not exists(self.reference_file):
+                self.log_writer.log(
+                    "No reference histograms found, drift is not monitored for this model",
+                    **log_dic,
+                )
+
+                return None
+
+            reference_file = join(self.shared_models_dir, f"reference_v{version}.json")
+
+            copy(self.reference_file, reference_file)
+
+            return reference_file
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def load_reference(self, reference_file):
+        """
+        Method Name :   load_reference
+        Description :   This method loads the reference histograms, references are versioned and never rewritten so each
+                        is read once per process. It is on the online path so it does not log
+
+        Output      :   Reference is returned as dict, None if the model has no reference
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            if reference_file is None or not exists(reference_file):
+                return None
+
+            reference = Drift_Monitor.references.get(reference_file)
+
+            if reference is None:
+                with open(reference_file) as f:
+                    reference = load(f)
+
+                reference["counts"] = np.asarray(reference["counts"], dtype=np.int64)
+
+                reference["file"] = reference_file
+
+                Drift_Monitor.references[reference_file] = reference
+
+            return reference
+
+        except Exception as e:
+            raise e
+
+    def compare(self, profile, reference):
+        """
+        Method Name :   compare
+        Description :   This method computes the population stability index and the chi-square test of the histogram
+                        of every feature of the reference in the profile, vectorized over all the features, so online
+                        windows are compared on the features the production model was trained on. Counts are smoothed
+                        so empty bins do not give infinite values, and only bins seen by either side are tested
+
+        Output      :   A dict of psi, chi-square statistic, p value and drift flag per feature is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            from scipy.stats import chi2
+
+            columns = [c for c in reference["columns"] if c in profile["columns"]]
+
+            if not columns:
+                raise Exception("No features of the reference are in the data profile")
+
+            index = [profile["columns"].index(c) for c in columns]
+
+            current = profile["counts"][index].astype(np.float64)
+
+            expected = reference["counts"][
+                [reference["columns"].index(c) for c in columns]
+            ].astype(np.float64)
+
+            seen = (current > 0) | (expected > 0)
+
+            smoothing = self.drift_config["smoothing"]
+
+            p = (expected + smoothing) * seen
+
+            p /= p.sum(axis=1, keepdims=True)
+
+            q = (current + smoothing) * seen
+
+            q /= q.sum(axis=1, keepdims=True)
+
+            ratio = np.where(seen, q / np.where(seen, p, 1), 1)
+
+            psi = ((q - p) * np.log(ratio)).sum(axis=1)
+
+            n = current.sum(axis=1, keepdims=True)
+
+            stat = np.where(seen, (current - p * n) ** 2 / np.where(seen, p * n, 1), 0)
+
+            stat = stat.sum(axis=1)
+
+            dof = seen.sum(axis=1) - 1
+
+            p_values = np.where(dof > 0, chi2.sf(stat, np.maximum(dof, 1)), 1.0)
+
+            drifted = (psi >= self.drift_config["psi_threshold"]) & (
+                p_values < self.drift_config["p_value"]
+            )
+
+            return {
+                c: {
+                    "psi": round(float(psi[j]), 6),
+                    "chi2": round(float(stat[j]), 4),
+                    "p_value": float(p_values[j]),
+                    "drift": bool(drifted[j]),
+                }
+                for j, c in enumerate(columns)
+            }
+
+        except Exception as e:
+            raise e
+
+    def check(self, profile, name, source, reference_file):
+        """
+        Method Name :   check
+        Description :   This method compares the profile of a prediction batch or online window to the reference of
+                        the production model, writes the drift report and marks the training state when any feature
+                        has drifted, so the next training does a full search. The training state is updated under the
+                        registry lock, so it never overwrites a promotion or a training of another process
+
+        Output      :   Drift report is written and returned as dict, None if the model has no reference
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.check.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            reference = self.load_reference(reference_file)
+
+            if reference is None:
+                self.log_writer.log(
+                    f"Production model has no reference histograms, skipped drift check of {name}",
+                    **log_dic,
+                )
+
+                self.log_writer.start_log("exit", **log_dic)
+
+                return None
+
+            features = self.compare(profile, reference)
+
+            drifted = [c for c, f in features.items() if f["drift"]]
+
+            enough_rows = profile["rows"] >= self.drift_config["min_rows"]
+
+            report = {
+                "name": name,
+                "source": source,
+                "checked_at": datetime.now().isoformat(),
+                "reference_file": reference_file,
+                "reference_rows": reference["rows"],
+                "rows": profile["rows"],
+                "drift": bool(drifted) and enough_rows,
+                "drifted_features": drifted if enough_rows else [],
+                "max_psi": max((f["psi"] for f in features.values()), default=0.0),
+                "features": features,
+            }
+
+            makedirs(self.reports_dir, exist_ok=True)
+
+            report_file = join(self.reports_dir, basename(name) + ".json")
+
+            with open(report_file + ".tmp", "w") as f:
+                dump(report, f, indent=4)
+
+            replace(report_file + ".tmp", report_file)
+
+            self.log_writer.log(
+                f"Drift check of {source} {name} with {profile['rows']} rows: max psi {report['max_psi']}, drifted features {report['drifted_features']}",
+                **log_dic,
+            )
+
+            if report["drift"]:
+                self.model_registry.update_training_state(
+                    {"drift_detected": True, "drift_report": name}, self.log_file
+                )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return report
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def start_checker(self):
+        """
+        Method Name :   start_checker
+        Description :   This method starts the background thread of the worker which checks the full online windows
+                        put on a bounded queue
+
+        Output      :   Window checker thread is started
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.start_checker.__name__,
+            __file__,
+            self.log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            self.queue = Queue(self.drift_config["queue_size"])
+
+            self.checker = Thread(
+                target=self.run_checks, args=(self.queue,), daemon=True
+            )
+
+            self.checker.start()
+
+            self.log_writer.log("Started online drift window checker", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def run_checks(self, queue):
+        """
+        Method Name :   run_checks
+        Description :   This method checks the online windows taken from the queue one at a time. A failed check is
+                        already logged by check, so the thread goes on with the next window
+
+        Output      :   Drift reports of the online windows are written
+        On Failure  :   Write an exception log and go on with the next window
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        while True:
+            window, name, reference_file = queue.get()
+
+            try:
+                self.check(window, name, "online", reference_file)
+
+            except Exception:
+                pass
+
+    def observe(self, data, reference_file):
+        """
+        Method Name :   observe
+        Description :   This method adds the histogram counts of the online rows to the current window and puts the
+                        window on the queue of the checker thread when it is full, a window is dropped when the queue
+                        is full. The window starts over when the production model changes. It is on the online path so
+                        it does not log
+
+        Output      :   True is returned when a full window was queued
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            if reference_file is None:
+                return False
+
+            if any(dtype.kind not in "iuf" for dtype in data.dtypes):
+                data = data.apply(to_numeric, errors="coerce")
+
+            profile = self.data_profiler.profile_chunk(data, row_hashes=False)
+
+            if self.window is None or self.window_reference != reference_file:
+                self.window, self.window_reference = profile, reference_file
+
+            else:
+                self.window["rows"] += profile["rows"]
+
+                self.window["counts"] += profile["counts"]
+
+            if self.window["rows"] < self.drift_config["online_window"]:
+                return False
+
+            window, self.window = self.window, None
+
+            name = f"online_{getpid()}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+
+            if self.checker is None or not self.checker.is_alive():
+                self.start_checker()
+
+            try:
+                self.queue.put_nowait((window, name, reference_file))
+
+            except Full:
+                return False
+
+            return True
+
+        except Exception as e:
+            raise e
+
+    def get_report(self, name=None, source=None):
+        """
+        Method Name :   get_report
+        Description :   This method gets the drift report of the name, or the latest report of the source, batch or
+                        online, when no name is given
+
+        Output      :   Drift report is returned, None if there is no report
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_report.__name__, __file__, self.log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            report = None
+
+            if exists(self.reports_dir):
+                if name is None:
+                    reports = sorted(
+                        (
+                            join(self.reports_dir, f)
+                            for f in listdir(self.reports_dir)
+                            if f.endswith(".json")
+                            and (
+                                source is None
+                                or f.startswith("online_") == (source == "online")
+                            )
+                        ),
+                        key=getmtime,
+                    )
+
+                    if reports:
+                        with open(reports[-1], "r") as f:
+                            report = load(f)
+
+                else:
+                    report_file = join(self.reports_dir, basename(name) + ".json")
+
+                    if exists(report_file):
+                        with open(report_file, "r") as f:
+                            report = load(f)
+
+            self.log_writer.log(f"Got drift report {name or source}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return report
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
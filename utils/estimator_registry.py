@@ -0,0 +1,108 @@
+from importlib import import_module
+
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class Estimator_Registry:
+    """
+    Description :   This class is used for resolving the model names in train_model to estimator classes. Names are
+                    mapped to import paths in the estimators section of params.yaml or registered at runtime, and each
+                    class is imported on first use and cached for the process
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    paths = {}
+
+    classes = {}
+
+    def __init__(self):
+        self.config = read_params()
+
+        self.log_writer = App_Logger()
+
+        for model_name in self.config["train_model"]:
+            path = self.config["estimators"].get(model_name)
+
+            if path is not None:
+                Estimator_Registry.paths.setdefault(model_name, path)
+
+    @classmethod
+    def register(cls, model_name, estimator):
+        """
+        Method Name :   register
+        Description :   This method registers an estimator under the model name, the estimator can be a class or an
+                        import path of the form module.Class which is imported on first use
+
+        Output      :   Estimator is registered under the model name
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            cls.classes.pop(model_name, None)
+
+            if isinstance(estimator, str):
+                cls.paths[model_name] = estimator
+
+            else:
+                cls.paths[model_name] = f"{estimator.__module__}.{estimator.__name__}"
+
+                cls.classes[model_name] = estimator
+
+        except Exception as e:
+            raise e
+
+    def get_class(self, model_name, log_file):
+        """
+        Method Name :   get_class
+        Description :   This method gets the estimator class of the model name. A name with no registered path is looked
+                        up once in sklearn all_estimators
+
+        Output      :   Estimator class is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_class.__name__, __file__, log_file
+        )
+
+        try:
+            estimator = Estimator_Registry.classes.get(model_name)
+
+            if estimator is not None:
+                return estimator
+
+            path = Estimator_Registry.paths.get(model_name)
+
+            if path is not None:
+                module_name, class_name = path.rsplit(".", 1)
+
+                estimator = getattr(import_module(module_name), class_name)
+
+            else:
+                from sklearn.utils import all_estimators
+
+                estimator = dict(all_estimators()).get(model_name)
+
+                if estimator is None:
+                    raise Exception(
+                        f"{model_name} is not registered in estimators and is not a sklearn estimator"
+                    )
+
+            Estimator_Registry.classes[model_name] = estimator
+
+            self.log_writer.log(
+                f"Resolved {model_name} to {estimator.__module__}.{estimator.__name__}",
+                **log_dic,
+            )
+
+            return estimator
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
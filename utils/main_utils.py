@@ -1,9 +1,9 @@
+from contextlib import contextmanager
 from json import load
 from os import listdir, makedirs
-from os.path import isdir
-
-from pandas import read_csv
+from os.path import dirname, isdir
 
+from utils.columnar_cache import Columnar_Cache
 from utils.logger import App_Logger
 from utils.read_params import get_log_dic, read_params
 
@@ -14,6 +14,8 @@ class Main_Utils:
 
         self.config = read_params()
 
+        self.columnar_cache = Columnar_Cache()
+
     def read_json(self, file, log_file):
         """
         Method Name :   read_json
@@ -115,7 +117,7 @@ class Main_Utils:
     def create_dirs_for_good_bad_data(self, key, log_file):
         """
         Method Name :   create_dirs_for_good_bad_data
-        Description :   This method creates good and bad data folders 
+        Description :   This method creates good and bad data folders
 
         Output      :   Good and bad data folder are created
         On Failure  :   Write an exception log and then raise an exception
@@ -150,10 +152,10 @@ class Main_Utils:
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
-    def read_csv_from_folder(self, folder_name, log_file):
+    def read_csv_from_folder(self, folder_name, log_file, files=None):
         """
         Method Name :   read_csv_from_folder
-        Description :   This method reads the csv files from the folder 
+        Description :   This method reads the csv files from the folder, or only the given files of the folder
 
         Output      :   A list of dataframes is returned
         On Failure  :   Write an exception log and then raise an exception
@@ -175,11 +177,11 @@ class Main_Utils:
 
             self.log_writer.log("Reading csv files from folder", **log_dic)
 
-            for f in listdir(folder_name):
+            for f in listdir(folder_name) if files is None else files:
                 fname = folder_name + "/" + f
 
                 if fname.endswith(".csv"):
-                    df = read_csv(fname)
+                    df = self.columnar_cache.read_csv(fname, log_file)
 
                     self.log_writer.log(
                         f"Read {fname} csv file from folder as dataframe", **log_dic
@@ -247,3 +249,31 @@ class Main_Utils:
 
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
+
+    @contextmanager
+    def file_lock(self, lock_file):
+        """
+        Method Name :   file_lock
+        Description :   This method holds an exclusive flock on the lock file inside the with block, so that the block
+                        runs in one thread of one worker process at a time. It is used around the batch pipelines and
+                        the read-modify-write of the model registry, and as the registry is written on the online path
+                        it does not log
+
+        Output      :   Lock on the lock file is held inside the with block
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        from fcntl import LOCK_EX, LOCK_UN, flock
+
+        makedirs(dirname(lock_file) or ".", exist_ok=True)
+
+        with open(lock_file, "a") as f:
+            flock(f, LOCK_EX)
+
+            try:
+                yield
+
+            finally:
+                flock(f, LOCK_UN)
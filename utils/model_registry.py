@@ -0,0 +1,380 @@
+from datetime import datetime
+from json import dump, load
+from os import replace
+from os.path import exists, getmtime
+
+from utils.logger import App_Logger
+from utils.main_utils import Main_Utils
+from utils.read_params import get_log_dic, read_params
+
+
+class Model_Registry:
+    """
+    Description :   This class is used for keeping track of the production model pointer and the model manifest
+                    in the model registry file. The read-modify-write updates hold the registry lock file, so the
+                    train and predict pipelines and the serving workers do not overwrite each other
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    def __init__(self):
+        self.config = read_params()
+
+        self.registry_file = self.config["model_registry_file"]
+
+        self.lock_file = self.registry_file + ".lock"
+
+        self.log_writer = App_Logger()
+
+        self.utils = Main_Utils()
+
+    def get_registry(self, log_file):
+        """
+        Method Name :   get_registry
+        Description :   This method reads the model registry file, an empty registry is returned when it does not exist
+
+        Output      :   Model registry is returned as dict
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_registry.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            registry = {
+                "version": 0,
+                "production": None,
+                "models": {},
+                "lineage": [],
+                "training": {},
+            }
+
+            if exists(self.registry_file):
+                with open(self.registry_file, "r") as f:
+                    registry.update(load(f))
+
+                self.log_writer.log(
+                    f"Read model registry from {self.registry_file} file", **log_dic
+                )
+
+            else:
+                self.log_writer.log(
+                    f"{self.registry_file} file not found, using an empty registry",
+                    **log_dic,
+                )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return registry
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def save_registry(self, registry, log_file):
+        """
+        Method Name :   save_registry
+        Description :   This method writes the model registry to a temp file and atomically replaces the registry file,
+                        so that serving workers never read a partially written registry
+
+        Output      :   Model registry is written to the registry file
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.save_registry.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            tmp_file = self.registry_file + ".tmp"
+
+            with open(tmp_file, "w") as f:
+                dump(registry, f, indent=4, default=str)
+
+            replace(tmp_file, self.registry_file)
+
+            self.log_writer.log(
+                f"Saved model registry to {self.registry_file} file", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def set_prod_pointer(
+        self,
+        model_name,
+        model_file,
+        shared_model_file,
+        log_file,
+        reference_file=None,
+        cascade_file=None,
+        features=None,
+    ):
+        """
+        Method Name :   set_prod_pointer
+        Description :   This method points the registry to the new production model and bumps the registry version. The
+                        reference histograms of the model for drift monitoring, its cascade and the features it was
+                        trained on are kept in the pointer
+
+        Output      :   Production pointer is updated in the model registry and new version is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.set_prod_pointer.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            with self.utils.file_lock(self.lock_file):
+                registry = self.get_registry(log_file)
+
+                version = registry["version"] + 1
+
+                registry["version"] = version
+
+                registry["production"] = {
+                    "model_name": model_name,
+                    "lineage_id": registry["models"]
+                    .get(model_name, {})
+                    .get("lineage_id"),
+                    "model_file": model_file,
+                    "shared_model_file": shared_model_file,
+                    "reference_file": reference_file,
+                    "cascade_file": cascade_file,
+                    "features": features,
+                    "version": version,
+                    "promoted_at": datetime.now().isoformat(),
+                }
+
+                self.save_registry(registry, log_file)
+
+            self.log_writer.log(
+                f"Pointed production to {model_name} model with version {version}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return version
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_prod_pointer(self, log_file):
+        """
+        Method Name :   get_prod_pointer
+        Description :   This method gets the production pointer from the model registry
+
+        Output      :   Production pointer is returned as dict, None if no model is promoted yet
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_prod_pointer.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            pointer = self.get_registry(log_file)["production"]
+
+            self.log_writer.log(f"Got production pointer as {pointer}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return pointer
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def update_manifest(self, model_name, fields, log_file):
+        """
+        Method Name :   update_manifest
+        Description :   This method merges the fields into the manifest of the model in the model registry
+
+        Output      :   Model manifest is updated in the model registry
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.update_manifest.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            with self.utils.file_lock(self.lock_file):
+                registry = self.get_registry(log_file)
+
+                registry["models"].setdefault(model_name, {}).update(fields)
+
+                self.save_registry(registry, log_file)
+
+            self.log_writer.log(
+                f"Updated manifest of {model_name} model with {list(fields)}", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_manifest(self, model_name, log_file):
+        """
+        Method Name :   get_manifest
+        Description :   This method gets the manifest of the model from the model registry
+
+        Output      :   Model manifest is returned as dict, empty if the model is not registered
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_manifest.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            manifest = self.get_registry(log_file)["models"].get(model_name, {})
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return manifest
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def add_lineage(self, model_name, mode, params, rows_total, rows_new, log_file):
+        """
+        Method Name :   add_lineage
+        Description :   This method adds a lineage entry for a trained model. Incremental entries point to the lineage
+                        entry of the model they were trained from, full search entries start a new line
+
+        Output      :   Lineage entry is added to the model registry and its id is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.add_lineage.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            with self.utils.file_lock(self.lock_file):
+                registry = self.get_registry(log_file)
+
+                manifest = registry["models"].setdefault(model_name, {})
+
+                lineage_id = len(registry["lineage"]) + 1
+
+                registry["lineage"].append(
+                    {
+                        "lineage_id": lineage_id,
+                        "model_name": model_name,
+                        "mode": mode,
+                        "parent_id": (
+                            None if mode == "full" else manifest.get("lineage_id")
+                        ),
+                        "params": params,
+                        "rows_total": rows_total,
+                        "rows_new": rows_new,
+                        "trained_at": datetime.now().isoformat(),
+                    }
+                )
+
+                manifest["lineage_id"] = lineage_id
+
+                self.save_registry(registry, log_file)
+
+            self.log_writer.log(
+                f"Added lineage entry {lineage_id} for {model_name} model trained with {mode} mode",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return lineage_id
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def update_training_state(self, fields, log_file):
+        """
+        Method Name :   update_training_state
+        Description :   This method merges the fields into the training state of the model registry, like the time of
+                        the last full search and the number of rows seen
+
+        Output      :   Training state is updated in the model registry
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.update_training_state.__name__,
+            __file__,
+            log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            with self.utils.file_lock(self.lock_file):
+                registry = self.get_registry(log_file)
+
+                registry.setdefault("training", {}).update(fields)
+
+                self.save_registry(registry, log_file)
+
+            self.log_writer.log(f"Updated training state with {fields}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_registry_stamp(self):
+        """
+        Method Name :   get_registry_stamp
+        Description :   This method gets the modification time of the registry file, it is called on every online request
+                        so it does not log
+
+        Output      :   Modification time of the registry file is returned, None if it does not exist
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            if exists(self.registry_file):
+                return getmtime(self.registry_file)
+
+            return None
+
+        except Exception as e:
+            raise e
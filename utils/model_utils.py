@@ -1,19 +1,27 @@
 from os import listdir
-from os.path import join
-from pickle import dump, load
+from os.path import exists, isdir, join
+from shutil import copy
+from pickle import HIGHEST_PROTOCOL, dump, dumps, load
+from time import perf_counter
 
-import xgboost
-from sklearn.metrics import roc_auc_score
-from sklearn.model_selection import GridSearchCV
-from sklearn.utils import all_estimators
+import joblib
+import numpy as np
 
+from utils.cascade_model import Cascade_Model
+from utils.estimator_registry import Estimator_Registry
 from utils.logger import App_Logger
+from utils.model_registry import Model_Registry
 from utils.read_params import get_log_dic, read_params
+from utils.shared_tree_model import Shared_Tree_Model
+from utils.stage_profiler import Stage_Profiler
+from utils.train_cache import Train_Cache
 
 
 class Model_Utils:
     """
-    Description :   This class is used for model utility functions required in model training
+    Description :   This class is used for model utility functions required in model training. sklearn is imported
+                    inside the methods which need it and estimators are imported by the estimator registry on first
+                    use, so that importing this class stays cheap for serving
     Version     :   1.2
     
     Revisions   :   Moved to setup to cloud 
@@ -30,14 +38,42 @@ class Model_Utils:
             self.artifact_folder + "/" + self.config["model_dir"]["trained"]
         )
 
+        self.shared_models_dir = (
+            self.artifact_folder + "/" + self.config["model_dir"]["shared"]
+        )
+
         self.save_format = self.config["save_format"]
 
+        self.shared_save_format = self.config["shared_save_format"]
+
+        self.model_registry = Model_Registry()
+
+        self.train_cache = Train_Cache()
+
+        self.estimator_registry = Estimator_Registry()
+
+        self.profiler = Stage_Profiler()
+
+        self.search_config = self.config["search_sample"]
+
+        self.eval_config = self.config["model_eval"]
+
+        self.selection_config = self.config["model_selection"]
+
+        self.cascade_config = self.config["cascade"]
+
+        self.target_col = self.config["target_col"]
+
+        self.random_state = self.config["base"]["random_state"]
+
         self.log_writer = App_Logger()
 
     def get_model_score(self, model, test_x, test_y, log_file):
         """
         Method Name :   get_model_score
-        Description :   This method gets model score againist the test data
+        Description :   This method gets model score againist the test data. The test data is scored once with
+                        predict_proba and the metrics bundle of ROC AUC, PR AUC, log loss and confusion matrix at the
+                        configured threshold is computed from that one pass and kept in model_metrics
 
         Output      :   A model score is returned 
         On Failure  :   Write an exception log and then raise an exception
@@ -52,15 +88,54 @@ class Model_Utils:
         self.log_writer.start_log("start", **log_dic)
 
         try:
+            from sklearn.metrics import (
+                average_precision_score,
+                confusion_matrix,
+                log_loss,
+                roc_auc_score,
+            )
+
             model_name = model.__class__.__name__
 
-            preds = model.predict(test_x)
+            proba = model.predict_proba(test_x)
 
             self.log_writer.log(
                 f"Used {model_name} model to get predictions on test data", **log_dic
             )
 
-            self.model_score = roc_auc_score(test_y, preds)
+            neg_label, pos_label = sorted(model.classes_)
+
+            scores = proba[:, list(model.classes_).index(pos_label)]
+
+            threshold = self.eval_config["threshold"]
+
+            preds = np.where(scores >= threshold, pos_label, neg_label)
+
+            tn, fp, fn, tp = confusion_matrix(
+                test_y, preds, labels=[neg_label, pos_label]
+            ).ravel()
+
+            self.model_metrics = {
+                "roc_auc": float(roc_auc_score(test_y, scores)),
+                "pr_auc": float(
+                    average_precision_score(test_y, scores, pos_label=pos_label)
+                ),
+                "log_loss": float(log_loss(test_y, proba, labels=model.classes_)),
+                "threshold": threshold,
+                "confusion_matrix": {
+                    "tn": int(tn),
+                    "fp": int(fp),
+                    "fn": int(fn),
+                    "tp": int(tp),
+                },
+                "test_rows": len(test_y),
+            }
+
+            self.model_score = self.model_metrics["roc_auc"]
+
+            self.log_writer.log(
+                f"Metrics for {model_name} are {self.model_metrics}", **log_dic
+            )
 
             self.log_writer.log(
                 f"ROC AUC score for {model_name} is {self.model_score}", **log_dic
@@ -73,10 +148,264 @@ class Model_Utils:
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
-    def get_model_params(self, model, x_train, y_train, log_file):
+    def get_serving_costs(self, model, test_x, log_file):
+        """
+        Method Name :   get_serving_costs
+        Description :   This method measures the serving costs of the model on the test data, the latency of scoring
+                        batches of batch_rows rows and of single rows, and the size of the pickled model. The first call
+                        is a warm up and is not measured
+
+        Output      :   A dict of p50 and p99 latencies in milliseconds and the size in bytes is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_serving_costs.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            model_name = model.__class__.__name__
+
+            batch_rows = self.selection_config["batch_rows"]
+
+            model.predict(test_x.iloc[:1])
+
+            batch_ms, single_ms = [], []
+
+            for i in range(self.selection_config["batches"]):
+                start_row = (i * batch_rows) % max(len(test_x) - batch_rows, 1)
+
+                batch = test_x.iloc[start_row : start_row + batch_rows]
+
+                start = perf_counter()
+
+                model.predict(batch)
+
+                batch_ms.append((perf_counter() - start) * 1000)
+
+            for i in range(min(self.selection_config["single_rows"], len(test_x))):
+                row = test_x.iloc[i : i + 1]
+
+                start = perf_counter()
+
+                model.predict(row)
+
+                single_ms.append((perf_counter() - start) * 1000)
+
+            costs = {
+                "batch_rows": min(batch_rows, len(test_x)),
+                "p50_batch_ms": round(float(np.percentile(batch_ms, 50)), 3),
+                "p99_batch_ms": round(float(np.percentile(batch_ms, 99)), 3),
+                "p50_single_ms": round(float(np.percentile(single_ms, 50)), 3),
+                "p99_single_ms": round(float(np.percentile(single_ms, 99)), 3),
+                "size_bytes": len(dumps(model, protocol=HIGHEST_PROTOCOL)),
+            }
+
+            self.log_writer.log(
+                f"Serving costs for {model_name} are {costs}", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return costs
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_cascade_model(self, model, train_x, test_x, log_file):
+        """
+        Method Name :   get_cascade_model
+        Description :   This method trains the first stage of the cascade of the model. A shallow decision tree is fitted
+                        on the labels of the model for a sample of the train data. The test data is split in two halves,
+                        the thresholds are tuned on the first half to keep the agreement with the model above the
+                        agreement target, and the agreement, the share of the escalated rows and the latency of the
+                        cascade and of the model alone are measured on the second half. The cascade is saved next to
+                        the trained model
+
+        Output      :   A dict of the cascade thresholds, agreement, escalation share and latencies is returned, None if
+                        the cascade is disabled or the model predicts a single class
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_cascade_model.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            if self.cascade_config["enabled"] is not True:
+                self.log_writer.start_log("exit", **log_dic)
+
+                return None
+
+            from sklearn.model_selection import train_test_split
+            from sklearn.tree import DecisionTreeClassifier
+
+            model_name = model.__class__.__name__
+
+            fit_x = train_x
+
+            if len(train_x) > self.cascade_config["fit_rows"]:
+                fit_x = train_x.sample(
+                    self.cascade_config["fit_rows"], random_state=self.random_state
+                )
+
+            fit_labels = model.predict(fit_x)
+
+            if len(np.unique(fit_labels)) < 2:
+                self.log_writer.log(
+                    f"{model_name} model predicts a single class, skipped the cascade",
+                    **log_dic,
+                )
+
+                self.log_writer.start_log("exit", **log_dic)
+
+                return None
+
+            first_model = DecisionTreeClassifier(
+                max_depth=self.cascade_config["max_depth"],
+                random_state=self.random_state,
+            ).fit(fit_x, fit_labels)
+
+            tune_x, test_x = train_test_split(
+                test_x, test_size=0.5, random_state=self.random_state
+            )
+
+            low, high, tune_agreement = Cascade_Model.tune_thresholds(
+                first_model.predict_proba(tune_x)[:, -1],
+                model.predict(tune_x),
+                first_model.classes_[-1],
+                self.cascade_config["agreement_target"],
+            )
+
+            cascade = Cascade_Model(first_model, low, high).attach(model)
+
+            agreement = float(np.mean(cascade.predict(test_x) == model.predict(test_x)))
+
+            escalation_rate = cascade.last_escalated / len(test_x)
+
+            latency = {}
+
+            for name, predictor in (("full", model), ("cascade", cascade)):
+                batch_ms = []
+
+                for _ in range(3):
+                    start = perf_counter()
+
+                    predictor.predict(test_x)
+
+                    batch_ms.append((perf_counter() - start) * 1000)
+
+                single_rows = min(self.selection_config["single_rows"], len(test_x))
+
+                start = perf_counter()
+
+                for i in range(single_rows):
+                    predictor.predict(test_x.iloc[i : i + 1])
+
+                latency[name] = {
+                    "batch_ms": min(batch_ms),
+                    "single_ms": (perf_counter() - start) * 1000 / single_rows,
+                }
+
+            report = {
+                "max_depth": self.cascade_config["max_depth"],
+                "low": low,
+                "high": high,
+                "agreement_target": self.cascade_config["agreement_target"],
+                "tune_agreement": round(tune_agreement, 6),
+                "agreement": round(agreement, 6),
+                "escalation_rate": round(escalation_rate, 6),
+                "full_batch_ms": round(latency["full"]["batch_ms"], 3),
+                "cascade_batch_ms": round(latency["cascade"]["batch_ms"], 3),
+                "full_single_ms": round(latency["full"]["single_ms"], 3),
+                "cascade_single_ms": round(latency["cascade"]["single_ms"], 3),
+                "batch_latency_saved": round(
+                    1 - latency["cascade"]["batch_ms"] / latency["full"]["batch_ms"], 4
+                ),
+                "single_latency_saved": round(
+                    1 - latency["cascade"]["single_ms"] / latency["full"]["single_ms"],
+                    4,
+                ),
+            }
+
+            joblib.dump(
+                cascade,
+                join(
+                    self.trained_models_dir,
+                    model_name + "_cascade" + self.shared_save_format,
+                ),
+            )
+
+            self.log_writer.log(f"Cascade for {model_name} is {report}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return report
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    @staticmethod
+    def fit_and_score_fold(model, params, x_data, y_data, sample_weight, fold):
+        """
+        Method Name :   fit_and_score_fold
+        Description :   This method fits a copy of the model with the params on the train rows of the fold and scores it
+                        on the test rows of the fold with the roc auc weighted by the sample weights of those rows. A
+                        candidate which fails to fit scores nan, as with the error score of GridSearchCV
+
+        Output      :   Weighted roc auc of the fold is returned, nan if the fit fails
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            from sklearn.base import clone
+            from sklearn.metrics import roc_auc_score
+
+            train_idx, test_idx = fold
+
+            fitted = clone(model).set_params(**params)
+
+            try:
+                fitted.fit(
+                    x_data.iloc[train_idx],
+                    y_data[train_idx],
+                    sample_weight=sample_weight[train_idx],
+                )
+
+            except Exception:
+                return float("nan")
+
+            return float(
+                roc_auc_score(
+                    y_data[test_idx],
+                    fitted.predict_proba(x_data.iloc[test_idx])[:, -1],
+                    sample_weight=sample_weight[test_idx],
+                )
+            )
+
+        except Exception as e:
+            raise e
+
+    def get_model_params(
+        self, model, x_train, y_train, log_file, data_hash=None, sample_weight=None
+    ):
         """
         Method Name :   get_model_params
-        Description :   This method gets the model parameters based on model_key_name and train data
+        Description :   This method gets the model parameters based on model_key_name and train data. Fold scores of each
+                        candidate are looked up in the train cache and only the candidates which are not cached are
+                        evaluated with GridSearchCV on the cached fold splits. With sample weights, every candidate is
+                        fitted and scored on each fold with the weights of the fold rows and ranked by the weighted roc
+                        auc, so deduplicated rows count as often as they appear in the train data
 
         Output      :   Best model parameters are returned
         On Failure  :   Write an exception log and then raise an exception
@@ -91,20 +420,92 @@ class Model_Utils:
         self.log_writer.start_log("start", **log_dic)
 
         try:
+            from sklearn.model_selection import GridSearchCV, ParameterGrid
+
             model_name = model.__class__.__name__
 
             self.model_param_grid = self.config["train_model"][model_name]
 
-            self.model_grid = GridSearchCV(
-                model, self.model_param_grid, **self.tuner_kwargs
-            )
+            cv = self.tuner_kwargs["cv"]
+
+            if data_hash is None:
+                data_hash = self.train_cache.get_data_hash(x_train, y_train, log_file)
+
+            folds = self.train_cache.get_fold_splits(data_hash, y_train, cv, log_file)
+
+            candidates = list(ParameterGrid(self.model_param_grid))
+
+            scoring = "default" if sample_weight is None else "weighted_roc_auc"
+
+            keys = [
+                self.train_cache.get_key(data_hash, model_name, params, cv, scoring)
+                for params in candidates
+            ]
+
+            fold_scores = [self.train_cache.get_scores(key, log_file) for key in keys]
+
+            missing = [i for i, scores in enumerate(fold_scores) if scores is None]
 
             self.log_writer.log(
-                f"Initialized {self.model_grid.__class__.__name__}  with {self.model_param_grid} as params",
+                f"Found {len(candidates) - len(missing)} of {len(candidates)} candidates of {model_name} model in train cache",
                 **log_dic,
             )
 
-            self.model_grid.fit(x_train, y_train)
+            if missing and sample_weight is None:
+                missing_grid = [
+                    {k: [v] for k, v in candidates[i].items()} for i in missing
+                ]
+
+                self.model_grid = GridSearchCV(
+                    model,
+                    missing_grid,
+                    refit=False,
+                    **dict(self.tuner_kwargs, cv=folds),
+                )
+
+                self.log_writer.log(
+                    f"Initialized {self.model_grid.__class__.__name__}  with {missing_grid} as params",
+                    **log_dic,
+                )
+
+                self.model_grid.fit(x_train, y_train)
+
+                for j, i in enumerate(missing):
+                    fold_scores[i] = [
+                        float(self.model_grid.cv_results_[f"split{k}_test_score"][j])
+                        for k in range(cv)
+                    ]
+
+            elif missing:
+                self.log_writer.log(
+                    f"Scoring {len(missing)} candidates of {model_name} model with weighted roc auc on {cv} folds",
+                    **log_dic,
+                )
+
+                y_data = np.asarray(y_train)
+
+                sample_weight = np.asarray(sample_weight)
+
+                scores = joblib.Parallel(
+                    n_jobs=self.tuner_kwargs["n_jobs"],
+                    verbose=self.tuner_kwargs["verbose"],
+                )(
+                    joblib.delayed(Model_Utils.fit_and_score_fold)(
+                        model, candidates[i], x_train, y_data, sample_weight, fold
+                    )
+                    for i in missing
+                    for fold in folds
+                )
+
+                for j, i in enumerate(missing):
+                    fold_scores[i] = scores[j * cv : (j + 1) * cv]
+
+            for i in missing:
+                self.train_cache.save_scores(
+                    keys[i], candidates[i], fold_scores[i], log_file
+                )
+
+            best_params = candidates[int(np.nanargmax(np.mean(fold_scores, axis=1)))]
 
             self.log_writer.log(
                 f"Found the best params for {model_name} model based on {self.model_param_grid} as params",
@@ -113,7 +514,7 @@ class Model_Utils:
 
             self.log_writer.start_log("exit", **log_dic)
 
-            return self.model_grid.best_params_
+            return best_params
 
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
@@ -121,9 +522,9 @@ class Model_Utils:
     def get_base_model(self, model_name, log_file):
         """
         Method Name :   get_base_model
-        Description :   This method gets the base model from sklearn lib
+        Description :   This method gets the base model from the estimator registry
 
-        Output      :   base model is returned from sklearn lib
+        Output      :   base model is returned from the estimator registry
         On Failure  :   Write an exception log and then raise an exception
 
         Version     :   1.2
@@ -136,18 +537,151 @@ class Model_Utils:
         self.log_writer.start_log("start", **log_dic)
 
         try:
-            if model_name.lower().startswith("xgb") is True:
-                model = xgboost.__dict__[model_name]()
+            model = self.estimator_registry.get_class(model_name, log_file)()
+
+            self.log_writer.log(
+                f"Got {model.__class__.__name__} as base model", **log_dic
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_search_sample(self, x_train, y_train, data_hash, log_file):
+        """
+        Method Name :   get_search_sample
+        Description :   This method gets the data for the hyperparameter search within the search budget. Duplicate rows
+                        are collapsed into one row weighted by its count, and when the unique rows exceed the budget a
+                        stratified sample of them is taken
+
+        Output      :   A tuple of search features, search target, sample weights and search data hash is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_search_sample.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            if self.search_config["enabled"] is not True:
+                self.log_writer.log("Search sampling is disabled", **log_dic)
+
+                self.log_writer.start_log("exit", **log_dic)
+
+                return x_train, y_train, None, data_hash
+
+            data = x_train.copy()
+
+            data[self.target_col] = np.asarray(y_train)
+
+            if self.search_config["dedup"] is True:
+                grouped = data.groupby(
+                    list(data.columns), sort=False, dropna=False
+                ).size()
+
+                data = grouped.index.to_frame(index=False)
+
+                counts = grouped.values
 
             else:
-                model_idx = [model[0] for model in all_estimators()].index(model_name)
+                counts = np.ones(len(data), dtype=np.int64)
+
+            budgets = [len(data)]
+
+            if self.search_config["size"] is not None:
+                budgets.append(self.search_config["size"])
+
+            if self.search_config["fraction"] is not None:
+                budgets.append(int(self.search_config["fraction"] * len(x_train)))
+
+            budget = min(budgets)
 
-                model = all_estimators().__getitem__(model_idx)[1]()
+            if budget < len(data):
+                from sklearn.model_selection import train_test_split
+
+                data, _, counts, _ = train_test_split(
+                    data,
+                    counts,
+                    train_size=budget,
+                    stratify=data[self.target_col],
+                    random_state=self.random_state,
+                )
+
+            search_x = data.drop(columns=[self.target_col]).reset_index(drop=True)
+
+            search_y = data[self.target_col].values
+
+            search_hash = self.train_cache.get_key(data_hash, self.search_config)
 
             self.log_writer.log(
-                f"Got {model.__class__.__name__} as base model", **log_dic
+                f"Got search sample of {len(search_x)} rows from {len(x_train)} train rows",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return search_x, search_y, counts, search_hash
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def fit_best_model(
+        self, model_name, best_params, train_x, train_y, data_hash, log_file
+    ):
+        """
+        Method Name :   fit_best_model
+        Description :   This method fits the base model with the best params on the full train data, the fitted model is
+                        taken from the train cache when the data and the best params have not changed
+
+        Output      :   Fitted model is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.fit_best_model.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            model_key = self.train_cache.get_key(
+                data_hash, model_name, best_params, "fit"
             )
 
+            model = self.train_cache.get_model(model_key, log_file)
+
+            if model is not None:
+                self.log_writer.log(
+                    f"Got fitted {model_name} model from train cache, skipped fitting",
+                    **log_dic,
+                )
+
+            else:
+                model = self.get_base_model(model_name, log_file)
+
+                model.set_params(**best_params)
+
+                self.log_writer.log(
+                    f"Fitting the best parameters for {model_name} model", **log_dic
+                )
+
+                model.fit(train_x, train_y)
+
+                self.log_writer.log(
+                    f"{model_name} model is trained with best parameters", **log_dic
+                )
+
+                self.train_cache.save_model(model_key, model, log_file)
+
             self.log_writer.start_log("exit", **log_dic)
 
             return model
@@ -155,10 +689,92 @@ class Model_Utils:
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
-    def get_tuned_model(self, model_name, train_x, train_y, test_x, test_y, log_file):
+    def compare_search_sample(
+        self,
+        model_name,
+        sampled_score,
+        train_x,
+        train_y,
+        test_x,
+        test_y,
+        data_hash,
+        log_file,
+    ):
+        """
+        Method Name :   compare_search_sample
+        Description :   This method runs the hyperparameter search on the full train data as well and reports the ROC AUC
+                        difference between the model tuned on the search sample and the model tuned on the full data.
+                        The score and metrics of the sampled model are kept, so they are the ones returned and recorded
+
+        Output      :   Comparison is written to the model manifest and the AUC difference is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.compare_search_sample.__name__,
+            __file__,
+            log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            full_params = self.get_model_params(
+                self.get_base_model(model_name, log_file),
+                train_x,
+                train_y,
+                log_file,
+                data_hash,
+            )
+
+            full_model = self.fit_best_model(
+                model_name, full_params, train_x, train_y, data_hash, log_file
+            )
+
+            sampled_metrics = self.model_metrics
+
+            full_score = self.get_model_score(full_model, test_x, test_y, log_file)
+
+            self.model_score, self.model_metrics = sampled_score, sampled_metrics
+
+            auc_diff = full_score - sampled_score
+
+            self.model_registry.update_manifest(
+                model_name,
+                {
+                    "search_sample": {
+                        "sampled_params": self.model_best_params,
+                        "full_params": full_params,
+                        "sampled_roc_auc": sampled_score,
+                        "full_roc_auc": full_score,
+                        "roc_auc_diff": auc_diff,
+                    }
+                },
+                log_file,
+            )
+
+            self.log_writer.log(
+                f"ROC AUC of {model_name} model is {sampled_score} with sampled search and {full_score} with full search, difference is {auc_diff}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return auc_diff
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_tuned_model(
+        self, model_name, train_x, train_y, test_x, test_y, log_file, data_hash=None
+    ):
         """
         Method Name :   get_tuned_model
-        Description :   This method tuned the base model based on the training data
+        Description :   This method tuned the base model based on the training data. The search runs on the search
+                        sample and the best params are fitted on the full training data
 
         Output      :   Tuned model is returned based on the training data
         On Failure  :   Write an exception log and then raise an exception
@@ -175,37 +791,158 @@ class Model_Utils:
         try:
             self.model = self.get_base_model(model_name, log_file)
 
-            self.model_best_params = self.get_model_params(
-                self.model, train_x, train_y, log_file
+            if data_hash is None:
+                data_hash = self.train_cache.get_data_hash(train_x, train_y, log_file)
+
+            search_x, search_y, search_w, search_hash = self.get_search_sample(
+                train_x, train_y, data_hash, log_file
             )
 
+            with self.profiler.stage("search", model=model_name, rows=len(search_x)):
+                self.model_best_params = self.get_model_params(
+                    self.model, search_x, search_y, log_file, search_hash, search_w
+                )
+
             self.log_writer.log(
                 f"Got best params for {self.model.__class__.__name__} model", **log_dic
             )
 
-            self.model.set_params(**self.model_best_params)
+            with self.profiler.stage("fit", model=model_name, rows=len(train_x)):
+                self.model = self.fit_best_model(
+                    model_name,
+                    self.model_best_params,
+                    train_x,
+                    train_y,
+                    data_hash,
+                    log_file,
+                )
 
-            self.log_writer.log(
-                f"Set the best params for {self.model.__class__.__name__} model",
-                **log_dic,
+            self.model_score = self.get_model_score(
+                self.model, test_x, test_y, log_file
             )
 
-            self.log_writer.log(
-                f"Fitting the best parameters for {self.model.__class__.__name__} model",
-                **log_dic,
+            with self.profiler.stage("serving_costs", model=model_name):
+                serving_costs = self.get_serving_costs(self.model, test_x, log_file)
+
+            with self.profiler.stage("cascade", model=model_name):
+                cascade = self.get_cascade_model(self.model, train_x, test_x, log_file)
+
+            self.model_registry.update_manifest(
+                model_name,
+                {
+                    "best_params": self.model_best_params,
+                    "search_rows": len(search_x),
+                    "metrics": self.model_metrics,
+                    "serving": serving_costs,
+                    "cascade": cascade,
+                },
+                log_file,
             )
 
-            self.model.fit(train_x, train_y)
-
-            self.log_writer.log(
-                f"{self.model.__class__.__name__} model is trained with best parameters",
-                **log_dic,
+            if self.search_config["compare_full_search"] and search_hash != data_hash:
+                self.compare_search_sample(
+                    model_name,
+                    self.model_score,
+                    train_x,
+                    train_y,
+                    test_x,
+                    test_y,
+                    data_hash,
+                    log_file,
+                )
+
+            self.model_registry.add_lineage(
+                model_name,
+                "full",
+                self.model_best_params,
+                len(train_x),
+                len(train_x),
+                log_file,
             )
 
-            self.preds = self.model.predict(test_x)
+            self.log_writer.start_log("exit", **log_dic)
+
+            return self.model_score, self.model, self.model.__class__.__name__
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_incremental_model(
+        self,
+        model_name,
+        prev_model,
+        best_params,
+        new_x,
+        new_y,
+        train_x,
+        train_y,
+        test_x,
+        test_y,
+        log_file,
+    ):
+        """
+        Method Name :   get_incremental_model
+        Description :   This method trains the model incrementally with the best params of the last full search. Models
+                        with warm_start get new trees fitted on the new rows, xgboost continues boosting from the booster
+                        of the previous model, the rest are refitted on the train data without a search
+
+        Output      :   A tuple of model score, model and model name is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_incremental_model.__name__,
+            __file__,
+            log_file,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            inc_config = self.config["incremental_training"]
+
+            can_continue = prev_model is not None and len(np.unique(new_y)) > 1
+
+            with self.profiler.stage("fit", model=model_name) as stage:
+                if can_continue and "warm_start" in prev_model.get_params():
+                    self.model = prev_model
+
+                    self.model.set_params(
+                        warm_start=True,
+                        n_estimators=prev_model.n_estimators + inc_config["new_trees"],
+                    )
+
+                    self.model.fit(new_x, new_y)
+
+                    mode, rows = "warm_start", len(new_x)
+
+                elif can_continue and model_name.lower().startswith("xgb"):
+                    self.model = self.get_base_model(model_name, log_file)
+
+                    self.model.set_params(**best_params)
+
+                    self.model.set_params(n_estimators=inc_config["new_rounds"])
+
+                    self.model.fit(new_x, new_y, xgb_model=prev_model.get_booster())
+
+                    mode, rows = "continued_boosting", len(new_x)
+
+                else:
+                    self.model = self.get_base_model(model_name, log_file)
+
+                    self.model.set_params(**best_params)
+
+                    self.model.fit(train_x, train_y)
+
+                    mode, rows = "refit", len(train_x)
+
+                stage.update(mode=mode, rows=rows)
 
             self.log_writer.log(
-                f"Used {self.model.__class__.__name__} model for getting predictions",
+                f"Trained {model_name} model incrementally with {mode} mode on {rows} rows",
                 **log_dic,
             )
 
@@ -213,6 +950,26 @@ class Model_Utils:
                 self.model, test_x, test_y, log_file
             )
 
+            with self.profiler.stage("serving_costs", model=model_name):
+                serving_costs = self.get_serving_costs(self.model, test_x, log_file)
+
+            with self.profiler.stage("cascade", model=model_name):
+                cascade = self.get_cascade_model(self.model, train_x, test_x, log_file)
+
+            self.model_registry.update_manifest(
+                model_name,
+                {
+                    "metrics": self.model_metrics,
+                    "serving": serving_costs,
+                    "cascade": cascade,
+                },
+                log_file,
+            )
+
+            self.model_registry.add_lineage(
+                model_name, mode, best_params, len(train_x), len(new_x), log_file
+            )
+
             self.log_writer.start_log("exit", **log_dic)
 
             return self.model_score, self.model, self.model.__class__.__name__
@@ -292,10 +1049,204 @@ class Model_Utils:
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
 
+    def save_shared_model(self, model, version, log_file):
+        """
+        Method Name :   save_shared_model
+        Description :   This method saves the model to the shared model folder in a form which the serving workers can
+                        memory map read-only. Tree ensembles are flattened to node arrays, other models are saved
+                        uncompressed with joblib. The registry version is part of the name, a file which is mapped by a
+                        worker is never overwritten
+
+        Output      :   Model is saved to shared model folder and the shared model file is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.save_shared_model.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            model_filename = model.__class__.__name__ + "_v" + str(version)
+
+            if Shared_Tree_Model.is_supported(model):
+                model_file = join(self.shared_models_dir, model_filename)
+
+                Shared_Tree_Model.save(model, model_file)
+
+            else:
+                model_file = join(
+                    self.shared_models_dir, model_filename + self.shared_save_format
+                )
+
+                joblib.dump(model, model_file)
+
+            self.log_writer.log(f"Saved shared model to {model_file}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model_file
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def load_shared_model(self, model_file, log_file):
+        """
+        Method Name :   load_shared_model
+        Description :   This method loads the model from the shared model folder with its arrays memory mapped read-only,
+                        so the pages are shared between the serving workers through the page cache
+
+        Output      :   Shared model is loaded from the shared model folder
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.load_shared_model.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            self.log_writer.log(f"Loading {model_file} shared model", **log_dic)
+
+            if isdir(model_file):
+                model = Shared_Tree_Model(model_file)
+
+            else:
+                model = joblib.load(model_file, mmap_mode="r")
+
+            self.log_writer.log(f"Loaded {model_file} shared model", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def is_within_budget(self, serving_costs):
+        """
+        Method Name :   is_within_budget
+        Description :   This method checks the serving costs of a model against the budget of the selection policy. A
+                        limit which is not set, or a cost which was not measured, does not rule the model out
+
+        Output      :   True is returned if the model is within the budget
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            budget = self.selection_config["budget"]
+
+            limits = {
+                "p99_single_ms": budget["p99_single_ms"],
+                "p99_batch_ms": budget["p99_batch_ms"],
+                "size_bytes": (
+                    None
+                    if budget["size_mb"] is None
+                    else budget["size_mb"] * 1024 * 1024
+                ),
+            }
+
+            return all(
+                limit is None
+                or serving_costs.get(cost) is None
+                or serving_costs[cost] <= limit
+                for cost, limit in limits.items()
+            )
+
+        except Exception as e:
+            raise e
+
+    def promote_cascade(self, model_name, version, log_file):
+        """
+        Method Name :   promote_cascade
+        Description :   This method copies the cascade of the trained model to the shared model folder with the registry
+                        version in the name, next to the shared model
+
+        Output      :   Shared cascade file is returned, None if the model has no cascade
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.promote_cascade.__name__, __file__, log_file
+        )
+
+        try:
+            cascade_file = join(
+                self.trained_models_dir,
+                model_name + "_cascade" + self.shared_save_format,
+            )
+
+            if not exists(cascade_file):
+                return None
+
+            shared_cascade_file = join(
+                self.shared_models_dir,
+                f"cascade_v{version}" + self.shared_save_format,
+            )
+
+            copy(cascade_file, shared_cascade_file)
+
+            self.log_writer.log(
+                f"Saved cascade of {model_name} model to {shared_cascade_file}",
+                **log_dic,
+            )
+
+            return shared_cascade_file
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def load_cascade(self, cascade_file, full_model, log_file):
+        """
+        Method Name :   load_cascade
+        Description :   This method loads the cascade of the production model and attaches the full model to it
+
+        Output      :   Cascade model is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.load_cascade.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            cascade = joblib.load(cascade_file).attach(full_model)
+
+            self.log_writer.log(
+                f"Loaded cascade {cascade_file} with thresholds {cascade.low} and {cascade.high}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return cascade
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
     def get_best_model_name(self, lst, log_file):
         """
         Method Name :   get_best_model_name
-        Description :   This method gets the best model based on the condition from list of tuple of model name and model score
+        Description :   This method gets the best model based on the condition from list of tuple of model name and model score.
+                        Models are ranked by the select metric of the metrics bundle in the model manifest, the model
+                        score is used when a model has no metrics bundle. With the score_within_budget policy only the
+                        models whose serving costs are within the budget are ranked, all the models are ranked when none
+                        is. Models within tie_tolerance of the best score are tied and the one with the lowest p99 single
+                        row latency, then the smallest size, is chosen. The decision is kept in the model manifest
 
         Output      :   Best model name is returned from list of tuple of model name and model score
         On Failure  :   Write an exception log and then raise an exception
@@ -318,16 +1269,88 @@ class Model_Utils:
                 **log_dic,
             )
 
-            min_score_model_name = max(lst)[2]
+            metric = self.eval_config["select_metric"]
+
+            sign = -1 if metric == "log_loss" else 1
+
+            policy = self.selection_config["policy"]
+
+            models = self.model_registry.get_registry(log_file)["models"]
+
+            candidates = {}
+
+            for model_score, _, model_name in lst:
+                manifest = models.get(model_name, {})
+
+                metrics = manifest.get("metrics")
+
+                serving_costs = manifest.get("serving", {})
+
+                candidates[model_name] = {
+                    "score": model_score if metrics is None else sign * metrics[metric],
+                    "serving": serving_costs,
+                    "within_budget": self.is_within_budget(serving_costs),
+                }
+
+            pool = list(candidates)
+
+            if policy == "score_within_budget":
+                pool = [m for m in pool if candidates[m]["within_budget"]] or pool
+
+                if not any(c["within_budget"] for c in candidates.values()):
+                    self.log_writer.log(
+                        "No model is within the serving budget, ranking all the models",
+                        **log_dic,
+                    )
+
+            best_score = max(candidates[m]["score"] for m in pool)
+
+            tied = [
+                m
+                for m in pool
+                if best_score - candidates[m]["score"]
+                <= self.selection_config["tie_tolerance"]
+            ]
+
+            def cost(model_name):
+                serving_costs = candidates[model_name]["serving"]
+
+                return (
+                    serving_costs.get("p99_single_ms", float("inf")),
+                    serving_costs.get("size_bytes", float("inf")),
+                    model_name,
+                )
+
+            best_model_name = min(tied, key=cost)
 
             self.log_writer.log(
-                "Got the best model name from list of tuple of model name and model score",
+                f"Ranked models by {metric} metric with {policy} policy, tied models were {tied}",
+                **log_dic,
+            )
+
+            self.model_registry.update_manifest(
+                best_model_name,
+                {
+                    "selection": {
+                        "policy": policy,
+                        "metric": metric,
+                        "budget": self.selection_config["budget"],
+                        "tie_tolerance": self.selection_config["tie_tolerance"],
+                        "tied": tied,
+                        "candidates": candidates,
+                    }
+                },
+                log_file,
+            )
+
+            self.log_writer.log(
+                f"Got the best model name as {best_model_name} from list of tuple of model name and model score",
                 **log_dic,
             )
 
             self.log_writer.start_log("exit", **log_dic)
 
-            return min_score_model_name
+            return best_model_name
 
         except Exception as e:
             self.log_writer.exception_log(e, **log_dic)
@@ -433,13 +1456,21 @@ class Model_Utils:
         try:
             self.log_writer.log("Getting prod model name for prediction", **log_dic)
 
-            prod_model_dir = (
-                self.config["dir"]["artifacts"] + "/" + self.config["model_dir"]["prod"]
-            )
+            pointer = self.model_registry.get_prod_pointer(log_file)
+
+            if pointer is not None:
+                model_name = pointer["model_file"]
+
+            else:
+                prod_model_dir = (
+                    self.config["dir"]["artifacts"]
+                    + "/"
+                    + self.config["model_dir"]["prod"]
+                )
 
-            model_name = listdir(prod_model_dir)[0].split(".")[0]
+                model_name = listdir(prod_model_dir)[0].split(".")[0]
 
-            model_name = prod_model_dir + "/" + model_name + self.save_format
+                model_name = prod_model_dir + "/" + model_name + self.save_format
 
             self.log_writer.log("Got the prod model name for prediction", **log_dic)
 
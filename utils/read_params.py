@@ -1,10 +1,22 @@
-from yaml import safe_load
+from copy import deepcopy
+from os.path import abspath, getmtime
+
+from yaml import load
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+
+except ImportError:
+    from yaml import SafeLoader
+
+_params_cache = {}
 
 
 def read_params(config_path="config/params.yaml"):
     """
     Method Name :   read_params
-    Description :   This method reads the parameters from params.yaml file
+    Description :   This method reads the parameters from params.yaml file. The parsed file is cached by its modified
+                    time, so the file is parsed again only when it changes, and a copy is returned to each caller
 
     Output      :   Parameters are read from the params.yaml file
     On Failure  :   Write an exception log and then raise an exception
@@ -15,10 +27,17 @@ def read_params(config_path="config/params.yaml"):
     method_name = read_params.__name__
 
     try:
-        with open(config_path) as f:
-            config = safe_load(f)
+        key = abspath(config_path)
+
+        mtime = getmtime(key)
+
+        cached = _params_cache.get(key)
+
+        if cached is None or cached[0] != mtime:
+            with open(key) as f:
+                cached = _params_cache[key] = (mtime, load(f, Loader=SafeLoader))
 
-        return config
+        return deepcopy(cached[1])
 
     except Exception as e:
         raise Exception(
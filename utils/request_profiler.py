@@ -0,0 +1,346 @@
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from os import makedirs
+from os.path import basename, join
+from sys import _current_frames
+from threading import Event, Thread, get_ident
+
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class Request_Profiler:
+    """
+    Description :   This class is used for profiling the next requests on demand. An admin arms it with a mode, cpu for
+                    a sampling profiler writing collapsed stacks or memory for tracemalloc top allocation sites, for the
+                    next N requests or for the requests of a job id. When it is not armed the only cost on a request is
+                    the check of the armed attribute. The session of the request is kept in a context variable, so
+                    work the request hands to a threadpool worker can have that thread sampled instead
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    armed = None
+
+    last = None
+
+    session = ContextVar("request_profiler_session", default=None)
+
+    def __init__(self):
+        self.config = read_params()
+
+        self.profiler_config = self.config["request_profiler"]
+
+        self.profiles_dir = self.profiler_config["dir"]
+
+        self.request_profiler_log = self.config["log"]["request_profiler"]
+
+        self.log_writer = App_Logger()
+
+    def arm(self, mode, requests=1, job_id=None):
+        """
+        Method Name :   arm
+        Description :   This method arms the profiler for the next requests, or for the next requests of the job id when
+                        it is given
+
+        Output      :   Armed state is returned as dict
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.arm.__name__,
+            __file__,
+            self.request_profiler_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            if mode not in ("cpu", "memory"):
+                raise Exception(
+                    f"Profiling mode {mode} is not supported, use cpu or memory"
+                )
+
+            if requests < 1:
+                raise Exception("Number of requests to profile must be at least 1")
+
+            Request_Profiler.armed = Request_Profiler.last = {
+                "mode": mode,
+                "remaining": requests,
+                "job_id": job_id,
+                "armed_at": datetime.now().isoformat(),
+                "profiles": [],
+            }
+
+            self.log_writer.log(
+                f"Armed {mode} profiling for {requests} requests of job id {job_id}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return Request_Profiler.armed
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def disarm(self):
+        """
+        Method Name :   disarm
+        Description :   This method disarms the profiler
+
+        Output      :   Last armed state is returned as dict
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.disarm.__name__,
+            __file__,
+            self.request_profiler_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            armed, Request_Profiler.armed = Request_Profiler.armed, None
+
+            self.log_writer.log("Disarmed request profiling", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return armed
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def take(self, job_id):
+        """
+        Method Name :   take
+        Description :   This method decides if the request with the job id is profiled, and if so takes one request
+                        from the armed count. Only called when the profiler is armed
+
+        Output      :   Profiling mode is returned, None if the request is not profiled
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            armed = Request_Profiler.armed
+
+            if armed is None or armed["remaining"] < 1:
+                return None
+
+            if armed["job_id"] is not None and armed["job_id"] != job_id:
+                return None
+
+            armed["remaining"] -= 1
+
+            return armed["mode"]
+
+        except Exception as e:
+            raise e
+
+    def start(self, mode):
+        """
+        Method Name :   start
+        Description :   This method starts profiling the current thread, for cpu mode a sampler thread records the stack
+                        of the profiled thread every sample interval and for memory mode tracemalloc is started. The
+                        profiled thread starts as the current thread and can be moved with profile_thread
+
+        Output      :   Profiling session is returned as dict
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.start.__name__,
+            __file__,
+            self.request_profiler_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            session = {"mode": mode, "started_at": datetime.now()}
+
+            if mode == "cpu":
+                session["stacks"] = Counter()
+
+                session["stop"] = Event()
+
+                session["thread_id"] = get_ident()
+
+                session["thread"] = Thread(
+                    target=self.sample, args=(session,), daemon=True
+                )
+
+                session["thread"].start()
+
+            else:
+                session["was_tracing"] = tracemalloc.is_tracing()
+
+                if not session["was_tracing"]:
+                    tracemalloc.start(self.profiler_config["traceback_frames"])
+
+                session["snapshot"] = tracemalloc.take_snapshot()
+
+            self.log_writer.log(f"Started {mode} profiling", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return session
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    @contextmanager
+    def profile_thread(self):
+        """
+        Method Name :   profile_thread
+        Description :   This method moves cpu sampling of the profiled request to the current thread inside the with
+                        block, like a threadpool worker running a pipeline for the request, and back when it exits.
+                        Nothing is done when the request is not profiled
+
+        Output      :   Current thread is sampled inside the with block
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        session = Request_Profiler.session.get()
+
+        if session is None or session["mode"] != "cpu":
+            yield
+
+            return
+
+        thread_id, session["thread_id"] = session["thread_id"], get_ident()
+
+        try:
+            yield
+
+        finally:
+            session["thread_id"] = thread_id
+
+    def sample(self, session):
+        """
+        Method Name :   sample
+        Description :   This method runs in the sampler thread and counts the collapsed stacks of the profiled thread
+                        of the session until stopped
+
+        Output      :   Collapsed stacks are counted in stacks
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            interval = self.profiler_config["sample_interval"]
+
+            stacks, stop = session["stacks"], session["stop"]
+
+            while not stop.wait(interval):
+                frame = _current_frames().get(session["thread_id"])
+
+                names = []
+
+                while frame is not None:
+                    code = frame.f_code
+
+                    names.append(f"{basename(code.co_filename)}:{code.co_name}")
+
+                    frame = frame.f_back
+
+                if names:
+                    stacks[";".join(reversed(names))] += 1
+
+        except Exception as e:
+            raise e
+
+    def stop(self, session, route):
+        """
+        Method Name :   stop
+        Description :   This method stops the profiling session and writes collapsed stacks for cpu mode, which can be
+                        rendered with flamegraph.pl or speedscope, or the top allocation sites for memory mode
+
+        Output      :   Profile file is written and its path is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.stop.__name__,
+            __file__,
+            self.request_profiler_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            makedirs(self.profiles_dir, exist_ok=True)
+
+            name = (route.strip("/").replace("/", "_") or "index") + session[
+                "started_at"
+            ].strftime("_%Y%m%d_%H%M%S_%f")
+
+            if session["mode"] == "cpu":
+                session["stop"].set()
+
+                session["thread"].join()
+
+                profile_file = join(self.profiles_dir, name + ".cpu.folded")
+
+                with open(profile_file, "w") as f:
+                    for stack, count in session["stacks"].most_common():
+                        f.write(f"{stack} {count}\n")
+
+            else:
+                snapshot = tracemalloc.take_snapshot()
+
+                if not session["was_tracing"]:
+                    tracemalloc.stop()
+
+                stats = snapshot.compare_to(session["snapshot"], "lineno")
+
+                profile_file = join(self.profiles_dir, name + ".memory.txt")
+
+                with open(profile_file, "w") as f:
+                    f.write(f"Top allocation sites of {route} request\n")
+
+                    for stat in stats[: self.profiler_config["top_allocations"]]:
+                        f.write(f"{stat}\n")
+
+            armed = Request_Profiler.armed
+
+            if armed is not None:
+                armed["profiles"].append(profile_file)
+
+                if armed["remaining"] < 1:
+                    Request_Profiler.armed = None
+
+            self.log_writer.log(
+                f"Wrote {session['mode']} profile of {route} request to {profile_file}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return profile_file
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
@@ -0,0 +1,115 @@
+from os import environ
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.multiprocess import MultiProcessCollector
+
+
+class Service_Metrics:
+    """
+    Description :   This class holds the prometheus metrics of the service. The metrics are created once per process
+                    and updating them is a lock and an add, so they can be used on the prediction path. When the service
+                    runs with multiple workers, PROMETHEUS_MULTIPROC_DIR is set and the metrics of all the workers are
+                    aggregated on scrape
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    request_latency = Histogram(
+        "network_request_duration_seconds",
+        "Latency of the http requests by route",
+        ["route", "method"],
+    )
+
+    requests_in_flight = Gauge(
+        "network_requests_in_flight",
+        "Number of http requests being served",
+        multiprocess_mode="livesum",
+    )
+
+    prediction_rows = Counter(
+        "network_prediction_rows",
+        "Number of rows scored, the rate of this counter is the prediction rows per second",
+        ["route"],
+    )
+
+    model_load_time = Histogram(
+        "network_model_load_duration_seconds",
+        "Time taken to load a model for scoring",
+        ["source"],
+        buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30),
+    )
+
+    cache_requests = Counter(
+        "network_cache_requests",
+        "Lookups of the train cache by cache and result, hit ratio is hit over all results",
+        ["cache", "result"],
+    )
+
+    mongo_op_latency = Histogram(
+        "network_mongo_operation_duration_seconds",
+        "Latency of the mongodb operations",
+        ["operation"],
+    )
+
+    cascade_rows = Counter(
+        "network_cascade_rows",
+        "Rows scored by the cascade by the stage which answered them, escalated rows were answered by the full model",
+        ["stage"],
+    )
+
+    anytime_rows = Counter(
+        "network_anytime_rows",
+        "Rows scored online by anytime inference by whether the answer was exact or approximate",
+        ["result"],
+    )
+
+    anytime_trees = Counter(
+        "network_anytime_trees",
+        "Trees evaluated online by anytime inference, divide by the rows for the mean trees per row",
+    )
+
+    shadow_requests = Counter(
+        "network_shadow_requests",
+        "Online requests sampled for shadow scoring by outcome, dropped requests found the shadow queue full",
+        ["outcome"],
+    )
+
+    jobs_in_progress = Gauge(
+        "network_jobs_in_progress",
+        "Number of train and predict jobs running or waiting to run",
+        ["pipeline"],
+        multiprocess_mode="livesum",
+    )
+
+    def get_metrics(self):
+        """
+        Method Name :   get_metrics
+        Description :   This method renders the metrics in the prometheus text format, the metrics of all the workers
+                        are collected from the multiprocess folder when it is set
+
+        Output      :   A tuple of metrics payload and content type is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            if "PROMETHEUS_MULTIPROC_DIR" in environ:
+                registry = CollectorRegistry()
+
+                MultiProcessCollector(registry)
+
+                return generate_latest(registry), CONTENT_TYPE_LATEST
+
+            return generate_latest(), CONTENT_TYPE_LATEST
+
+        except Exception as e:
+            raise e
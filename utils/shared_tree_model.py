@@ -0,0 +1,414 @@
+from json import dump, load
+from os import makedirs
+from os.path import join
+from time import perf_counter
+
+import numpy as np
+
+ARRAY_NAMES = ("feature", "threshold", "left", "right", "value", "roots", "weights")
+
+
+class Shared_Tree_Model:
+    """
+    Description :   This class is the numpy array form of a fitted tree ensemble. All the trees are flattened into one set
+                    of node arrays which are saved as .npy files and memory mapped read-only, so every serving worker
+                    shares the same pages. sklearn copies the node arrays into each tree when unpickling, so the
+                    estimator itself can not be shared this way
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    def __init__(self, model_dir):
+        with open(join(model_dir, "meta.json"), "r") as f:
+            self.meta = load(f)
+
+        for name in ARRAY_NAMES:
+            setattr(self, name, np.load(join(model_dir, name + ".npy"), mmap_mode="r"))
+
+        self.classes_ = np.array(self.meta["classes"])
+
+        self.n_classes = len(self.classes_)
+
+        self.feature_names_in_ = self.meta["feature_names"]
+
+        self.tree_order = None
+
+        self.remaining_bounds = None
+
+    @staticmethod
+    def is_supported(model):
+        """
+        Method Name :   is_supported
+        Description :   This method checks whether the model is a tree ensemble which can be flattened to node arrays
+
+        Output      :   True is returned if the model can be saved as shared tree model
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            kind = model.__class__.__name__
+
+            if kind in ("RandomForestClassifier", "ExtraTreesClassifier"):
+                return True
+
+            if kind == "AdaBoostClassifier":
+                return all(hasattr(e, "tree_") for e in model.estimators_)
+
+            return False
+
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def save(model, model_dir):
+        """
+        Method Name :   save
+        Description :   This method flattens the trees of the fitted ensemble into node arrays and saves them with the meta
+                        data in the model folder. Leaves point to themselves, so a row can be walked max_depth steps
+                        without checking for leaves
+
+        Output      :   Node arrays and meta data are saved to the model folder
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            makedirs(model_dir, exist_ok=True)
+
+            n_trees = len(model.estimators_)
+
+            feature, threshold, left, right, value, roots = [], [], [], [], [], []
+
+            offset, max_depth = 0, 0
+
+            for est in model.estimators_:
+                tree = est.tree_
+
+                node_ids = np.arange(tree.node_count)
+
+                is_leaf = tree.children_left == -1
+
+                feature.append(np.where(is_leaf, 0, tree.feature))
+
+                threshold.append(tree.threshold)
+
+                left.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+
+                right.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+
+                counts = tree.value[:, 0, :]
+
+                value.append(
+                    counts / np.maximum(counts.sum(axis=1, keepdims=True), 1e-12)
+                )
+
+                roots.append(offset)
+
+                offset += tree.node_count
+
+                max_depth = max(max_depth, tree.max_depth)
+
+            if model.__class__.__name__ == "AdaBoostClassifier":
+                kind = "adaboost"
+
+                weights = np.asarray(
+                    model.estimator_weights_[:n_trees], dtype=np.float64
+                )
+
+            else:
+                kind = "forest"
+
+                weights = np.ones(n_trees, dtype=np.float64)
+
+            arrays = {
+                "feature": np.concatenate(feature).astype(np.int32),
+                "threshold": np.concatenate(threshold).astype(np.float64),
+                "left": np.concatenate(left).astype(np.int32),
+                "right": np.concatenate(right).astype(np.int32),
+                "value": np.concatenate(value).astype(np.float64),
+                "roots": np.asarray(roots, dtype=np.int32),
+                "weights": weights,
+            }
+
+            for name in ARRAY_NAMES:
+                np.save(join(model_dir, name + ".npy"), arrays[name])
+
+            feature_names = getattr(model, "feature_names_in_", None)
+
+            meta = {
+                "model_name": model.__class__.__name__,
+                "kind": kind,
+                "algorithm": getattr(model, "algorithm", "SAMME"),
+                "classes": model.classes_.tolist(),
+                "feature_names": None if feature_names is None else list(feature_names),
+                "max_depth": int(max_depth),
+                "n_trees": n_trees,
+            }
+
+            with open(join(model_dir, "meta.json"), "w") as f:
+                dump(meta, f, indent=4)
+
+        except Exception as e:
+            raise e
+
+    def get_array(self, X):
+        """
+        Method Name :   get_array
+        Description :   This method converts the input data to a float32 array in the column order of the training data
+
+        Output      :   Input data is returned as numpy array
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            if self.feature_names_in_ is not None and hasattr(X, "columns"):
+                X = X[self.feature_names_in_]
+
+            return np.asarray(X, dtype=np.float32)
+
+        except Exception as e:
+            raise e
+
+    def tree_proba(self, X, trees=None):
+        """
+        Method Name :   tree_proba
+        Description :   This method walks all the rows down the selected trees at once and returns the leaf class
+                        probabilities of each tree
+
+        Output      :   An array of shape (rows, trees, classes) is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            X = self.get_array(X)
+
+            roots = self.roots if trees is None else self.roots[trees]
+
+            idx = np.broadcast_to(roots, (X.shape[0], len(roots))).copy()
+
+            rows = np.arange(X.shape[0])[:, np.newaxis]
+
+            for _ in range(self.meta["max_depth"]):
+                go_left = X[rows, self.feature[idx]] <= self.threshold[idx]
+
+                idx = np.where(go_left, self.left[idx], self.right[idx])
+
+            return self.value[idx]
+
+        except Exception as e:
+            raise e
+
+    def decision_from_proba(self, proba, weights):
+        """
+        Method Name :   decision_from_proba
+        Description :   This method combines the per tree probabilities into class scores the same way as the ensemble
+                        does, averaging for forests and SAMME or SAMME.R voting for adaboost
+
+        Output      :   An array of shape (rows, classes) with class scores is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            if self.meta["kind"] == "forest":
+                return proba.sum(axis=1)
+
+            if self.meta["algorithm"] == "SAMME.R":
+                log_proba = np.log(np.clip(proba, np.finfo(proba.dtype).eps, None))
+
+                votes = (self.n_classes - 1) * (
+                    log_proba - log_proba.mean(axis=2, keepdims=True)
+                )
+
+            else:
+                onehot = np.eye(self.n_classes)[proba.argmax(axis=2)]
+
+                votes = np.where(onehot == 1, 1.0, -1.0 / (self.n_classes - 1))
+
+            return (votes * weights[np.newaxis, :, np.newaxis]).sum(axis=1)
+
+        except Exception as e:
+            raise e
+
+    def get_tree_bounds(self):
+        """
+        Method Name :   get_tree_bounds
+        Description :   This method bounds how much one tree can change the gap between the scores of two classes, from
+                        the spread of the class votes over its nodes times its weight. Trees are ordered by their bound
+                        from the largest, so the vote is decided with the fewest trees, and the bounds of the trees
+                        after each position are summed. They are computed on the first call and kept for the process
+
+        Output      :   A tuple of the tree order and the bounds of the trees left after each position is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            if self.tree_order is None:
+                value = np.asarray(self.value)
+
+                if self.meta["kind"] == "forest":
+                    spread = value.max(axis=1) - value.min(axis=1)
+
+                elif self.meta["algorithm"] == "SAMME.R":
+                    log_value = np.log(np.clip(value, np.finfo(value.dtype).eps, None))
+
+                    spread = (self.n_classes - 1) * (
+                        log_value.max(axis=1) - log_value.min(axis=1)
+                    )
+
+                else:
+                    spread = np.full(len(value), self.n_classes / (self.n_classes - 1))
+
+                bounds = np.maximum.reduceat(
+                    spread, np.asarray(self.roots)
+                ) * np.asarray(self.weights)
+
+                order = np.argsort(-bounds, kind="stable")
+
+                self.remaining_bounds = np.append(
+                    np.cumsum(bounds[order][::-1])[::-1], 0.0
+                )
+
+                self.tree_order = order
+
+            return self.tree_order, self.remaining_bounds
+
+        except Exception as e:
+            raise e
+
+    def predict_anytime(self, X, max_trees=None, time_budget_ms=None, block_trees=8):
+        """
+        Method Name :   predict_anytime
+        Description :   This method evaluates the trees in blocks and stops for each row once the gap between its two
+                        best class scores is larger than what the trees left can change, so the label is the one of the
+                        full ensemble. Each block runs at least to the first tree at which the widest gap could be
+                        decided, and at least block_trees trees, so a request takes few numpy passes. Evaluation stops
+                        for all the rows when max_trees trees or time_budget_ms milliseconds are used, and the rows not
+                        decided by then get the label of the trees evaluated so far and are flagged as approximate
+
+        Output      :   A tuple of class labels, approximate flags and trees evaluated per row is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            start = perf_counter()
+
+            X = self.get_array(X)
+
+            order, remaining_bounds = self.get_tree_bounds()
+
+            n_trees = len(order) if max_trees is None else min(max_trees, len(order))
+
+            scores = np.zeros((X.shape[0], self.n_classes))
+
+            trees = np.zeros(X.shape[0], dtype=np.int64)
+
+            active = np.arange(X.shape[0])
+
+            t, gap = 0, 0.0
+
+            while active.size and t < n_trees:
+                if (
+                    t > 0
+                    and time_budget_ms is not None
+                    and (perf_counter() - start) * 1000 >= time_budget_ms
+                ):
+                    break
+
+                decidable = np.searchsorted(
+                    -remaining_bounds, -(remaining_bounds[t] + gap) / 2, side="right"
+                )
+
+                block = order[t : min(max(decidable, t + block_trees), n_trees)]
+
+                scores[active] += self.decision_from_proba(
+                    self.tree_proba(X[active], block), self.weights[block]
+                )
+
+                t += len(block)
+
+                trees[active] = t
+
+                top = np.partition(scores[active], -2, axis=1)
+
+                gaps = top[:, -1] - top[:, -2]
+
+                active = active[gaps <= remaining_bounds[t]]
+
+                gap = gaps.max(initial=0.0)
+
+            approximate = np.zeros(X.shape[0], dtype=bool)
+
+            if t < len(order):
+                approximate[active] = True
+
+            return self.classes_[scores.argmax(axis=1)], approximate, trees
+
+        except Exception as e:
+            raise e
+
+    def predict_proba(self, X):
+        """
+        Method Name :   predict_proba
+        Description :   This method gets the class probabilities in the same way as predict_proba of the ensemble
+
+        Output      :   An array of shape (rows, classes) with class probabilities is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            scores = self.decision_from_proba(self.tree_proba(X), self.weights)
+
+            if self.meta["kind"] == "forest":
+                return scores / len(self.roots)
+
+            decision = scores / self.weights.sum()
+
+            if self.n_classes == 2:
+                decision = np.vstack([decision[:, 0] - decision[:, 1]] * 2).T
+
+                decision = decision * np.array([1, -1]) / 2
+
+            else:
+                decision = decision / (self.n_classes - 1)
+
+            decision = np.exp(decision - decision.max(axis=1, keepdims=True))
+
+            return decision / decision.sum(axis=1, keepdims=True)
+
+        except Exception as e:
+            raise e
+
+    def predict(self, X):
+        """
+        Method Name :   predict
+        Description :   This method gets the predicted class labels
+
+        Output      :   An array of class labels is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            scores = self.decision_from_proba(self.tree_proba(X), self.weights)
+
+            return self.classes_[scores.argmax(axis=1)]
+
+        except Exception as e:
+            raise e
@@ -0,0 +1,296 @@
+from contextlib import contextmanager
+from datetime import datetime
+from json import dump, load
+from os import listdir, makedirs, replace
+from os.path import basename, exists, join
+from time import perf_counter, process_time
+
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class Stage_Profiler:
+    """
+    Description :   This class is used for timing the stages of the train and predict pipelines. Each stage records wall
+                    time, cpu time, peak rss and row and file counts into the active run, and the run is written as a
+                    json report to the profiles folder when it ends
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    active_run = None
+
+    def __init__(self):
+        self.config = read_params()
+
+        self.profile_config = self.config["stage_profiler"]
+
+        self.reports_dir = self.profile_config["reports_dir"]
+
+        self.stage_profiler_log = self.config["log"]["stage_profiler"]
+
+        self.log_writer = App_Logger()
+
+    def get_rss_mb(self, key):
+        """
+        Method Name :   get_rss_mb
+        Description :   This method reads the resident set size of the process from /proc/self/status, VmHWM is the
+                        peak rss and VmRSS is the current rss
+
+        Output      :   Resident set size in MB is returned, None when /proc is not available
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            if not exists("/proc/self/status"):
+                return None
+
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith(key + ":"):
+                        return int(line.split()[1]) / 1024
+
+            return None
+
+        except Exception as e:
+            raise e
+
+    def reset_peak_rss(self):
+        """
+        Method Name :   reset_peak_rss
+        Description :   This method resets the peak rss of the process so that the peak of each stage is measured on
+                        its own. When the kernel does not allow it, the peak is the peak of the process so far
+
+        Output      :   Peak rss of the process is reset
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            with open("/proc/self/clear_refs", "w") as f:
+                f.write("5")
+
+        except OSError:
+            pass
+
+    def start_run(self, pipeline):
+        """
+        Method Name :   start_run
+        Description :   This method starts a new profiling run for the pipeline, the stages timed after this call are
+                        recorded into it
+
+        Output      :   Run id of the new run is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.start_run.__name__,
+            __file__,
+            self.stage_profiler_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            started_at = datetime.now()
+
+            run_id = f"{pipeline}_{started_at.strftime('%Y%m%d_%H%M%S_%f')}"
+
+            Stage_Profiler.active_run = {
+                "run_id": run_id,
+                "pipeline": pipeline,
+                "started_at": started_at.isoformat(),
+                "status": "running",
+                "stages": [],
+                "wall_start": perf_counter(),
+                "cpu_start": process_time(),
+            }
+
+            self.log_writer.log(f"Started profiling run {run_id}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return run_id
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    @contextmanager
+    def stage(self, name, **info):
+        """
+        Method Name :   stage
+        Description :   This method times the stage run inside the with block. The yielded dict can be updated with the
+                        rows and files counts once they are known. Nothing is recorded when there is no active run
+
+        Output      :   Stage record is appended to the active run
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        record = {"stage": name}
+
+        record.update(info)
+
+        self.reset_peak_rss()
+
+        wall_start, cpu_start = perf_counter(), process_time()
+
+        try:
+            yield record
+
+        finally:
+            record["wall_sec"] = perf_counter() - wall_start
+
+            record["cpu_sec"] = process_time() - cpu_start
+
+            record["peak_rss_mb"] = self.get_rss_mb("VmHWM")
+
+            if Stage_Profiler.active_run is not None:
+                Stage_Profiler.active_run["stages"].append(record)
+
+    def end_run(self, status="success"):
+        """
+        Method Name :   end_run
+        Description :   This method ends the active run, sums the stages by stage name and writes the run report to the
+                        profiles folder
+
+        Output      :   Run report is written and returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.end_run.__name__,
+            __file__,
+            self.stage_profiler_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            run = Stage_Profiler.active_run
+
+            Stage_Profiler.active_run = None
+
+            if run is None:
+                self.log_writer.log("No active profiling run to end", **log_dic)
+
+                self.log_writer.start_log("exit", **log_dic)
+
+                return None
+
+            run["status"] = status
+
+            run["wall_sec"] = perf_counter() - run.pop("wall_start")
+
+            run["cpu_sec"] = process_time() - run.pop("cpu_start")
+
+            summary = {}
+
+            for record in run["stages"]:
+                total = summary.setdefault(
+                    record["stage"],
+                    {"calls": 0, "wall_sec": 0.0, "cpu_sec": 0.0, "peak_rss_mb": None},
+                )
+
+                total["calls"] += 1
+
+                total["wall_sec"] += record["wall_sec"]
+
+                total["cpu_sec"] += record["cpu_sec"]
+
+                if record["peak_rss_mb"] is not None:
+                    total["peak_rss_mb"] = max(
+                        total["peak_rss_mb"] or 0, record["peak_rss_mb"]
+                    )
+
+                for key in ("rows", "files"):
+                    if record.get(key) is not None:
+                        total[key] = total.get(key, 0) + record[key]
+
+            run["summary"] = summary
+
+            makedirs(self.reports_dir, exist_ok=True)
+
+            report_file = join(self.reports_dir, run["run_id"] + ".json")
+
+            with open(report_file + ".tmp", "w") as f:
+                dump(run, f, indent=4, default=str)
+
+            replace(report_file + ".tmp", report_file)
+
+            self.log_writer.log(
+                f"Wrote profiling report of run {run['run_id']} to {report_file}",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return run
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_report(self, run_id=None, pipeline=None):
+        """
+        Method Name :   get_report
+        Description :   This method gets the profiling report of the run id, or the latest report of the pipeline when
+                        no run id is given
+
+        Output      :   Run report is returned, None if there is no report
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__,
+            self.get_report.__name__,
+            __file__,
+            self.stage_profiler_log,
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            report = None
+
+            if exists(self.reports_dir):
+                if run_id is None:
+                    reports = sorted(
+                        (
+                            f
+                            for f in listdir(self.reports_dir)
+                            if f.endswith(".json")
+                            and (pipeline is None or f.startswith(pipeline + "_"))
+                        ),
+                        key=lambda f: f.rsplit("_", 3)[-3:],
+                    )
+
+                    run_id = reports[-1][: -len(".json")] if reports else None
+
+                if run_id is not None:
+                    report_file = join(self.reports_dir, basename(run_id) + ".json")
+
+                    if exists(report_file):
+                        with open(report_file, "r") as f:
+                            report = load(f)
+
+            self.log_writer.log(f"Got profiling report of run {run_id}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return report
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
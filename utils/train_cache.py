@@ -0,0 +1,362 @@
+from hashlib import sha256
+from json import dump, dumps, load
+from os import listdir, makedirs, remove, replace, stat, utime
+from os.path import exists, join
+from pickle import dump as pickle_dump
+from pickle import load as pickle_load
+from time import time
+
+import numpy as np
+
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+from utils.service_metrics import Service_Metrics
+
+
+class Train_Cache:
+    """
+    Description :   This class is used for caching the training work across retrains. Fold splits, per candidate fold
+                    scores and fitted best models are stored under keys built from the data content hash, the estimator,
+                    the param set and the cv config. Entries are touched when they are read, and the least recently
+                    used entries are evicted after each training to keep the cache within its size and age bounds
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    def __init__(self):
+        self.config = read_params()
+
+        self.cache_config = self.config["train_cache"]
+
+        self.cache_dir = self.cache_config["dir"]
+
+        self.folds_dir = join(self.cache_dir, "folds")
+
+        self.scores_dir = join(self.cache_dir, "scores")
+
+        self.models_dir = join(self.cache_dir, "models")
+
+        self.log_writer = App_Logger()
+
+    def get_data_hash(self, x_data, y_data, log_file):
+        """
+        Method Name :   get_data_hash
+        Description :   This method gets the content hash of the features and the target, row order and column names
+                        are part of the hash
+
+        Output      :   Hex digest of the data content is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_data_hash.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            from pandas.util import hash_pandas_object
+
+            h = sha256()
+
+            h.update(dumps(list(x_data.columns)).encode())
+
+            h.update(hash_pandas_object(x_data, index=False).values.tobytes())
+
+            h.update(np.ascontiguousarray(y_data).tobytes())
+
+            data_hash = h.hexdigest()
+
+            self.log_writer.log(f"Got data hash as {data_hash}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return data_hash
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_key(self, *parts):
+        """
+        Method Name :   get_key
+        Description :   This method builds a cache key from the parts, dicts are serialized with sorted keys so that the
+                        key does not depend on the order of the params
+
+        Output      :   Hex digest of the parts is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            return sha256(
+                dumps(parts, sort_keys=True, default=str).encode()
+            ).hexdigest()
+
+        except Exception as e:
+            raise e
+
+    def get_fold_splits(self, data_hash, y_data, cv, log_file):
+        """
+        Method Name :   get_fold_splits
+        Description :   This method gets the stratified fold splits for the data, the same splits as GridSearchCV makes
+                        for an integer cv. The splits are cached by data hash and cv
+
+        Output      :   A list of tuple of train and test indices is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_fold_splits.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            makedirs(self.folds_dir, exist_ok=True)
+
+            folds_file = join(self.folds_dir, self.get_key(data_hash, cv) + ".npz")
+
+            Service_Metrics.cache_requests.labels(
+                "folds", "hit" if exists(folds_file) else "miss"
+            ).inc()
+
+            if exists(folds_file):
+                utime(folds_file)
+
+                with np.load(folds_file) as f:
+                    fold_ids = f["fold_ids"]
+
+                self.log_writer.log(f"Loaded fold splits from {folds_file}", **log_dic)
+
+            else:
+                from sklearn.model_selection import StratifiedKFold
+
+                fold_ids = np.empty(len(y_data), dtype=np.int32)
+
+                skf = StratifiedKFold(n_splits=cv)
+
+                for i, (_, test_idx) in enumerate(
+                    skf.split(np.zeros(len(y_data)), y_data)
+                ):
+                    fold_ids[test_idx] = i
+
+                np.savez(folds_file, fold_ids=fold_ids)
+
+                self.log_writer.log(f"Saved fold splits to {folds_file}", **log_dic)
+
+            folds = [
+                (np.flatnonzero(fold_ids != i), np.flatnonzero(fold_ids == i))
+                for i in range(cv)
+            ]
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return folds
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_scores(self, key, log_file):
+        """
+        Method Name :   get_scores
+        Description :   This method gets the cached fold scores of a candidate
+
+        Output      :   A list of fold scores is returned, None if the candidate is not cached
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_scores.__name__, __file__, log_file
+        )
+
+        try:
+            scores_file = join(self.scores_dir, key + ".json")
+
+            if not exists(scores_file):
+                Service_Metrics.cache_requests.labels("scores", "miss").inc()
+
+                return None
+
+            Service_Metrics.cache_requests.labels("scores", "hit").inc()
+
+            utime(scores_file)
+
+            with open(scores_file, "r") as f:
+                return load(f)["fold_scores"]
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def save_scores(self, key, params, fold_scores, log_file):
+        """
+        Method Name :   save_scores
+        Description :   This method saves the fold scores of a candidate along with its params
+
+        Output      :   Fold scores are saved to the scores folder of the cache
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.save_scores.__name__, __file__, log_file
+        )
+
+        try:
+            makedirs(self.scores_dir, exist_ok=True)
+
+            scores_file = join(self.scores_dir, key + ".json")
+
+            with open(scores_file + ".tmp", "w") as f:
+                dump({"params": params, "fold_scores": fold_scores}, f, default=str)
+
+            replace(scores_file + ".tmp", scores_file)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_model(self, key, log_file):
+        """
+        Method Name :   get_model
+        Description :   This method gets the cached fitted model
+
+        Output      :   Fitted model is returned, None if the model is not cached
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_model.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            model_file = join(self.models_dir, key + ".sav")
+
+            model = None
+
+            Service_Metrics.cache_requests.labels(
+                "model", "hit" if exists(model_file) else "miss"
+            ).inc()
+
+            if exists(model_file):
+                utime(model_file)
+
+                with open(model_file, "rb") as f:
+                    model = pickle_load(f)
+
+                self.log_writer.log(f"Loaded cached model from {model_file}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return model
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def save_model(self, key, model, log_file):
+        """
+        Method Name :   save_model
+        Description :   This method saves the fitted model to the models folder of the cache
+
+        Output      :   Fitted model is saved to the cache
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.save_model.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            makedirs(self.models_dir, exist_ok=True)
+
+            model_file = join(self.models_dir, key + ".sav")
+
+            with open(model_file + ".tmp", "wb") as f:
+                pickle_dump(model, f)
+
+            replace(model_file + ".tmp", model_file)
+
+            self.log_writer.log(f"Saved fitted model to {model_file}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def evict(self, log_file):
+        """
+        Method Name :   evict
+        Description :   This method removes the cache files not used for max_age_days days, and then the least recently
+                        used files once the newer files add up to max_size_mb. The data hash changes whenever new rows
+                        arrive, so without eviction every training would leave its folds, scores and models behind
+
+        Output      :   Old cache files are removed and the number of removed files is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.evict.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            files = []
+
+            for folder in (self.folds_dir, self.scores_dir, self.models_dir):
+                if exists(folder):
+                    for f in listdir(folder):
+                        st = stat(join(folder, f))
+
+                        files.append((st.st_mtime, st.st_size, join(folder, f)))
+
+            cutoff = time() - self.cache_config["max_age_days"] * 86400
+
+            max_bytes = self.cache_config["max_size_mb"] * 1024 * 1024
+
+            kept, removed, full = 0, 0, False
+
+            for mtime, size, path in sorted(files, reverse=True):
+                full = full or mtime < cutoff or kept + size > max_bytes
+
+                if not full:
+                    kept += size
+
+                    continue
+
+                try:
+                    remove(path)
+
+                    removed += 1
+
+                except FileNotFoundError:
+                    pass
+
+            self.log_writer.log(
+                f"Evicted {removed} of {len(files)} train cache files, kept {kept / 1024 / 1024:.1f} MB",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return removed
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
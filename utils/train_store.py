@@ -0,0 +1,261 @@
+from json import dump, load
+from os import fsync, makedirs, remove, replace
+from os.path import exists, join
+from shutil import rmtree
+
+import numpy as np
+from pandas import DataFrame, to_numeric
+
+from utils.columnar_cache import NULL_CODE
+from utils.logger import App_Logger
+from utils.read_params import get_log_dic, read_params
+
+
+class Train_Store:
+    """
+    Description :   This class is used for keeping the exported training data as an appendable columnar store. Each
+                    export appends the new documents as one fixed width int8 part file, with missing values as the null
+                    code, and the manifest keeps the columns, the parts and the _id of the last exported document as the
+                    high water mark of the next export
+    Version     :   1.2
+
+    Revisions   :   Moved to setup to cloud
+    """
+
+    def __init__(self):
+        self.config = read_params()
+
+        self.store_dir = self.config["train_store"]["dir"]
+
+        self.manifest_file = join(self.store_dir, "manifest.json")
+
+        self.log_writer = App_Logger()
+
+    def get_manifest(self, log_file):
+        """
+        Method Name :   get_manifest
+        Description :   This method reads the manifest of the store, an empty manifest is returned for a new store
+
+        Output      :   Manifest is returned as dict
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_manifest.__name__, __file__, log_file
+        )
+
+        try:
+            if not exists(self.manifest_file):
+                return {
+                    "columns": None,
+                    "rows": 0,
+                    "high_water_mark": None,
+                    "parts": [],
+                }
+
+            with open(self.manifest_file) as f:
+                return load(f)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def reset(self, log_file):
+        """
+        Method Name :   reset
+        Description :   This method removes all the parts and the manifest of the store
+
+        Output      :   Store is emptied
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.reset.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            rmtree(self.store_dir, ignore_errors=True)
+
+            self.log_writer.log(f"Removed train store at {self.store_dir}", **log_dic)
+
+            self.log_writer.start_log("exit", **log_dic)
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def encode_page(self, page, columns):
+        """
+        Method Name :   encode_page
+        Description :   This method encodes a page of documents as int8 rows in the order of the store columns. Values
+                        like '?' are stored as the null code
+
+        Output      :   An int8 matrix is returned
+        On Failure  :   Raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        try:
+            data = DataFrame(page).reindex(columns=columns)
+
+            matrix = np.empty(data.shape, dtype=np.int8)
+
+            for j, column in enumerate(columns):
+                values = to_numeric(data[column], errors="coerce")
+
+                num = values.dropna().values
+
+                if len(num) and (
+                    num.min() <= NULL_CODE
+                    or num.max() > 127
+                    or not np.array_equal(num, np.round(num))
+                ):
+                    raise Exception(f"Values of {column} column do not fit in int8")
+
+                matrix[:, j] = values.fillna(NULL_CODE).values
+
+            return matrix
+
+        except Exception as e:
+            raise e
+
+    def append_pages(self, pages, log_file):
+        """
+        Method Name :   append_pages
+        Description :   This method appends the pages of documents to a new part file. The manifest is replaced only
+                        after the part is written and synced, so a failed export leaves the store as it was
+
+        Output      :   Number of appended rows is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.append_pages.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            manifest = self.get_manifest(log_file)
+
+            makedirs(self.store_dir, exist_ok=True)
+
+            part = f"part_{len(manifest['parts']):05d}.bin"
+
+            part_file = join(self.store_dir, part)
+
+            rows, last_id = 0, None
+
+            with open(part_file, "wb") as f:
+                for page in pages:
+                    if manifest["columns"] is None:
+                        manifest["columns"] = [c for c in page[0] if c != "_id"]
+
+                    self.encode_page(page, manifest["columns"]).tofile(f)
+
+                    rows += len(page)
+
+                    last_id = page[-1]["_id"]
+
+                f.flush()
+
+                fsync(f.fileno())
+
+            if rows == 0:
+                remove(part_file)
+
+                self.log_writer.log("No new documents to append", **log_dic)
+
+                self.log_writer.start_log("exit", **log_dic)
+
+                return 0
+
+            manifest["parts"].append(
+                {"file": part, "rows": rows, "start_row": manifest["rows"]}
+            )
+
+            manifest["rows"] += rows
+
+            manifest["high_water_mark"] = str(last_id)
+
+            with open(self.manifest_file + ".tmp", "w") as f:
+                dump(manifest, f, indent=4)
+
+            replace(self.manifest_file + ".tmp", self.manifest_file)
+
+            self.log_writer.log(
+                f"Appended {rows} rows as {part}, store has {manifest['rows']} rows",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return rows
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)
+
+    def get_data(self, log_file):
+        """
+        Method Name :   get_data
+        Description :   This method memory maps the parts of the store and returns them as one dataframe, with the null
+                        code turned to nan
+
+        Output      :   A pandas dataframe is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        log_dic = get_log_dic(
+            self.__class__.__name__, self.get_data.__name__, __file__, log_file
+        )
+
+        self.log_writer.start_log("start", **log_dic)
+
+        try:
+            manifest = self.get_manifest(log_file)
+
+            if manifest["rows"] == 0:
+                raise Exception(f"Train store at {self.store_dir} is empty")
+
+            columns = manifest["columns"]
+
+            parts = [
+                np.memmap(
+                    join(self.store_dir, p["file"]),
+                    dtype=np.int8,
+                    mode="r",
+                    shape=(p["rows"], len(columns)),
+                )
+                for p in manifest["parts"]
+            ]
+
+            matrix = parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+            null = matrix == NULL_CODE
+
+            if null.any():
+                df = DataFrame(np.where(null, np.nan, matrix), columns=columns)
+
+            else:
+                df = DataFrame(matrix, columns=columns, copy=False)
+
+            self.log_writer.log(
+                f"Read {manifest['rows']} rows from {len(parts)} parts of train store",
+                **log_dic,
+            )
+
+            self.log_writer.start_log("exit", **log_dic)
+
+            return df
+
+        except Exception as e:
+            self.log_writer.exception_log(e, **log_dic)